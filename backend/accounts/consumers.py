@@ -0,0 +1,82 @@
+import json
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from . import presence
+
+
+def user_group_name(user_id):
+    """Channels group every notification socket of a user joins."""
+    return f'user_{user_id}'
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Per-user WebSocket for server-pushed notifications (e.g. report ready).
+    Anything sent to the user's group with type 'notify' is forwarded as-is.
+    """
+
+    async def connect(self):
+        """Handle WebSocket connection."""
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = user_group_name(self.user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection."""
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notify(self, event):
+        """Forward a notification to the WebSocket."""
+        await self.send(text_data=json.dumps(event['payload']))
+
+
+class PresenceConsumer(AsyncWebsocketConsumer):
+    """
+    Heartbeat socket kept open by the astrologer app. The astrologer is
+    online while heartbeats keep arriving; see accounts.presence.
+
+    Client sends: {"type": "heartbeat", "busy": false}  (busy optional)
+    """
+
+    async def connect(self):
+        """Handle WebSocket connection."""
+        self.user = self.scope['user']
+        if not self.user.is_authenticated or not self.user.is_astrologer:
+            await self.close()
+            return
+
+        await self.accept()
+        status = await sync_to_async(presence.heartbeat)(self.user.id)
+        await self.send(text_data=json.dumps({
+            'type': 'presence',
+            'status': status,
+            'heartbeat_seconds': getattr(settings, 'PRESENCE_HEARTBEAT_SECONDS', 15),
+        }))
+
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection."""
+        if self.user.is_authenticated and self.user.is_astrologer:
+            await sync_to_async(presence.go_offline)(self.user.id)
+
+    async def receive(self, text_data):
+        """Handle heartbeats."""
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Invalid JSON'}))
+            return
+
+        if data.get('type') != 'heartbeat':
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Unknown message type'}))
+            return
+
+        status = await sync_to_async(presence.heartbeat)(self.user.id, data.get('busy'))
+        await self.send(text_data=json.dumps({'type': 'presence', 'status': status}))
@@ -0,0 +1,152 @@
+"""
+In-process index of the astrologer directory.
+
+Verified astrologers are loaded once per process into a ``DirectoryIndex``:
+
+- the serialized listing row of every astrologer (status excluded, it
+  comes from the presence registry at request time);
+- inverted posting lists: profile ids per expertise and per language;
+- profile ids pre-sorted for every supported ``order``.
+
+A listing request is then a set intersection of posting lists, a walk of
+one pre-sorted id tuple for the requested page, and facet counts computed
+as intersections with the result set. No query touches the database.
+
+Saving or deleting a profile (or an astrologer's user) bumps a version
+key in the shared cache after commit; each process rebuilds its index on
+the next request that sees a new version.
+"""
+import threading
+import uuid
+from collections import defaultdict
+from itertools import islice
+
+from django.core.cache import cache
+
+from . import presence
+from .models import AstrologerProfile
+from .serializers import AstrologerListSerializer
+
+VERSION_KEY = 'astrologer_directory:version'
+
+FACETS = ('expertise', 'languages')
+
+# order parameter -> sort key; ties broken by id. None is the fallback order.
+ORDERINGS = {
+    'rating': lambda profile: (profile.rating, profile.id),
+    '-rating': lambda profile: (-profile.rating, profile.id),
+    'chat_rate': lambda profile: (profile.chat_rate, profile.id),
+    '-chat_rate': lambda profile: (-profile.chat_rate, profile.id),
+    'experience_years': lambda profile: (profile.experience_years, profile.id),
+    None: lambda profile: profile.id,
+}
+
+
+class DirectoryEntrySerializer(AstrologerListSerializer):
+    """Listing row without the live status."""
+    status = None
+
+    class Meta(AstrologerListSerializer.Meta):
+        fields = [field for field in AstrologerListSerializer.Meta.fields if field != 'status']
+
+
+class DirectoryIndex:
+    """Immutable snapshot of the directory; build a new one to refresh."""
+
+    def __init__(self, profiles):
+        profiles = list(profiles)
+        self.rows = {}
+        self.user_ids = {}
+        postings = {facet: defaultdict(set) for facet in FACETS}
+        for profile, row in zip(profiles, DirectoryEntrySerializer(profiles, many=True).data):
+            self.rows[profile.id] = row
+            self.user_ids[profile.id] = profile.user_id
+            for facet in FACETS:
+                for value in getattr(profile, facet) or ():
+                    postings[facet][value].add(profile.id)
+        self.postings = {
+            facet: {value: frozenset(ids) for value, ids in values.items()}
+            for facet, values in postings.items()
+        }
+        self.all_ids = frozenset(self.rows)
+        self.orderings = {
+            order: tuple(profile.id for profile in sorted(profiles, key=key))
+            for order, key in ORDERINGS.items()
+        }
+
+    def search(self, expertise=None, language=None, online=False, order='-rating', offset=0, limit=20):
+        """
+        One page of the directory: ``{'count', 'results', 'facets'}``.
+        Facets count expertise/language values among all matches.
+        """
+        sets = []
+        if expertise:
+            sets.append(self.postings['expertise'].get(expertise, frozenset()))
+        if language:
+            sets.append(self.postings['languages'].get(language, frozenset()))
+        if sets:
+            sets.sort(key=len)
+            matched = sets[0].intersection(*sets[1:])
+        else:
+            matched = self.all_ids
+
+        statuses = None
+        if online:
+            statuses = presence.statuses(self.user_ids[profile_id] for profile_id in matched)
+            matched = frozenset(
+                profile_id for profile_id in matched
+                if statuses[self.user_ids[profile_id]] == presence.ONLINE
+            )
+
+        ordered = self.orderings.get(order, self.orderings[None])
+        if len(matched) == len(self.all_ids):
+            page = ordered[offset:offset + limit]
+        else:
+            page = list(islice((profile_id for profile_id in ordered if profile_id in matched),
+                               offset, offset + limit))
+
+        if statuses is None:
+            statuses = presence.statuses(self.user_ids[profile_id] for profile_id in page)
+        results = [
+            {**self.rows[profile_id], 'status': statuses[self.user_ids[profile_id]]}
+            for profile_id in page
+        ]
+        return {
+            'count': len(matched),
+            'results': results,
+            'facets': {
+                facet: {
+                    value: count for value, ids in sorted(values.items())
+                    if (count := len(ids & matched))
+                }
+                for facet, values in self.postings.items()
+            },
+        }
+
+
+class AstrologerDirectory:
+    """Per-process holder of the current ``DirectoryIndex``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def get(self):
+        """The index, rebuilt first if a profile changed since it was built."""
+        version = cache.get(VERSION_KEY)
+        if self._index is None or version != self._version:
+            with self._lock:
+                if self._index is None or version != self._version:
+                    self._index = DirectoryIndex(
+                        AstrologerProfile.objects.filter(verification_status='verified').select_related('user')
+                    )
+                    self._version = version
+        return self._index
+
+    def invalidate(self):
+        """Make every process rebuild on its next request."""
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+directory = AstrologerDirectory()
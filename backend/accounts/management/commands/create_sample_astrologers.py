@@ -70,7 +70,6 @@ SAMPLE_ASTROLOGERS = [
         'chat_rate': 25.00,
         'call_rate': 40.00,
         'is_online': True,
-        'is_busy': True,
         'rating': 4.7,
         'total_consultations': 1800,
         'total_reviews': 320,
@@ -142,7 +141,6 @@ class Command(BaseCommand):
                     'chat_rate': data['chat_rate'],
                     'call_rate': data.get('call_rate', 20.00),
                     'is_online': data.get('is_online', False),
-                    'is_busy': data.get('is_busy', False),
                     'rating': data['rating'],
                     'total_consultations': data['total_consultations'],
                     'total_reviews': data['total_reviews'],
@@ -0,0 +1,34 @@
+"""
+Snapshot the presence registry into AstrologerProfile.is_online
+(see accounts.presence).
+Run: python manage.py sync_presence            # forever
+     python manage.py sync_presence --once     # a single snapshot, e.g. from cron
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts.presence import snapshot_presence
+
+
+class Command(BaseCommand):
+    help = 'Write astrologer presence from the registry to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds between snapshots (default PRESENCE_SNAPSHOT_SECONDS)')
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'PRESENCE_SNAPSHOT_SECONDS', 30)
+        while True:
+            started = time.monotonic()
+            close_old_connections()
+            written = snapshot_presence()
+            if written or options['once']:
+                self.stdout.write(f'Updated {written} astrologer profiles')
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
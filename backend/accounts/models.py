@@ -210,7 +210,7 @@ class AstrologerProfile(models.Model):
     
     @property
     def status(self):
-        """Return current availability status."""
+        """Availability as of the last presence snapshot (see accounts.presence)."""
         if not self.is_online:
             return 'offline'
         if self.is_busy:
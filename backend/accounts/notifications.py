@@ -0,0 +1,18 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .consumers import user_group_name
+
+
+def notify_user(user_id, payload):
+    """
+    Push a JSON payload to every open notification socket of a user.
+    Safe to call from sync code (views, signal handlers, worker threads).
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or user_id is None:
+        return
+    async_to_sync(channel_layer.group_send)(user_group_name(user_id), {
+        'type': 'notify',
+        'payload': payload,
+    })
@@ -0,0 +1,172 @@
+"""
+Astrologer presence registry.
+
+Whether an astrologer is online or busy lives in the Django cache (Redis
+in production, so every worker sees the same state), not in the database:
+
+- the astrologer app keeps ``ws/presence/`` open and sends a heartbeat
+  every ``PRESENCE_HEARTBEAT_SECONDS``; each one refreshes an entry that
+  expires after ``PRESENCE_TTL_SECONDS``, so a dropped connection turns
+  into "offline" without anyone writing anything;
+- the entry is "busy" while the astrologer says so over the socket
+  (``busy``) or while a consultation holds them (``engaged``, set by
+  consultations.dispatch when it claims them and cleared when it ends).
+
+``AstrologerProfile.is_online`` is only a snapshot for the admin and
+reporting: ``snapshot_presence`` writes the rows whose state changed with
+a few bulk UPDATEs (no ``updated_at`` bump), run every
+``PRESENCE_SNAPSHOT_SECONDS`` by ``python manage.py sync_presence``.
+``is_busy`` is not presence: it is the consultation claim itself.
+
+Every status change is published once to the ``FEED_GROUP`` channels group
+as ``[[profile_id, status], ...]``; directory clients subscribe through
+``ws/astrologers/presence/`` (consultations.consumers.PresenceFeedConsumer).
+Expired entries change nothing in the cache, so their "offline" goes out
+with the next snapshot.
+
+``became_accepting`` is sent (with ``user_id``) when an astrologer comes
+online or stops being busy by choice, so waiting customers can be handed
+over (consultations.waitlist).
+"""
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import Signal
+
+from .models import AstrologerProfile
+
+ONLINE, BUSY, OFFLINE = 'online', 'busy', 'offline'
+
+FEED_GROUP = 'astrologer_presence'
+
+became_accepting = Signal()
+
+
+def _key(user_id):
+    return f'presence:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'PRESENCE_TTL_SECONDS', 45)
+
+
+def publish(changes):
+    """Send ``[[profile_id, status], ...]`` to every feed viewer in one group_send."""
+    channel_layer = get_channel_layer()
+    if not changes or channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(FEED_GROUP, {
+        'type': 'presence_diff',
+        'changes': changes,
+    })
+
+
+def _save(user_id, state, before, was_accepting=True):
+    cache.set(_key(user_id), state, _ttl())
+    status = state_status(state)
+    if status != before:
+        publish([[state['profile'], status]])
+    if not was_accepting and not state['busy']:
+        became_accepting.send(sender=None, user_id=user_id)
+    return status
+
+
+def heartbeat(user_id, busy=None):
+    """Mark an astrologer online for another TTL; optionally set busy."""
+    state = cache.get(_key(user_id))
+    before = state_status(state)
+    was_accepting = state is not None and not state.get('busy')
+    if state is None:
+        profile_id, engaged = AstrologerProfile.objects.filter(
+            user_id=user_id
+        ).values_list('id', 'is_busy').first() or (None, False)
+        state = {'busy': False, 'engaged': engaged, 'profile': profile_id}
+    if busy is not None:
+        state['busy'] = bool(busy)
+    state['seen'] = time.time()
+    return _save(user_id, state, before, was_accepting)
+
+
+def set_busy(user_id, busy):
+    """Flag an online astrologer busy/free; returns False if they are offline."""
+    state = cache.get(_key(user_id))
+    if state is None:
+        return False
+    before = state_status(state)
+    was_accepting = not state.get('busy')
+    state['busy'] = bool(busy)
+    _save(user_id, state, before, was_accepting)
+    return True
+
+
+def set_engaged(user_id, engaged):
+    """Record that a consultation holds (or released) an online astrologer."""
+    state = cache.get(_key(user_id))
+    if state is None:
+        return
+    before = state_status(state)
+    state['engaged'] = bool(engaged)
+    _save(user_id, state, before)
+
+
+def go_offline(user_id):
+    state = cache.get(_key(user_id))
+    cache.delete(_key(user_id))
+    if state is not None:
+        publish([[state['profile'], OFFLINE]])
+
+
+def state_status(state):
+    if state is None:
+        return OFFLINE
+    return BUSY if state.get('busy') or state.get('engaged') else ONLINE
+
+
+def get_status(user_id):
+    return state_status(cache.get(_key(user_id)))
+
+
+def accepting(user_id):
+    """Online and not busy by their own choice (a consultation may still hold them)."""
+    state = cache.get(_key(user_id))
+    return state is not None and not state.get('busy')
+
+
+def statuses(user_ids):
+    """{user_id: status} for many astrologers with one cache round trip."""
+    user_ids = list(user_ids)
+    states = cache.get_many([_key(user_id) for user_id in user_ids])
+    return {user_id: state_status(states.get(_key(user_id))) for user_id in user_ids}
+
+
+def online_profiles():
+    """``[[profile_id, status], ...]`` of verified astrologers who are not offline."""
+    rows = list(AstrologerProfile.objects.filter(verification_status='verified').values_list('id', 'user_id'))
+    current = statuses(user_id for _, user_id in rows)
+    return [[profile_id, current[user_id]] for profile_id, user_id in rows if current[user_id] != OFFLINE]
+
+
+def snapshot_presence():
+    """
+    Copy registry state to the profile rows that differ and publish those
+    changes (this is where expiries reach the feed); returns rows written.
+    """
+    rows = list(AstrologerProfile.objects.values_list('id', 'user_id', 'is_online'))
+    current = statuses(user_id for _, user_id, _ in rows)
+
+    changes = {}
+    feed = []
+    for profile_id, user_id, is_online in rows:
+        status = current[user_id]
+        if (status != OFFLINE) != is_online:
+            changes.setdefault(not is_online, []).append(user_id)
+            feed.append([profile_id, status])
+
+    written = 0
+    for is_online, user_ids in changes.items():
+        written += AstrologerProfile.objects.filter(user_id__in=user_ids).update(is_online=is_online)
+    publish(feed)
+    return written
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import OTP, AstrologerProfile
+from . import presence
 
 User = get_user_model()
 
@@ -52,10 +53,25 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         fields = ['first_name', 'last_name', 'email', 'profile_pic', 'preferred_language']
 
 
-class AstrologerProfileSerializer(serializers.ModelSerializer):
+class PresenceStatusMixin:
+    """
+    Availability from the presence registry. Views serializing many profiles
+    pass ``context['presence']`` ({user_id: status}) fetched in one call.
+    """
+
+    def get_status(self, obj):
+        statuses = self.context.get('presence')
+        if statuses is not None and obj.user_id in statuses:
+            return statuses[obj.user_id]
+        return presence.get_status(obj.user_id)
+
+
+class AstrologerProfileSerializer(PresenceStatusMixin, serializers.ModelSerializer):
     """Serializer for astrologer profiles."""
     user = UserSerializer(read_only=True)
-    status = serializers.CharField(read_only=True)
+    status = serializers.SerializerMethodField()
+    is_online = serializers.SerializerMethodField()
+    is_busy = serializers.SerializerMethodField()
     
     class Meta:
         model = AstrologerProfile
@@ -67,13 +83,19 @@ class AstrologerProfileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'rating', 'total_consultations', 'total_reviews', 'verification_status']
 
+    def get_is_online(self, obj):
+        return self.get_status(obj) != presence.OFFLINE
+
+    def get_is_busy(self, obj):
+        return self.get_status(obj) == presence.BUSY
+
 
-class AstrologerListSerializer(serializers.ModelSerializer):
+class AstrologerListSerializer(PresenceStatusMixin, serializers.ModelSerializer):
     """Compact serializer for astrologer listing."""
     phone_number = serializers.CharField(source='user.phone_number', read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     profile_pic = serializers.ImageField(source='user.profile_pic', read_only=True)
-    status = serializers.CharField(read_only=True)
+    status = serializers.SerializerMethodField()
     
     class Meta:
         model = AstrologerProfile
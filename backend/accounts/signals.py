@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .directory import directory
+from .models import AstrologerProfile
+
+User = get_user_model()
+
+# User fields that appear in listing rows
+LISTED_USER_FIELDS = {'phone_number', 'first_name', 'profile_pic'}
+
+
+@receiver(post_save, sender=AstrologerProfile)
+@receiver(post_delete, sender=AstrologerProfile)
+def refresh_directory(sender, instance, **kwargs):
+    """Profile changes rebuild the directory index once committed."""
+    transaction.on_commit(directory.invalidate)
+
+
+@receiver(post_save, sender=User)
+def refresh_directory_for_user(sender, instance, update_fields=None, **kwargs):
+    """Listing rows include the user's name, phone number and picture."""
+    if update_fields is not None and not LISTED_USER_FIELDS.intersection(update_fields):
+        return
+    if instance.is_astrologer:
+        transaction.on_commit(directory.invalidate)
@@ -3,6 +3,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
 from .models import OTP, AstrologerProfile
@@ -12,9 +13,10 @@ from .serializers import (
     UserSerializer,
     UserUpdateSerializer,
     AstrologerProfileSerializer,
-    AstrologerListSerializer
 )
+from .directory import directory
 from .services import send_otp_sms
+from . import presence
 
 User = get_user_model()
 
@@ -123,37 +125,34 @@ class MeView(APIView):
 
 
 class AstrologerListView(APIView):
-    """List all verified astrologers with filters."""
+    """
+    List verified astrologers with filters, facet counts and pagination,
+    served from the in-process directory index (accounts.directory).
+
+    Query params: expertise, language, online=true, order, limit, offset.
+    """
     permission_classes = [AllowAny]
     
     def get(self, request):
-        queryset = AstrologerProfile.objects.filter(
-            verification_status='verified'
-        ).select_related('user')
-        
-        # Filters
-        expertise = request.query_params.get('expertise')
-        if expertise:
-            queryset = queryset.filter(expertise__contains=[expertise])
-        
-        language = request.query_params.get('language')
-        if language:
-            queryset = queryset.filter(languages__contains=[language])
-        
-        is_online = request.query_params.get('online')
-        if is_online == 'true':
-            queryset = queryset.filter(is_online=True, is_busy=False)
-        
-        # Ordering
-        order = request.query_params.get('order', '-rating')
-        if order in ['rating', '-rating', 'chat_rate', '-chat_rate', 'experience_years']:
-            queryset = queryset.order_by(order)
+        params = request.query_params
+        default = getattr(settings, 'ASTROLOGER_DIRECTORY_PAGE_SIZE', 20)
+        maximum = getattr(settings, 'ASTROLOGER_DIRECTORY_MAX_PAGE_SIZE', 100)
+        try:
+            limit = max(1, min(int(params.get('limit', default)), maximum))
+            offset = max(0, int(params.get('offset', 0)))
+        except ValueError:
+            return Response({
+                'error': 'limit and offset must be integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = AstrologerListSerializer(queryset, many=True)
-        return Response({
-            'count': queryset.count(),
-            'results': serializer.data
-        })
+        return Response(directory.get().search(
+            expertise=params.get('expertise'),
+            language=params.get('language'),
+            online=params.get('online') == 'true',
+            order=params.get('order', '-rating'),
+            offset=offset,
+            limit=limit,
+        ))
 
 
 class AstrologerDetailView(APIView):
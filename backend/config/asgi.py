@@ -9,11 +9,12 @@ django_asgi_app = get_asgi_application()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from accounts import routing as accounts_routing
 from consultations import routing
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
-        URLRouter(routing.websocket_urlpatterns)
+        URLRouter(routing.websocket_urlpatterns + accounts_routing.websocket_urlpatterns)
     ),
 })
\ No newline at end of file
@@ -121,6 +121,81 @@ OTP_LENGTH = 6
 # Astrology API
 ASTRO_API_KEY = os.environ.get('ASTRO_API_KEY', '')
 
+# Kundli chart cache (in-process LRU entries per worker)
+KUNDLI_CHART_CACHE_SIZE = 2048
+KUNDLI_BATCH_MAX_SIZE = 100
+KUNDLI_MATCH_MAX_RESULTS = 100
+# Users whose chart arrays each process keeps for matchmaking
+KUNDLI_MATCH_INDEX_USERS = 1024
+
+# Daily horoscopes (materialized per local day)
+HOROSCOPE_LANGUAGES = ['en', 'hi']
+HOROSCOPE_TIME_ZONE = 'Asia/Kolkata'
+
+# Precomputed ephemeris (python manage.py build_ephemeris_table)
+KUNDLI_EPHEMERIS_TABLE = os.environ.get('KUNDLI_EPHEMERIS_TABLE', str(BASE_DIR / 'data' / 'ephemeris.bin'))
+
+# Kundli report rendering processes (defaults to one per CPU core)
+KUNDLI_REPORT_WORKERS = int(os.environ.get('KUNDLI_REPORT_WORKERS', 0)) or None
+
+# Offline gazetteer (python manage.py build_place_index)
+KUNDLI_PLACES_SOURCE = os.environ.get('KUNDLI_PLACES_SOURCE', str(BASE_DIR / 'kundli' / 'data' / 'places.tsv'))
+KUNDLI_COUNTRIES_SOURCE = os.environ.get('KUNDLI_COUNTRIES_SOURCE', str(BASE_DIR / 'kundli' / 'data' / 'countries.tsv'))
+KUNDLI_PLACES_INDEX = os.environ.get('KUNDLI_PLACES_INDEX', str(BASE_DIR / 'data' / 'places.bin'))
+
+# Chat write-behind: broadcast first, persist in batches (consultations.write_behind)
+CHAT_WRITE_BEHIND = os.environ.get('CHAT_WRITE_BEHIND', 'False').lower() in ('1', 'true', 'yes')
+CHAT_WRITE_BEHIND_INTERVAL_MS = int(os.environ.get('CHAT_WRITE_BEHIND_INTERVAL_MS', 50))
+CHAT_WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('CHAT_WRITE_BEHIND_BATCH_SIZE', 200))
+# Required with write-behind: unique per process (0-63), it keeps message ids unique
+CHAT_WORKER_ID = int(os.environ['CHAT_WORKER_ID']) if os.environ.get('CHAT_WORKER_ID') else None
+
+# Consultation participant ids cached for WebSocket/REST authorization (seconds)
+CHAT_PARTICIPANT_CACHE_TTL = 3600
+
+# Chat history pages (consultations.pagination)
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+# Latest messages embedded in the consultation detail response
+CONSULTATION_MESSAGE_WINDOW = 50
+
+# Typing indicators: hold "stopped" this long, auto-stop after this long idle
+CHAT_TYPING_STOP_DEBOUNCE_MS = 1000
+CHAT_TYPING_TIMEOUT_MS = 5000
+
+# Billing meter (python manage.py run_billing_meter)
+BILLING_TICK_SECONDS = 10
+BILLING_LOW_BALANCE_MINUTES = 3
+
+# Cold chat archival (python manage.py archive_chat_messages)
+CHAT_ARCHIVE_AFTER_DAYS = 90
+
+# Astrologer presence (accounts.presence): heartbeat over ws/presence/, entry
+# expires after the TTL; DB flags snapshotted by python manage.py sync_presence
+PRESENCE_HEARTBEAT_SECONDS = 15
+PRESENCE_TTL_SECONDS = 45
+PRESENCE_SNAPSHOT_SECONDS = 30
+# Status changes sent to ws/astrologers/presence/ viewers are batched per window
+PRESENCE_FEED_BATCH_MS = 500
+
+# Astrologer listing pages (served from accounts.directory)
+ASTROLOGER_DIRECTORY_PAGE_SIZE = 20
+ASTROLOGER_DIRECTORY_MAX_PAGE_SIZE = 100
+
+# Consultation routing queue (python manage.py run_dispatcher)
+ROUTING_RESYNC_SECONDS = 10
+# Consultations never started within this release their astrologer (seconds)
+CONSULTATION_PENDING_TIMEOUT_SECONDS = 300
+
+# Per-astrologer waitlists (consultations.waitlist): estimates use the mean
+# length of the last WAITLIST_AVERAGE_OVER sessions, clients refresh them
+# (and renew their entry) every WAITLIST_REFRESH_SECONDS; entries not renewed
+# for WAITLIST_ENTRY_TTL_SECONDS are dropped
+WAITLIST_AVERAGE_OVER = 20
+WAITLIST_DEFAULT_MINUTES = 10
+WAITLIST_REFRESH_SECONDS = 30
+WAITLIST_ENTRY_TTL_SECONDS = 90
+
 # MSG91 OTP Settings
 MSG91_AUTH_KEY = os.environ.get('MSG91_AUTH_KEY', '')
 MSG91_TEMPLATE_ID = os.environ.get('MSG91_TEMPLATE_ID', '')
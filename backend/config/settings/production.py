@@ -38,6 +38,14 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache: presence registry, chat participant cache
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get('REDIS_URL', 'redis://localhost:6379'),
+    },
+}
+
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Consultation, ChatMessage
+from .models import Consultation, ChatMessage, ChatArchive, RoutingRequest
+from .search import message_filter
 
 
 @admin.register(Consultation)
@@ -32,9 +33,35 @@ class ConsultationAdmin(admin.ModelAdmin):
 class ChatMessageAdmin(admin.ModelAdmin):
     list_display = ['id', 'consultation', 'sender', 'message_preview', 'is_read', 'created_at']
     list_filter = ['is_read', 'created_at']
-    search_fields = ['message', 'sender__phone_number']
+    # Message text is searched through the full-text index, see get_search_results
+    search_fields = ['sender__phone_number']
     readonly_fields = ['created_at']
     
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            results = results | queryset.filter(message_filter(search_term))
+        return results, may_have_duplicates
+    
     def message_preview(self, obj):
         return obj.message[:50] + '...' if len(obj.message) > 50 else obj.message
     message_preview.short_description = 'Message'
+
+
+@admin.register(ChatArchive)
+class ChatArchiveAdmin(admin.ModelAdmin):
+    list_display = ['consultation', 'message_count', 'raw_bytes', 'compressed_bytes', 'archive_ratio', 'pack_ms', 'archived_at']
+    exclude = ['data']
+    readonly_fields = ['consultation', 'message_count', 'raw_bytes', 'compressed_bytes', 'pack_ms', 'archived_at']
+    
+    def archive_ratio(self, obj):
+        return f'{obj.ratio:.3f}'
+    archive_ratio.short_description = 'Ratio'
+
+
+@admin.register(RoutingRequest)
+class RoutingRequestAdmin(admin.ModelAdmin):
+    list_display = ['id', 'customer', 'consultation_type', 'expertise', 'language', 'max_rate', 'status', 'created_at']
+    list_filter = ['status', 'consultation_type']
+    search_fields = ['customer__phone_number']
+    readonly_fields = ['created_at', 'matched_at', 'consultation']
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ConsultationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'consultations'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals, waitlist  # noqa: F401
+        from .search import ensure_sqlite_triggers
+
+        post_migrate.connect(ensure_sqlite_triggers, sender=self)
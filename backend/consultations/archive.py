@@ -0,0 +1,167 @@
+"""
+Cold archival of chat messages.
+
+Messages of consultations completed more than ``CHAT_ARCHIVE_AFTER_DAYS``
+ago are packed into one ``ChatArchive`` row per consultation
+(zlib-compressed JSON lines in (created_at, id) order) and their hot rows
+are deleted, which also drops them from the full-text index. Messages that
+arrive after archival stay hot and are folded in by the next run.
+
+Readers never load a whole blob: archives are fetched with ``data``
+deferred and ``iter_archived_messages`` reads it ``READ_CHUNK`` bytes per
+query (SQL ``SUBSTR``), decompressing as it goes and yielding unsaved
+``ChatMessage`` instances, so paging through an archive holds one chunk
+and the page in memory.
+
+Run: python manage.py archive_chat_messages --days 90
+"""
+import json
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from .models import ChatArchive, ChatMessage, Consultation
+
+READ_CHUNK = 64 * 1024
+DELETE_BATCH = 500
+
+
+def _record(message):
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'message': message.message,
+        'is_read': message.is_read,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def _message(archive, line):
+    record = json.loads(line)
+    record['created_at'] = datetime.fromisoformat(record['created_at'])
+    return ChatMessage(consultation_id=archive.consultation_id, **record)
+
+
+def _archives():
+    return ChatArchive.objects.defer('data')
+
+
+def _read_chunks(archive):
+    """The compressed blob, ``READ_CHUNK`` bytes per query."""
+    rows = ChatArchive.objects.filter(pk=archive.pk)
+    for offset in range(0, archive.compressed_bytes, READ_CHUNK):
+        chunk = rows.annotate(chunk=Substr('data', offset + 1, READ_CHUNK)).values_list('chunk', flat=True).first()
+        if not chunk:
+            return
+        yield bytes(chunk)
+
+
+def iter_archived_messages(archive):
+    """Stream-decompress an archive into unsaved ChatMessage instances."""
+    decompressor = zlib.decompressobj()
+    pending = b''
+    for chunk in _read_chunks(archive):
+        pending += decompressor.decompress(chunk)
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield _message(archive, line)
+    pending += decompressor.flush()
+    if pending.strip():
+        yield _message(archive, pending)
+
+
+def consultation_messages(consultation):
+    """Archived then hot messages of a consultation, oldest first, as an iterator."""
+    hot = ChatMessage.objects.filter(consultation=consultation).order_by('created_at', 'id').iterator()
+    archive = _archives().filter(consultation=consultation).first() if consultation.messages_archived else None
+    return chain(iter_archived_messages(archive), hot) if archive else hot
+
+
+def archived_messages(consultation, last=None):
+    """
+    Archived messages of a consultation (the ``last`` n only, if given) with
+    ``consultation`` and ``sender`` set from the consultation's participants.
+    """
+    archive = _archives().filter(consultation=consultation).first()
+    if archive is None:
+        return []
+    messages = iter_archived_messages(archive)
+    messages = list(deque(messages, maxlen=last)) if last is not None else list(messages)
+    for message in messages:
+        message.consultation = consultation
+        message.sender = consultation.customer if message.sender_id == consultation.customer_id else consultation.astrologer
+    return messages
+
+
+def archivable_consultations(days=None):
+    """Completed consultations older than ``days`` that still have hot messages."""
+    days = getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 90) if days is None else days
+    return Consultation.objects.filter(
+        status=Consultation.Status.COMPLETED,
+        ended_at__lt=timezone.now() - timedelta(days=days),
+    ).filter(
+        Exists(ChatMessage.objects.filter(consultation=OuterRef('pk')))
+    )
+
+
+def archive_consultation(consultation_id):
+    """Pack (or re-pack) a consultation's messages and delete the hot rows."""
+    started = time.perf_counter()
+    with transaction.atomic():
+        consultation = Consultation.objects.select_for_update().get(pk=consultation_id)
+        existing = _archives().filter(consultation=consultation).first()
+        hot = ChatMessage.objects.filter(consultation=consultation).order_by('created_at', 'id')
+
+        compressor = zlib.compressobj(9)
+        chunks = []
+        count = raw_bytes = 0
+
+        def pack(message):
+            nonlocal count, raw_bytes
+            line = json.dumps(_record(message), ensure_ascii=False).encode() + b'\n'
+            raw_bytes += len(line)
+            count += 1
+            chunks.append(compressor.compress(line))
+
+        if existing is not None:
+            for message in iter_archived_messages(existing):
+                pack(message)
+        hot_ids = []
+        for message in hot.iterator():
+            hot_ids.append(message.pk)
+            pack(message)
+        chunks.append(compressor.flush())
+        if not hot_ids:
+            return existing
+
+        data = b''.join(chunks)
+        archive, _ = ChatArchive.objects.update_or_create(consultation=consultation, defaults={
+            'data': data,
+            'message_count': count,
+            'raw_bytes': raw_bytes,
+            'compressed_bytes': len(data),
+            'pack_ms': round((time.perf_counter() - started) * 1000),
+        })
+        for offset in range(0, len(hot_ids), DELETE_BATCH):
+            ChatMessage.objects.filter(id__in=hot_ids[offset:offset + DELETE_BATCH]).delete()
+        Consultation.objects.filter(pk=consultation.pk).update(messages_archived=True)
+    return archive
+
+
+def archive_stats():
+    """Totals over all archives: messages, raw/compressed bytes, ratio, pack time."""
+    totals = ChatArchive.objects.aggregate(
+        archives=Count('id'), messages=Sum('message_count'), raw_bytes=Sum('raw_bytes'),
+        compressed_bytes=Sum('compressed_bytes'), pack_ms=Sum('pack_ms'),
+    )
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals['ratio'] = totals['compressed_bytes'] / totals['raw_bytes'] if totals['raw_bytes'] else 0.0
+    return totals
@@ -0,0 +1,167 @@
+"""
+Per-minute billing meter for active consultations.
+
+Each active consultation carries ``next_charge_at``, the moment its next
+minute is complete. A tick charges every due consultation at once with a
+fixed number of statements regardless of how many sessions are running:
+
+1. one UPDATE on ``consultations`` advances ``billed_minutes`` and
+   ``next_charge_at`` by a minute and adds ``rate_per_minute`` to
+   ``total_cost`` unless the minute is still covered by
+   ``free_minutes_used``; the rows are tagged with the tick time;
+2. one UPDATE on ``users`` debits each customer the sum of their tagged
+   consultations' rates (``F()`` minus a correlated subquery), so several
+   concurrent sessions of one customer are charged together.
+
+Both run in one transaction. A meter that fell behind catches up one
+minute per tick. ``Consultation.end_session`` settles whatever was not
+metered yet, under a row lock.
+
+After charging, customers whose balance covers fewer than
+``BILLING_LOW_BALANCE_MINUTES`` paid minutes are warned over the chat
+WebSocket, once per drop below that line (a cache key per consultation
+remembers the warning until a top-up lifts the balance back over it), and
+sessions whose next paid minute the wallet cannot cover
+are ended. Run the meter with ``python manage.py run_billing_meter``.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Consultation
+
+User = get_user_model()
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+# Outlives any session; the key is also dropped as soon as the balance recovers
+LOW_BALANCE_WARNING_TTL = 24 * 60 * 60
+
+
+def send_billing_event(consultation_id, event, **data):
+    """Push a billing event to the consultation's chat group."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(f'chat_{consultation_id}', {
+        'type': 'billing_event',
+        'event': event,
+        **data,
+    })
+
+
+def charge_due_minutes(now):
+    """Charge one minute on every due consultation; returns how many were charged."""
+    due = Consultation.objects.filter(
+        status=Consultation.Status.ACTIVE, next_charge_at__lte=now
+    )
+    with transaction.atomic():
+        # Right-hand sides see the old billed_minutes: the minute being charged
+        # is paid once the free minutes are used up
+        charged = due.update(
+            billed_minutes=F('billed_minutes') + 1,
+            next_charge_at=F('next_charge_at') + timedelta(minutes=1),
+            total_cost=F('total_cost') + Case(
+                When(billed_minutes__gte=F('free_minutes_used'), then=F('rate_per_minute')),
+                default=Value(Decimal('0')),
+                output_field=MONEY,
+            ),
+            last_billed_at=now,
+        )
+        if charged:
+            ticked = Consultation.objects.filter(
+                status=Consultation.Status.ACTIVE, last_billed_at=now
+            )
+            # New billed_minutes now: paid minutes are those past the free ones
+            owed = ticked.filter(
+                customer=OuterRef('pk'), billed_minutes__gt=F('free_minutes_used')
+            ).values('customer').annotate(total=Sum('rate_per_minute')).values('total')
+            User.objects.filter(id__in=ticked.values('customer_id')).update(
+                wallet_balance=F('wallet_balance') - Coalesce(
+                    Subquery(owed, output_field=MONEY), Value(Decimal('0')), output_field=MONEY
+                )
+            )
+    return charged
+
+
+def next_minute_is_paid():
+    return Consultation.objects.filter(
+        status=Consultation.Status.ACTIVE, billed_minutes__gte=F('free_minutes_used')
+    )
+
+
+def low_balance_key(consultation_id):
+    return f'billing:low_balance:{consultation_id}'
+
+
+def warn_low_balances(now):
+    """
+    Warn customers charged this tick whose balance just dropped to only a few
+    more minutes; returns how many were warned.
+    """
+    minutes = getattr(settings, 'BILLING_LOW_BALANCE_MINUTES', 3)
+    charged = list(next_minute_is_paid().filter(last_billed_at=now).values_list(
+        'id', 'customer_id', 'customer__wallet_balance', 'rate_per_minute'
+    ))
+    already = cache.get_many([low_balance_key(row[0]) for row in charged])
+
+    warned = {}
+    recovered = []
+    for consultation_id, customer_id, balance, rate in charged:
+        key = low_balance_key(consultation_id)
+        if balance >= rate * minutes:
+            if key in already:
+                recovered.append(key)
+        elif balance >= rate and key not in already:
+            # Below one minute the session is ended instead
+            send_billing_event(
+                consultation_id, 'low_balance',
+                customer_id=customer_id,
+                wallet_balance=str(balance),
+                minutes_left=int(balance // rate),
+            )
+            warned[key] = True
+    cache.set_many(warned, LOW_BALANCE_WARNING_TTL)
+    cache.delete_many(recovered)
+    return len(warned)
+
+
+def end_unaffordable_sessions():
+    """End sessions whose customer cannot pay for the next minute."""
+    broke = next_minute_is_paid().filter(
+        started_at__isnull=False,
+        customer__wallet_balance__lt=F('rate_per_minute'),
+    )
+    ended = 0
+    for consultation in broke:
+        consultation.end_session()
+        send_billing_event(
+            consultation.id, 'consultation_ended',
+            reason='insufficient_balance',
+            total_cost=str(consultation.total_cost),
+        )
+        ended += 1
+    return ended
+
+
+def tick(now=None):
+    """One meter pass; returns counts for logging."""
+    now = now or timezone.now()
+    stats = {
+        'charged': charge_due_minutes(now),
+        'warned': 0,
+        'ended': 0,
+    }
+    if stats['charged']:
+        stats['warned'] = warn_low_balances(now)
+    stats['ended'] = end_unaffordable_sessions()
+    return stats
@@ -1,8 +1,21 @@
+import asyncio
 import json
+import time
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Consultation, ChatMessage
+from django.utils import timezone
+from accounts import presence
+from .models import ChatMessage
+from .participants import get_participants
+from .protocol import ProtocolError, decode, negotiate
+from .receipts import mark_read_up_to, receipt_event
+from .typing_indicator import TypingCoalescer
+from . import waitlist
+from .write_behind import message_writer, snowflake, write_behind_enabled
 
 User = get_user_model()
 
@@ -10,7 +23,7 @@ User = get_user_model()
 class ChatConsumer(AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time chat in consultations.
-    Handles message sending, receiving, and typing indicators.
+    Handles message sending, receiving, typing indicators and read receipts.
     """
     
     async def connect(self):
@@ -31,33 +44,45 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        await self.accept()
+        # JSON frames unless the client negotiated the msgpack subprotocol
+        self.codec = negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=self.codec.subprotocol)
+        self.typing = TypingCoalescer(self.publish_typing)
         
         # Send connection success message
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'type': 'connection_established',
             'message': 'Connected to chat'
-        }))
+        })
     
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
+        if hasattr(self, 'typing'):
+            await self.typing.close()
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
     
-    async def receive(self, text_data):
-        """Handle incoming WebSocket messages."""
+    async def receive(self, text_data=None, bytes_data=None):
+        """Handle incoming WebSocket messages (JSON text or msgpack binary)."""
         try:
-            data = json.loads(text_data)
-            message_type = data.get('type')
-            
-            if message_type == 'chat_message':
-                await self.handle_chat_message(data)
-            elif message_type == 'typing':
-                await self.handle_typing_indicator(data)
-        except json.JSONDecodeError:
+            data = decode(text_data, bytes_data)
+        except ProtocolError:
             await self.send_error('Invalid message format')
+            return
+        message_type = data.get('type')
+        
+        if message_type == 'chat_message':
+            await self.handle_chat_message(data)
+        elif message_type == 'typing':
+            await self.handle_typing_indicator(data)
+        elif message_type == 'read_up_to':
+            await self.handle_read_up_to(data)
+    
+    async def send_event(self, event):
+        """Send one event in the connection's wire format."""
+        await self.send(**self.codec.encode(event))
     
     async def handle_chat_message(self, data):
         """Handle and broadcast chat messages."""
@@ -65,8 +90,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if not message_text:
             return
         
-        # Save message to database
-        message_obj = await self.save_message(message_text)
+        if write_behind_enabled():
+            # Broadcast now; the message is persisted by the batched flusher
+            message_obj = self.buffer_message(message_text)
+        else:
+            message_obj = await self.save_message(message_text)
         
         # Broadcast to room group
         await self.channel_layer.group_send(
@@ -84,9 +112,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
     
     async def handle_typing_indicator(self, data):
-        """Handle typing indicator."""
-        is_typing = data.get('is_typing', False)
-        
+        """Handle typing indicator; bursts are coalesced before broadcasting."""
+        await self.typing.update(bool(data.get('is_typing', False)))
+    
+    async def publish_typing(self, is_typing):
         # Broadcast typing status to others in room
         await self.channel_layer.group_send(
             self.room_group_name,
@@ -97,56 +126,273 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }
         )
     
+    async def handle_read_up_to(self, data):
+        """Mark messages read up to an id and broadcast one receipt."""
+        try:
+            message_id = int(data.get('message_id'))
+        except (TypeError, ValueError):
+            await self.send_error('message_id must be an integer')
+            return
+        
+        updated = await database_sync_to_async(mark_read_up_to)(
+            self.consultation_id, self.user.id, message_id
+        )
+        if updated:
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                receipt_event(self.user.id, message_id)
+            )
+    
     async def chat_message_broadcast(self, event):
         """Broadcast chat message to WebSocket."""
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'type': 'chat_message',
             'message': event['message']
-        }))
+        })
     
     async def typing_indicator_broadcast(self, event):
         """Broadcast typing indicator to WebSocket."""
         # Don't send typing indicator to the user who is typing
         if event['user_id'] != self.user.id:
-            await self.send(text_data=json.dumps({
+            await self.send_event({
                 'type': 'typing_indicator',
                 'is_typing': event['is_typing']
-            }))
+            })
+    
+    async def billing_event(self, event):
+        """Forward billing meter events; balance warnings go to the customer only."""
+        if event['event'] == 'low_balance' and event['customer_id'] != self.user.id:
+            return
+        payload = {key: value for key, value in event.items() if key not in ('type', 'event')}
+        await self.send_event({'type': event['event'], **payload})
+    
+    async def read_receipt_broadcast(self, event):
+        """Tell the other party how far their messages have been read."""
+        if event['reader_id'] != self.user.id:
+            await self.send_event({
+                'type': 'read_receipt',
+                'reader_id': event['reader_id'],
+                'message_id': event['message_id']
+            })
     
     async def send_error(self, error_message):
         """Send error message to client."""
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'type': 'error',
             'message': error_message
-        }))
+        })
     
     @database_sync_to_async
     def is_user_participant(self):
         """Check if user is participant in consultation."""
-        try:
-            consultation = Consultation.objects.get(id=self.consultation_id)
-            return self.user in [consultation.customer, consultation.astrologer]
-        except Consultation.DoesNotExist:
+        participants = get_participants(self.consultation_id)
+        if participants is None or not self.user.is_authenticated:
             return False
+        # Kept for the connection so messages need no further lookups
+        self.customer_id, self.astrologer_id = participants
+        return self.user.id in participants
     
-    @database_sync_to_async
-    def save_message(self, message_text):
-        """Save chat message to database."""
-        consultation = Consultation.objects.get(id=self.consultation_id)
-        message = ChatMessage.objects.create(
-            consultation=consultation,
-            sender=self.user,
-            message=message_text
+    def new_message(self, message_text, **fields):
+        """Unsaved message with a server-assigned timestamp."""
+        return ChatMessage(
+            consultation_id=int(self.consultation_id),
+            sender_id=self.user.id,
+            message=message_text,
+            created_at=timezone.now(),
+            **fields,
         )
-        
+    
+    def message_payload(self, message):
+        """Broadcast payload built from the connection's cached participants."""
         return {
             'id': message.id,
             'message': message.message,
             'sender': {
-                'id': message.sender.id,
-                'phone_number': message.sender.phone_number,
-                'first_name': message.sender.first_name,
+                'id': self.user.id,
+                'phone_number': self.user.phone_number,
+                'first_name': self.user.first_name,
             },
             'created_at': message.created_at.isoformat(),
-            'is_from_customer': message.is_from_customer,
+            'is_from_customer': self.user.id == self.customer_id,
+        }
+    
+    def buffer_message(self, message_text):
+        """Queue a chat message for write-behind persistence."""
+        message = self.new_message(message_text, id=snowflake.next_id())
+        message_writer.enqueue(message)
+        return self.message_payload(message)
+    
+    @database_sync_to_async
+    def save_message(self, message_text):
+        """Save chat message to database."""
+        message = self.new_message(message_text)
+        message.save()
+        return self.message_payload(message)
+
+
+class PresenceFeedConsumer(AsyncWebsocketConsumer):
+    """
+    Live availability for astrologer directory clients, instead of polling
+    the astrologer list.
+
+    Sends one snapshot of the astrologers who are not offline, then diffs:
+        {"type": "presence_snapshot", "astrologers": [[profile_id, status], ...]}
+        {"type": "presence_diff", "changes": [[profile_id, status], ...]}
+    Every viewer is in the one presence.FEED_GROUP; changes arriving within a
+    PRESENCE_FEED_BATCH_MS window are merged (last status wins) into one frame.
+    """
+
+    async def connect(self):
+        """Handle WebSocket connection."""
+        self.pending = {}
+        self.flush_task = None
+        self.batch = getattr(settings, 'PRESENCE_FEED_BATCH_MS', 500) / 1000.0
+        # Join before the snapshot so no change falls between the two
+        await self.channel_layer.group_add(presence.FEED_GROUP, self.channel_name)
+        await self.accept()
+        astrologers = await database_sync_to_async(presence.online_profiles)()
+        await self.send(text_data=json.dumps({
+            'type': 'presence_snapshot',
+            'astrologers': astrologers,
+        }))
+
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection."""
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        await self.channel_layer.group_discard(presence.FEED_GROUP, self.channel_name)
+
+    async def presence_diff(self, event):
+        """Buffer status changes for the current batch window."""
+        for profile_id, status in event['changes']:
+            self.pending[profile_id] = status
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_after(self.batch))
+
+    async def flush_after(self, delay):
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        changes, self.pending = self.pending, {}
+        await self.send(text_data=json.dumps({
+            'type': 'presence_diff',
+            'changes': [[profile_id, status] for profile_id, status in changes.items()],
+        }))
+
+
+class WaitlistConsumer(AsyncWebsocketConsumer):
+    """
+    Wait in line for a busy astrologer (consultations.waitlist). Connecting
+    joins the waitlist (?type=call for a call, chat otherwise); closing or
+    sending {"type": "leave"} leaves it.
+
+    Server sends:
+        {"type": "waitlist_position", "position": n, "queue_length": m, "eta_minutes": k}
+        {"type": "consultation_started", "consultation_id": id}  (then closes)
+    The estimate is recomputed every WAITLIST_REFRESH_SECONDS and sent if it
+    changed; each refresh also renews the entry, which expires otherwise.
+    """
+
+    async def connect(self):
+        """Handle WebSocket connection."""
+        self.astrologer_id = int(self.scope['url_route']['kwargs']['astrologer_id'])
+        self.user = self.scope['user']
+        self.joined = False
+        if not self.user.is_authenticated or self.user.id == self.astrologer_id:
+            await self.close()
+            return
+        if not await self.astrologer_exists():
+            await self.close()
+            return
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        consultation_type = 'call' if query.get('type') == ['call'] else 'chat'
+        self.group_name = waitlist.group_name(self.astrologer_id)
+        self.last_sent = None
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        try:
+            await database_sync_to_async(waitlist.join)(self.astrologer_id, self.user.id, consultation_type)
+        except waitlist.WaitlistBusy:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Waitlist busy, try again'}))
+            await self.close()
+            return
+        self.joined = True
+        self.state = await database_sync_to_async(waitlist.snapshot)(self.astrologer_id)
+        await self.send_position()
+        self.refresh_task = asyncio.ensure_future(self.refresh())
+
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection."""
+        if hasattr(self, 'refresh_task'):
+            self.refresh_task.cancel()
+        if self.joined:
+            await self.leave_waitlist()
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data):
+        """Handle a request to leave the waitlist."""
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Invalid JSON'}))
+            return
+        if data.get('type') == 'leave':
+            if self.joined:
+                self.joined = False
+                await self.leave_waitlist()
+            await self.close()
+        else:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Unknown message type'}))
+
+    async def leave_waitlist(self):
+        try:
+            await database_sync_to_async(waitlist.leave)(self.astrologer_id, self.user.id)
+        except waitlist.WaitlistBusy:
+            # The liveness key is gone already, so the entry is skipped and pruned
+            pass
+
+    async def refresh(self):
+        """Keep the entry alive and update the estimate as the current session goes on."""
+        interval = getattr(settings, 'WAITLIST_REFRESH_SECONDS', 30)
+        while True:
+            await asyncio.sleep(interval)
+            if self.joined:
+                await database_sync_to_async(waitlist.renew)(self.astrologer_id, self.user.id)
+            await self.send_position()
+
+    async def send_position(self):
+        queue = self.state['queue']
+        if self.user.id not in queue:
+            return
+        position = queue.index(self.user.id) + 1
+        update = {
+            'type': 'waitlist_position',
+            'astrologer_id': self.astrologer_id,
+            'position': position,
+            'queue_length': len(queue),
+            'eta_minutes': waitlist.estimate(self.state, position, time.time()),
         }
+        # Only changes are sent (our own join is also broadcast back to us)
+        if update != self.last_sent:
+            self.last_sent = update
+            await self.send(text_data=json.dumps(update))
+
+    async def waitlist_changed(self, event):
+        """New queue state: report our place, or the consultation if it is ours."""
+        started = event.get('started')
+        if started and started['customer_id'] == self.user.id:
+            self.joined = False
+            await self.send(text_data=json.dumps({
+                'type': 'consultation_started',
+                'consultation_id': started['consultation_id'],
+                'astrologer_id': self.astrologer_id,
+            }))
+            await self.close()
+            return
+        self.state = event
+        await self.send_position()
+
+    @database_sync_to_async
+    def astrologer_exists(self):
+        return User.objects.filter(id=self.astrologer_id, role='astrologer').exists()
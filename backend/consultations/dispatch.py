@@ -0,0 +1,373 @@
+"""
+Automatic routing of waiting customers to the best free astrologer.
+
+Customers join the queue with optional filters (``RoutingRequest``:
+expertise, language, max rate). ``python manage.py run_dispatcher`` keeps
+one ``Dispatcher`` in memory and matches on every event:
+
+- free astrologers are pushed on a heap for every (expertise, language)
+  pair they cover, "any" (None) included; heaps are ordered by rating
+  (best first), then load (consultations created with them today), then
+  how long they have been free;
+- waiting customers are pushed on the heap of their own (expertise,
+  language) filter, ordered by how long they have waited.
+
+A new request looks at one astrologer heap; a freed astrologer looks at
+the heads of the customer heaps for the pairs it covers. Both are heap
+operations, O(log n) in the number queued. Entries are invalidated lazily
+(popped when found stale at the head); entries over a customer's max rate
+stay in place and are walked past in heap order, without touching the
+heap. The heaps are rebuilt, which also drops stale entries, every
+``ROUTING_RESYNC_SECONDS``.
+
+Matching goes through ``start_consultation``, also used by
+StartConsultationView. It claims the astrologer with a conditional UPDATE
+of ``AstrologerProfile.is_busy``, so two customers never get the same
+astrologer. ``Consultation.end_session`` releases the claim, and so does
+``Consultation.cancel`` for consultations still pending (calls nobody
+started) after ``CONSULTATION_PENDING_TIMEOUT_SECONDS``, which every
+resync expires.
+
+Events arrive over the channel layer: new and cancelled requests on
+``DISPATCH_GROUP``, astrologers becoming free or unavailable on the
+presence feed group (accounts.presence). The periodic resync from the
+database and the presence registry covers events that never arrived,
+e.g. with the per-process in-memory channel layer of development.
+"""
+import asyncio
+import heapq
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import timedelta
+from itertools import product
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from accounts import presence
+from accounts.models import AstrologerProfile
+from accounts.notifications import notify_user
+from .models import Consultation, RoutingRequest
+
+DISPATCH_GROUP = 'consultation_dispatch'
+
+# Why start_consultation wrote nothing
+ASTROLOGER_TAKEN, REQUEST_GONE = 'astrologer_taken', 'request_gone'
+
+Candidate = namedtuple('Candidate', 'user_id profile_id rating expertise languages chat_rate call_rate')
+Ticket = namedtuple('Ticket', 'id customer_id consultation_type expertise language max_rate waiting_since')
+
+
+def claim_astrologer(astrologer_id):
+    """Mark a free astrologer busy; False if a consultation already holds them."""
+    return AstrologerProfile.objects.filter(
+        user_id=astrologer_id, is_busy=False
+    ).update(is_busy=True) == 1
+
+
+def start_consultation(customer_id, astrologer_id, consultation_type, routing_request_id=None):
+    """
+    Claim the astrologer and create the consultation (started right away for
+    chat) in one transaction, then notify over the notification sockets.
+
+    Returns ``(consultation, None)``, or ``(None, ASTROLOGER_TAKEN)`` /
+    ``(None, REQUEST_GONE)`` with nothing written.
+    """
+    with transaction.atomic():
+        if not claim_astrologer(astrologer_id):
+            return None, ASTROLOGER_TAKEN
+        if routing_request_id is not None and not RoutingRequest.objects.filter(
+            pk=routing_request_id, status=RoutingRequest.Status.WAITING
+        ).update(status=RoutingRequest.Status.MATCHED, matched_at=timezone.now()):
+            # Cancelled meanwhile: undo the claim
+            transaction.set_rollback(True)
+            return None, REQUEST_GONE
+
+        profile = AstrologerProfile.objects.get(user_id=astrologer_id)
+        first_consultation = not Consultation.objects.filter(customer_id=customer_id).exists()
+        consultation = Consultation.objects.create(
+            customer_id=customer_id,
+            astrologer_id=astrologer_id,
+            consultation_type=consultation_type,
+            rate_per_minute=profile.chat_rate if consultation_type == 'chat' else profile.call_rate,
+            free_minutes_used=5 if first_consultation else 0
+        )
+        # Auto-start chat sessions
+        if consultation_type == 'chat':
+            consultation.start_session()
+        if routing_request_id is not None:
+            RoutingRequest.objects.filter(pk=routing_request_id).update(consultation=consultation)
+        transaction.on_commit(lambda: _announce(consultation, routing_request_id))
+    return consultation, None
+
+
+def _announce(consultation, routing_request_id):
+    presence.set_engaged(consultation.astrologer_id, True)
+    notify_user(consultation.astrologer_id, {
+        'type': 'consultation_assigned',
+        'consultation_id': consultation.id,
+        'customer_id': consultation.customer_id,
+        'consultation_type': consultation.consultation_type,
+    })
+    if routing_request_id is not None:
+        notify_user(consultation.customer_id, {
+            'type': 'consultation_matched',
+            'routing_request_id': routing_request_id,
+            'consultation_id': consultation.id,
+            'astrologer_id': consultation.astrologer_id,
+        })
+
+
+def expire_pending_consultations(now=None):
+    """
+    Cancel consultations pending for longer than the timeout so their claim
+    does not hold the astrologer forever; returns how many were cancelled.
+    """
+    timeout = getattr(settings, 'CONSULTATION_PENDING_TIMEOUT_SECONDS', 300)
+    expired = Consultation.objects.filter(
+        status=Consultation.Status.PENDING,
+        created_at__lt=(now or timezone.now()) - timedelta(seconds=timeout),
+    )
+    cancelled = 0
+    for consultation in expired:
+        if consultation.cancel():
+            for user_id in (consultation.customer_id, consultation.astrologer_id):
+                notify_user(user_id, {'type': 'consultation_expired', 'consultation_id': consultation.id})
+            cancelled += 1
+    return cancelled
+
+
+def send_dispatch_event(event, **data):
+    """Tell the dispatcher about a new ('routing_request') or cancelled ('routing_cancel') request."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(DISPATCH_GROUP, {'type': event, **data})
+
+
+def load_candidates(**filters):
+    """Verified astrologers not held by a consultation, as Candidates."""
+    rows = AstrologerProfile.objects.filter(
+        verification_status='verified', is_busy=False, **filters
+    ).values_list('user_id', 'id', 'rating', 'expertise', 'languages', 'chat_rate', 'call_rate')
+    return [
+        Candidate(user_id, profile_id, rating, tuple(expertise or ()), tuple(languages or ()), chat_rate, call_rate)
+        for user_id, profile_id, rating, expertise, languages, chat_rate, call_rate in rows
+    ]
+
+
+def load_tickets(**filters):
+    """Waiting routing requests, oldest first, as Tickets."""
+    rows = RoutingRequest.objects.filter(status=RoutingRequest.Status.WAITING, **filters).order_by(
+        'created_at', 'id'
+    ).values_list('id', 'customer_id', 'consultation_type', 'expertise', 'language', 'max_rate', 'created_at')
+    return [
+        Ticket(request_id, customer_id, consultation_type, expertise or None, language or None,
+               max_rate, created_at.timestamp())
+        for request_id, customer_id, consultation_type, expertise, language, max_rate, created_at in rows
+    ]
+
+
+class Dispatcher:
+    """
+    Matching state. ``start(ticket, candidate)`` performs a match and returns
+    ``(consultation, reason)`` like ``start_consultation``.
+    """
+
+    def __init__(self, start=None):
+        self.start = start or (lambda ticket, candidate: start_consultation(
+            ticket.customer_id, candidate.user_id, ticket.consultation_type, ticket.id
+        ))
+        self.stats = Counter()
+        self.reset()
+
+    def reset(self):
+        self.candidates = {}                 # user_id -> Candidate
+        self.profile_users = {}              # profile_id -> user_id
+        self.free = {}                       # user_id -> version of its live heap entries
+        self.versions = Counter()
+        self.free_heaps = defaultdict(list)  # (expertise, language) -> [(-rating, load, free_since, user_id, version)]
+        self.tickets = {}                    # request_id -> waiting Ticket
+        self.waiting = defaultdict(list)     # (expertise, language) -> [(waiting_since, request_id)]
+        self.load = Counter()                # user_id -> consultations today
+
+    @staticmethod
+    def pairs(candidate):
+        return product((None, *candidate.expertise), (None, *candidate.languages))
+
+    @staticmethod
+    def affordable(ticket, candidate):
+        if ticket.max_rate is None:
+            return True
+        rate = candidate.chat_rate if ticket.consultation_type == 'chat' else candidate.call_rate
+        return rate <= ticket.max_rate
+
+    @staticmethod
+    def first(heap, valid, acceptable):
+        """
+        Best entry that is valid and acceptable. Invalid heads are dropped;
+        past them the heap is searched best-first through a small frontier of
+        indices (a node's children are never better than it), so skipping k
+        entries costs O(k log k) and leaves the heap as it was.
+        """
+        while heap and not valid(heap[0]):
+            heapq.heappop(heap)
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, index = heapq.heappop(frontier)
+            if valid(entry) and acceptable(entry):
+                return entry
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return None
+
+    def best_candidate(self, ticket):
+        heap = self.free_heaps.get((ticket.expertise, ticket.language))
+        if not heap:
+            return None
+        entry = self.first(
+            heap,
+            lambda entry: self.free.get(entry[3]) == entry[4],
+            lambda entry: self.affordable(ticket, self.candidates[entry[3]]),
+        )
+        return self.candidates[entry[3]] if entry else None
+
+    def oldest_ticket(self, candidate):
+        best = None
+        for pair in self.pairs(candidate):
+            heap = self.waiting.get(pair)
+            if not heap:
+                continue
+            entry = self.first(
+                heap,
+                lambda entry: entry[1] in self.tickets,
+                lambda entry: self.affordable(self.tickets[entry[1]], candidate),
+            )
+            if entry is not None and (best is None or entry < best):
+                best = entry
+        return self.tickets[best[1]] if best else None
+
+    def matched(self, ticket, candidate):
+        self.tickets.pop(ticket.id, None)
+        self.free.pop(candidate.user_id, None)
+        self.load[candidate.user_id] += 1
+        self.stats['matched'] += 1
+
+    def push_free(self, candidate, free_since=None):
+        user_id = candidate.user_id
+        self.versions[user_id] += 1
+        version = self.free[user_id] = self.versions[user_id]
+        entry = (-candidate.rating, self.load[user_id], free_since or time.time(), user_id, version)
+        for pair in self.pairs(candidate):
+            heapq.heappush(self.free_heaps[pair], entry)
+
+    def astrologer_free(self, candidate):
+        """An astrologer became available: give them the longest waiting customer they suit."""
+        self.candidates[candidate.user_id] = candidate
+        self.profile_users[candidate.profile_id] = candidate.user_id
+        if candidate.user_id in self.free:
+            return None
+        while True:
+            ticket = self.oldest_ticket(candidate)
+            if ticket is None:
+                break
+            consultation, reason = self.start(ticket, candidate)
+            if consultation is not None:
+                self.matched(ticket, candidate)
+                return consultation
+            if reason == ASTROLOGER_TAKEN:
+                return None
+            self.tickets.pop(ticket.id, None)
+        self.push_free(candidate)
+        return None
+
+    def astrologer_unavailable(self, user_id):
+        self.free.pop(user_id, None)
+
+    def request_added(self, ticket):
+        """A customer joined: match them with the best free astrologer, or queue them."""
+        if ticket.id in self.tickets:
+            return None
+        while True:
+            candidate = self.best_candidate(ticket)
+            if candidate is None:
+                break
+            consultation, reason = self.start(ticket, candidate)
+            if consultation is not None:
+                self.matched(ticket, candidate)
+                return consultation
+            if reason == REQUEST_GONE:
+                return None
+            self.astrologer_unavailable(candidate.user_id)
+        self.tickets[ticket.id] = ticket
+        heapq.heappush(self.waiting[(ticket.expertise, ticket.language)], (ticket.waiting_since, ticket.id))
+        return None
+
+    def request_removed(self, request_id):
+        self.tickets.pop(request_id, None)
+
+    def resync(self):
+        """Rebuild from the database and the presence registry, then match what can be."""
+        close_old_connections()
+        self.stats['expired'] += expire_pending_consultations()
+        candidates = load_candidates()
+        statuses = presence.statuses(candidate.user_id for candidate in candidates)
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        load = Consultation.objects.filter(created_at__gte=today).values('astrologer_id').annotate(
+            count=Count('id')
+        ).values_list('astrologer_id', 'count')
+
+        self.reset()
+        self.load.update(dict(load))
+        for candidate in candidates:
+            self.candidates[candidate.user_id] = candidate
+            self.profile_users[candidate.profile_id] = candidate.user_id
+            if statuses[candidate.user_id] == presence.ONLINE:
+                self.push_free(candidate)
+        for ticket in load_tickets():
+            self.request_added(ticket)
+        self.stats['resyncs'] += 1
+
+    def handle(self, message):
+        """Apply one channel layer event."""
+        close_old_connections()
+        kind = message.get('type')
+        if kind == 'routing_request':
+            for ticket in load_tickets(pk=message['id']):
+                self.request_added(ticket)
+        elif kind == 'routing_cancel':
+            self.request_removed(message['id'])
+        elif kind == 'presence_diff':
+            for profile_id, status in message['changes']:
+                if status == presence.ONLINE:
+                    for candidate in load_candidates(pk=profile_id):
+                        self.astrologer_free(candidate)
+                elif profile_id in self.profile_users:
+                    self.astrologer_unavailable(self.profile_users[profile_id])
+
+
+async def run(dispatcher, resync_seconds=None):
+    """Serve channel layer events forever, resyncing periodically."""
+    resync_seconds = resync_seconds or getattr(settings, 'ROUTING_RESYNC_SECONDS', 10)
+    channel_layer = get_channel_layer()
+    channel = await channel_layer.new_channel()
+    next_resync = 0.0
+    while True:
+        now = time.monotonic()
+        if now >= next_resync:
+            # Group membership expires on the Redis layer; renew it with each resync
+            await channel_layer.group_add(DISPATCH_GROUP, channel)
+            await channel_layer.group_add(presence.FEED_GROUP, channel)
+            await sync_to_async(dispatcher.resync)()
+            next_resync = now + resync_seconds
+            continue
+        try:
+            message = await asyncio.wait_for(channel_layer.receive(channel), next_resync - now)
+        except asyncio.TimeoutError:
+            continue
+        await sync_to_async(dispatcher.handle)(message)
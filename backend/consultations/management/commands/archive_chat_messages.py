@@ -0,0 +1,51 @@
+"""
+Move messages of long-completed consultations into compressed archives.
+Run: python manage.py archive_chat_messages --days 90
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from consultations.archive import archivable_consultations, archive_consultation, archive_stats
+
+
+class Command(BaseCommand):
+    help = 'Archive chat messages of consultations completed more than N days ago'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Age in days after completion (default CHAT_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--limit', type=int, default=None, help='Archive at most this many consultations')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 90)
+        ids = archivable_consultations(days).order_by('ended_at').values_list('id', flat=True)
+        if options['limit']:
+            ids = ids[:options['limit']]
+        ids = list(ids)
+        if options['dry_run']:
+            self.stdout.write(f'{len(ids)} consultations would be archived')
+            return
+
+        started = time.perf_counter()
+        messages = raw_bytes = compressed_bytes = 0
+        for consultation_id in ids:
+            archive = archive_consultation(consultation_id)
+            if archive is not None:
+                messages += archive.message_count
+                raw_bytes += archive.raw_bytes
+                compressed_bytes += archive.compressed_bytes
+        elapsed = time.perf_counter() - started
+
+        ratio = compressed_bytes / raw_bytes if raw_bytes else 0.0
+        self.stdout.write(
+            f'Archived {len(ids)} consultations ({messages} messages, '
+            f'{raw_bytes} -> {compressed_bytes} bytes, ratio {ratio:.3f}) in {elapsed:.2f}s'
+        )
+        totals = archive_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"All archives: {totals['archives']} consultations, {totals['messages']} messages, "
+            f"ratio {totals['ratio']:.3f}, {totals['pack_ms']} ms spent packing"
+        ))
@@ -0,0 +1,35 @@
+"""
+Charge active consultations minute by minute (see consultations.billing).
+Run: python manage.py run_billing_meter            # forever
+     python manage.py run_billing_meter --once     # a single tick, e.g. from cron
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from consultations.billing import tick
+
+
+class Command(BaseCommand):
+    help = 'Run the per-minute billing meter for active consultations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds between ticks (default BILLING_TICK_SECONDS)')
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'BILLING_TICK_SECONDS', 10)
+        while True:
+            started = time.monotonic()
+            close_old_connections()
+            stats = tick()
+            if any(stats.values()) or options['once']:
+                self.stdout.write(
+                    f"Charged {stats['charged']}, warned {stats['warned']}, ended {stats['ended']}"
+                )
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,29 @@
+"""
+Route queued customers to free astrologers (see consultations.dispatch).
+Run: python manage.py run_dispatcher            # forever, one process only
+     python manage.py run_dispatcher --once     # a single resync-and-match pass
+"""
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from consultations.dispatch import Dispatcher, run
+
+
+class Command(BaseCommand):
+    help = 'Match waiting customers with the best free astrologers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resync', type=float, default=None,
+                            help='Seconds between full resyncs (default ROUTING_RESYNC_SECONDS)')
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher()
+        if options['once']:
+            dispatcher.resync()
+            self.stdout.write(
+                f"Matched {dispatcher.stats['matched']}, {len(dispatcher.tickets)} still waiting"
+            )
+            return
+        asyncio.run(run(dispatcher, options['resync']))
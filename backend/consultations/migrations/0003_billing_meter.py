@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:18
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def schedule_active_sessions(apps, schema_editor):
+    """Sessions already running are metered from their start."""
+    Consultation = apps.get_model('consultations', 'Consultation')
+    Consultation.objects.filter(status='active', started_at__isnull=False).update(
+        next_charge_at=F('started_at') + timedelta(minutes=1)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultations', '0002_chat_message_created_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consultation',
+            name='billed_minutes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='consultation',
+            name='last_billed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='consultation',
+            name='next_charge_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='consultation',
+            index=models.Index(fields=['status', 'next_charge_at'], name='consultatio_status_16da25_idx'),
+        ),
+        migrations.RunPython(schedule_active_sessions, migrations.RunPython.noop),
+    ]
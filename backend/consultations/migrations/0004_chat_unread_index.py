@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultations', '0003_billing_meter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['consultation', 'sender'], name='chat_messages_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+POSTGRESQL_FORWARD = [
+    # 'simple': chats mix English, Hindi and Hinglish, so no stemming
+    """
+    ALTER TABLE chat_messages ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(message, ''))) STORED
+    """,
+    'CREATE INDEX chat_messages_search_idx ON chat_messages USING GIN (search_vector)',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS chat_messages_search_idx',
+    'ALTER TABLE chat_messages DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE chat_messages_fts USING fts5(
+        message, content='chat_messages', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts(rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts(chat_messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_messages_fts_update AFTER UPDATE OF message ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts(chat_messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        INSERT INTO chat_messages_fts(rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    "INSERT INTO chat_messages_fts(chat_messages_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS chat_messages_fts_insert',
+    'DROP TRIGGER IF EXISTS chat_messages_fts_delete',
+    'DROP TRIGGER IF EXISTS chat_messages_fts_update',
+    'DROP TABLE IF EXISTS chat_messages_fts',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor, [])
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+    """Full-text index over chat messages (other databases fall back to icontains)."""
+
+    dependencies = [
+        ('consultations', '0004_chat_unread_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultations', '0005_chat_message_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consultation',
+            name='messages_archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ChatArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.BinaryField()),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('raw_bytes', models.PositiveIntegerField(default=0)),
+                ('compressed_bytes', models.PositiveIntegerField(default=0)),
+                ('pack_ms', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('consultation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='chat_archive', to='consultations.consultation')),
+            ],
+            options={
+                'db_table': 'chat_archives',
+            },
+        ),
+    ]
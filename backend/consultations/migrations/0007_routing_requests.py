@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('consultations', '0006_chat_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoutingRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consultation_type', models.CharField(choices=[('chat', 'Chat'), ('call', 'Call')], default='chat', max_length=10)),
+                ('expertise', models.CharField(blank=True, max_length=50)),
+                ('language', models.CharField(blank=True, max_length=50)),
+                ('max_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('matched', 'Matched'), ('cancelled', 'Cancelled')], default='waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('matched_at', models.DateTimeField(blank=True, null=True)),
+                ('consultation', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='routing_request', to='consultations.consultation')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='routing_requests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'routing_requests',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='routing_req_status_ab9189_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='routingrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'waiting')), fields=('customer',), name='routing_requests_one_waiting_per_customer'),
+        ),
+    ]
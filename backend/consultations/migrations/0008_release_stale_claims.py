@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def release_stale_claims(apps, schema_editor):
+    """is_busy is the consultation claim: clear it where no consultation holds the astrologer."""
+    AstrologerProfile = apps.get_model('accounts', 'AstrologerProfile')
+    Consultation = apps.get_model('consultations', 'Consultation')
+    held = Consultation.objects.filter(status__in=['pending', 'active']).values('astrologer_id')
+    AstrologerProfile.objects.filter(is_busy=True).exclude(user_id__in=held).update(is_busy=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('consultations', '0007_routing_requests'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_stale_claims, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,22 @@
-from django.db import models
+from decimal import Decimal
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
+from django.dispatch import Signal
 from django.utils import timezone
 
+from accounts import presence
+from accounts.models import AstrologerProfile
+
 User = get_user_model()
 
+# Sent once an ended (or cancelled, never started) consultation is committed,
+# with ``consultation``; receivers may hand the astrologer straight to the
+# next customer
+consultation_ended = Signal()
+
 
 class Consultation(models.Model):
     """
@@ -57,6 +70,15 @@ class Consultation(models.Model):
     # Free minutes promotion
     free_minutes_used = models.IntegerField(default=0)
     
+    # Billing meter (consultations.billing): minutes charged so far and when
+    # the next one is due
+    billed_minutes = models.IntegerField(default=0)
+    next_charge_at = models.DateTimeField(null=True, blank=True)
+    last_billed_at = models.DateTimeField(null=True, blank=True)
+    
+    # Messages moved to a ChatArchive blob (consultations.archive)
+    messages_archived = models.BooleanField(default=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -67,6 +89,7 @@ class Consultation(models.Model):
         indexes = [
             models.Index(fields=['customer', 'status']),
             models.Index(fields=['astrologer', 'status']),
+            models.Index(fields=['status', 'next_charge_at']),
         ]
     
     def __str__(self):
@@ -76,22 +99,71 @@ class Consultation(models.Model):
         """Start the consultation session."""
         self.status = self.Status.ACTIVE
         self.started_at = timezone.now()
+        self.billed_minutes = 0
+        self.next_charge_at = self.started_at + timedelta(minutes=1)
         self.save()
     
     def end_session(self):
-        """End the consultation and calculate costs."""
-        self.status = self.Status.COMPLETED
-        self.ended_at = timezone.now()
-        
-        if self.started_at:
-            duration = (self.ended_at - self.started_at).total_seconds() / 60
-            self.duration_minutes = int(duration)
+        """
+        End the consultation and calculate costs. Whatever the billing meter
+        has not charged yet is settled against the customer's wallet.
+        """
+        with transaction.atomic():
+            # Lock the row so a meter tick cannot charge while we settle
+            metered = Consultation.objects.select_for_update().filter(
+                pk=self.pk
+            ).values('status', 'total_cost').first()
+            if metered and metered['status'] in (self.Status.COMPLETED, self.Status.CANCELLED):
+                # Already ended elsewhere (e.g. auto-ended by the meter)
+                self.refresh_from_db()
+                return
             
-            # Calculate billable minutes (after free minutes)
-            billable_minutes = max(0, self.duration_minutes - self.free_minutes_used)
-            self.total_cost = billable_minutes * self.rate_per_minute
-        
-        self.save()
+            self.status = self.Status.COMPLETED
+            self.ended_at = timezone.now()
+            
+            if self.started_at:
+                duration = (self.ended_at - self.started_at).total_seconds() / 60
+                self.duration_minutes = int(duration)
+                
+                # Calculate billable minutes (after free minutes)
+                billable_minutes = max(0, self.duration_minutes - self.free_minutes_used)
+                self.total_cost = billable_minutes * self.rate_per_minute
+                self.billed_minutes = self.duration_minutes
+                
+                outstanding = self.total_cost - (metered['total_cost'] if metered else Decimal('0'))
+                if outstanding:
+                    User.objects.filter(pk=self.customer_id).update(
+                        wallet_balance=F('wallet_balance') - outstanding
+                    )
+            
+            self.save()
+            
+            # Release the claim taken when the consultation was created
+            # (consultations.dispatch.start_consultation)
+            AstrologerProfile.objects.filter(user_id=self.astrologer_id).update(is_busy=False)
+            transaction.on_commit(self._ended)
+    
+    def cancel(self):
+        """
+        Cancel a consultation that never started and release the claim on the
+        astrologer; False if it already started or ended.
+        """
+        with transaction.atomic():
+            now = timezone.now()
+            if not Consultation.objects.filter(pk=self.pk, status=self.Status.PENDING).update(
+                status=self.Status.CANCELLED, ended_at=now, updated_at=now
+            ):
+                return False
+            AstrologerProfile.objects.filter(user_id=self.astrologer_id).update(is_busy=False)
+            self.refresh_from_db()
+            transaction.on_commit(self._ended)
+        return True
+    
+    def _ended(self):
+        consultation_ended.send(sender=Consultation, consultation=self)
+        # Show the astrologer free unless a receiver already claimed them again
+        if not AstrologerProfile.objects.filter(user_id=self.astrologer_id, is_busy=True).exists():
+            presence.set_engaged(self.astrologer_id, False)
     
     @property
     def is_active(self):
@@ -127,13 +199,20 @@ class ChatMessage(models.Model):
     
     # Metadata
     is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set by the sender so buffered (write-behind) messages keep their broadcast time
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         db_table = 'chat_messages'
         ordering = ['created_at']
         indexes = [
             models.Index(fields=['consultation', 'created_at']),
+            # Unread counts and read receipts only touch unread rows
+            models.Index(
+                fields=['consultation', 'sender'],
+                condition=models.Q(is_read=False),
+                name='chat_messages_unread_idx',
+            ),
         ]
     
     def __str__(self):
@@ -146,3 +225,98 @@ class ChatMessage(models.Model):
     @property
     def is_from_astrologer(self):
         return self.sender == self.consultation.astrologer
+
+
+class ChatArchive(models.Model):
+    """
+    Messages of a completed consultation packed into one compressed blob:
+    zlib-compressed JSON lines in (created_at, id) order.
+    """
+    
+    consultation = models.OneToOneField(
+        Consultation,
+        on_delete=models.CASCADE,
+        related_name='chat_archive'
+    )
+    data = models.BinaryField()
+    
+    # Bookkeeping for the archive ratio and timing
+    message_count = models.PositiveIntegerField(default=0)
+    raw_bytes = models.PositiveIntegerField(default=0)
+    compressed_bytes = models.PositiveIntegerField(default=0)
+    pack_ms = models.PositiveIntegerField(default=0)
+    
+    archived_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'chat_archives'
+    
+    def __str__(self):
+        return f"Archive of consultation {self.consultation_id} ({self.message_count} messages)"
+    
+    @property
+    def ratio(self):
+        """Compressed size as a fraction of the raw JSON size."""
+        return self.compressed_bytes / self.raw_bytes if self.raw_bytes else 0.0
+
+
+class RoutingRequest(models.Model):
+    """
+    A customer waiting to be matched to the best free astrologer by the
+    routing dispatcher (consultations.dispatch).
+    """
+    
+    class Status(models.TextChoices):
+        WAITING = 'waiting', 'Waiting'
+        MATCHED = 'matched', 'Matched'
+        CANCELLED = 'cancelled', 'Cancelled'
+    
+    customer = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='routing_requests'
+    )
+    consultation_type = models.CharField(
+        max_length=10,
+        choices=Consultation.ConsultationType.choices,
+        default=Consultation.ConsultationType.CHAT
+    )
+    
+    # Filters; blank/null means any
+    expertise = models.CharField(max_length=50, blank=True)
+    language = models.CharField(max_length=50, blank=True)
+    max_rate = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.WAITING
+    )
+    consultation = models.OneToOneField(
+        Consultation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='routing_request'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    matched_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'routing_requests'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            # A customer waits in the queue at most once
+            models.UniqueConstraint(
+                fields=['customer'],
+                condition=models.Q(status='waiting'),
+                name='routing_requests_one_waiting_per_customer',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Routing request {self.pk} ({self.status}) for {self.customer.phone_number}"
@@ -0,0 +1,167 @@
+"""
+Keyset pagination for chat history.
+
+Messages are ordered by ``(created_at, id)``, which the
+``(consultation, created_at)`` index serves directly. A cursor encodes
+that pair of one message, so every page is one index range scan no matter
+how deep the client has scrolled, and pages never skip or repeat a
+message when new ones arrive in between.
+
+Query parameters (at most one of ``before``/``after``/``since_id``):
+    (none)            the latest ``limit`` messages
+    before=<cursor>   the ``limit`` messages just older than the cursor
+    after=<cursor>    the ``limit`` messages just newer than the cursor
+    since_id=<id>     like ``after``, from a message id (delta after a reconnect)
+    limit=<n>         page size, default CHAT_HISTORY_PAGE_SIZE
+
+Each page is returned oldest first, with the cursors of its first and last
+message and whether more messages exist in the direction of the query.
+"""
+import base64
+import binascii
+from collections import deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(message):
+    created_us = (message.created_at - EPOCH) // timedelta(microseconds=1)
+    return base64.urlsafe_b64encode(f'{created_us}:{message.id}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) of a cursor; raises ValueError when it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_us, message_id = raw.split(':')
+        created_at = EPOCH + timedelta(microseconds=int(created_us))
+        return created_at, int(message_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError):
+        raise ValueError('Invalid cursor')
+
+
+class ChatKeysetPagination(BasePagination):
+    """Cursor pagination over (created_at, id) with before/after/since_id."""
+
+    def get_limit(self, request):
+        default = getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', 50)
+        maximum = getattr(settings, 'CHAT_HISTORY_MAX_PAGE_SIZE', 200)
+        try:
+            limit = int(request.query_params.get('limit', default))
+        except ValueError:
+            raise ValidationError({'error': 'limit must be an integer'})
+        return max(1, min(limit, maximum))
+
+    def get_anchor(self, request):
+        """
+        ('before' | 'after', (created_at, id)), ('since_id', id), or
+        (None, None) for the latest page.
+        """
+        params = request.query_params
+        given = [name for name in ('before', 'after', 'since_id') if params.get(name)]
+        if len(given) > 1:
+            raise ValidationError({'error': 'Use only one of before, after and since_id'})
+        if not given:
+            return None, None
+
+        name = given[0]
+        if name == 'since_id':
+            try:
+                return name, int(params['since_id'])
+            except ValueError:
+                raise ValidationError({'error': 'since_id must be an integer'})
+        try:
+            return name, decode_cursor(params[name])
+        except ValueError:
+            raise ValidationError({'error': f'Invalid {name} cursor'})
+
+    def since_id_not_found(self):
+        return ValidationError({'error': 'since_id is not a message of this consultation'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        limit = self.get_limit(request)
+        self.direction, anchor = self.get_anchor(request)
+        if self.direction == 'since_id':
+            created_at = queryset.filter(id=anchor).values_list('created_at', flat=True).first()
+            if created_at is None:
+                raise self.since_id_not_found()
+            self.direction, anchor = 'after', (created_at, anchor)
+
+        if self.direction == 'after':
+            created_at, message_id = anchor
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+            ).order_by('created_at', 'id')
+        else:
+            if anchor is not None:
+                created_at, message_id = anchor
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+                )
+            queryset = queryset.order_by('-created_at', '-id')
+
+        # One extra row tells whether another page exists
+        page = list(queryset[:limit + 1])
+        self.has_more = len(page) > limit
+        page = page[:limit]
+        if self.direction != 'after':
+            page.reverse()
+        self.page = page
+        return page
+
+    def paginate_iterable(self, messages, request):
+        """
+        Same pages as ``paginate_queryset`` from messages already iterated in
+        (created_at, id) order, e.g. an archive being decompressed. Stops
+        reading once the page is complete and keeps at most limit + 1
+        messages in memory.
+        """
+        limit = self.get_limit(request)
+        self.direction, anchor = self.get_anchor(request)
+        messages = iter(messages)
+
+        if self.direction in ('after', 'since_id'):
+            for message in messages:
+                if (message.id == anchor if self.direction == 'since_id'
+                        else (message.created_at, message.id) > anchor):
+                    break
+            else:
+                if self.direction == 'since_id':
+                    raise self.since_id_not_found()
+                message = None
+            if self.direction == 'after' and message is not None:
+                messages = chain([message], messages)
+            self.direction = 'after'
+            page = list(islice(messages, limit + 1))
+            self.has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            window = deque(maxlen=limit)
+            older = 0
+            for message in messages:
+                if anchor is not None and (message.created_at, message.id) >= anchor:
+                    break
+                if len(window) == limit:
+                    older += 1
+                window.append(message)
+            self.has_more = older > 0
+            page = list(window)
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        first, last = (self.page[0], self.page[-1]) if self.page else (None, None)
+        return Response({
+            'results': data,
+            'has_more': self.has_more,
+            'before': encode_cursor(first) if first else None,
+            'after': encode_cursor(last) if last else None,
+        })
@@ -0,0 +1,37 @@
+"""
+Cached participant lookups for consultations.
+
+Authorizing a WebSocket connect or a REST action only needs the two user
+ids of a consultation. They are read with one ``values_list`` query and
+kept in the Django cache, so reconnects from flaky mobile networks do not
+hit the database again. Entries are dropped when a consultation ends (see
+``consultations.signals``) and otherwise expire after
+``CHAT_PARTICIPANT_CACHE_TTL`` seconds.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Consultation
+
+
+def _cache_key(consultation_id):
+    return f'consultation:{consultation_id}:participants'
+
+
+def get_participants(consultation_id):
+    """(customer_id, astrologer_id) of a consultation, or None if it does not exist."""
+    key = _cache_key(consultation_id)
+    participants = cache.get(key)
+    if participants is None:
+        participants = Consultation.objects.filter(
+            id=consultation_id
+        ).values_list('customer_id', 'astrologer_id').first()
+        if participants is None:
+            return None
+        participants = tuple(participants)
+        cache.set(key, participants, getattr(settings, 'CHAT_PARTICIPANT_CACHE_TTL', 3600))
+    return participants
+
+
+def forget_participants(consultation_id):
+    cache.delete(_cache_key(consultation_id))
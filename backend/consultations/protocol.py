@@ -0,0 +1,119 @@
+"""
+Wire formats of the chat WebSocket.
+
+JSON text frames are the default. A client that offers the ``msgpack``
+subprotocol (``Sec-WebSocket-Protocol: msgpack``) gets binary MessagePack
+frames with compact envelopes instead:
+
+- field names are small integers (``FIELDS``) and so are event types
+  (``TYPES``); unknown names pass through as strings;
+- a nested ``sender`` object is reduced to ``sender_id``;
+- ``created_at`` is milliseconds since the Unix epoch instead of ISO text.
+
+Incoming frames are decoded by frame type, so a msgpack client may still
+send JSON text. Both codecs produce/consume the same JSON-shaped dicts, so
+the consumer's handlers do not care which one is in use.
+"""
+import json
+from datetime import datetime
+
+import msgpack
+
+MSGPACK_SUBPROTOCOL = 'msgpack'
+
+# Append only: clients depend on these numbers
+FIELDS = {
+    'type': 0,
+    'message': 1,
+    'id': 2,
+    'sender_id': 3,
+    'created_at': 4,
+    'is_from_customer': 5,
+    'is_typing': 6,
+    'message_id': 7,
+    'reader_id': 8,
+    'customer_id': 9,
+    'wallet_balance': 10,
+    'minutes_left': 11,
+    'reason': 12,
+    'total_cost': 13,
+}
+TYPES = {
+    'connection_established': 0,
+    'error': 1,
+    'chat_message': 2,
+    'typing': 3,
+    'typing_indicator': 4,
+    'read_up_to': 5,
+    'read_receipt': 6,
+    'low_balance': 7,
+    'consultation_ended': 8,
+}
+FIELD_NAMES = {code: name for name, code in FIELDS.items()}
+TYPE_NAMES = {code: name for name, code in TYPES.items()}
+
+
+class ProtocolError(ValueError):
+    """Raised for frames that cannot be decoded."""
+
+
+class JSONCodec:
+    subprotocol = None
+
+    def encode(self, event):
+        return {'text_data': json.dumps(event)}
+
+
+class MsgpackCodec:
+    subprotocol = MSGPACK_SUBPROTOCOL
+
+    def compact(self, value):
+        if not isinstance(value, dict):
+            return value
+        compacted = {}
+        for name, item in value.items():
+            if name == 'sender' and isinstance(item, dict):
+                name, item = 'sender_id', item['id']
+            elif name == 'created_at' and isinstance(item, str):
+                item = int(datetime.fromisoformat(item).timestamp() * 1000)
+            elif name == 'type':
+                item = TYPES.get(item, item)
+            compacted[FIELDS.get(name, name)] = self.compact(item)
+        return compacted
+
+    def encode(self, event):
+        return {'bytes_data': msgpack.packb(self.compact(event))}
+
+
+def expand(value):
+    """Inverse of the key/type compaction for incoming msgpack frames."""
+    if not isinstance(value, dict):
+        return value
+    expanded = {}
+    for key, item in value.items():
+        name = FIELD_NAMES.get(key, key)
+        if name == 'type':
+            item = TYPE_NAMES.get(item, item)
+        expanded[name] = expand(item)
+    return expanded
+
+
+def negotiate(subprotocols):
+    """Codec for the subprotocols a client offered; JSON unless it asked for msgpack."""
+    if MSGPACK_SUBPROTOCOL in (subprotocols or ()):
+        return MsgpackCodec()
+    return JSONCodec()
+
+
+def decode(text_data=None, bytes_data=None):
+    """Decode one incoming frame to a dict."""
+    try:
+        if bytes_data is not None:
+            data = expand(msgpack.unpackb(bytes_data, strict_map_key=False))
+        else:
+            data = json.loads(text_data)
+    except (ValueError, TypeError, msgpack.UnpackException) as exc:
+        raise ProtocolError(str(exc)) from exc
+    if not isinstance(data, dict):
+        raise ProtocolError('Frame is not an object')
+    return data
@@ -0,0 +1,39 @@
+"""
+Bulk read receipts.
+
+A participant reports the newest message they have seen; every earlier
+unread message from the other party is marked read with a single
+``UPDATE ... WHERE id <= X`` (served by the partial index on unread
+messages) and the room gets one ``read_receipt`` event for the whole range.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .models import ChatMessage
+from .write_behind import flush_buffered
+
+
+def mark_read_up_to(consultation_id, reader_id, message_id):
+    """Mark the other party's messages up to ``message_id`` read; returns the count."""
+    # Buffered messages must be in the table before the range update
+    flush_buffered()
+    return ChatMessage.objects.filter(
+        consultation_id=consultation_id, is_read=False, id__lte=message_id
+    ).exclude(sender_id=reader_id).update(is_read=True)
+
+
+def receipt_event(reader_id, message_id):
+    return {
+        'type': 'read_receipt_broadcast',
+        'reader_id': reader_id,
+        'message_id': message_id,
+    }
+
+
+def broadcast_receipt(consultation_id, reader_id, message_id):
+    """Send the receipt to the chat room from sync code."""
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        async_to_sync(channel_layer.group_send)(
+            f'chat_{consultation_id}', receipt_event(reader_id, message_id)
+        )
@@ -3,4 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<consultation_id>\w+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/astrologers/presence/$', consumers.PresenceFeedConsumer.as_asgi()),
+    re_path(r'ws/waitlist/(?P<astrologer_id>\d+)/$', consumers.WaitlistConsumer.as_asgi()),
 ]
@@ -0,0 +1,162 @@
+"""
+Full-text search over chat messages.
+
+The index is created by migration ``0005_chat_message_search``:
+
+- PostgreSQL: a generated ``search_vector`` tsvector column with a GIN
+  index, maintained by the database on every insert/update;
+- SQLite (development): an external-content FTS5 table
+  ``chat_messages_fts`` kept in sync by triggers.
+
+Other databases fall back to ``icontains``. Results are ranked (``ts_rank``
+/ ``bm25``) and come with an HTML-escaped highlight in which matches are
+wrapped in ``<mark>``.
+"""
+import html
+import re
+
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import ChatMessage
+
+# Markers the database wraps around matches; replaced after HTML escaping
+START, STOP = '\x02', '\x03'
+SNIPPET_TOKENS = 24
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts(rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts(chat_messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE OF message ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts(chat_messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        INSERT INTO chat_messages_fts(rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+]
+
+
+def fulltext_vendor():
+    return connection.vendor if connection.vendor in ('postgresql', 'sqlite') else None
+
+
+def sqlite_match_query(query):
+    """FTS5 query matching all words of free text (no FTS5 syntax from users)."""
+    return ' '.join(f'"{token}"' for token in _TOKEN.findall(query))
+
+
+def matching_ids(query):
+    """Subquery of ids of messages matching ``query`` (for ``id__in``)."""
+    vendor = fulltext_vendor()
+    if vendor == 'postgresql':
+        return RawSQL(
+            "SELECT id FROM chat_messages WHERE search_vector @@ websearch_to_tsquery('simple', %s)",
+            [query],
+        )
+    return RawSQL(
+        'SELECT rowid FROM chat_messages_fts WHERE chat_messages_fts MATCH %s',
+        [sqlite_match_query(query)],
+    )
+
+
+def message_filter(query):
+    """Q matching message text, through the full-text index when there is one."""
+    if fulltext_vendor() is None:
+        return Q(message__icontains=query)
+    if fulltext_vendor() == 'sqlite' and not sqlite_match_query(query):
+        return Q(pk__in=[])
+    return Q(id__in=matching_ids(query))
+
+
+def _highlight(text):
+    return html.escape(text).replace(START, '<mark>').replace(STOP, '</mark>')
+
+
+def search_messages(query, consultation_ids, limit=20):
+    """
+    Best matches of ``query`` among messages of ``consultation_ids`` (a
+    queryset of ids), best first. Each returned message has ``rank``
+    (higher is better) and ``highlight`` attributes.
+    """
+    vendor = fulltext_vendor()
+    scope_sql, scope_params = consultation_ids.query.sql_with_params()
+
+    if vendor == 'postgresql':
+        sql = f"""
+            SELECT m.id, ts_rank(m.search_vector, q.query) AS rank,
+                   ts_headline('simple', m.message, q.query, %s) AS highlight
+            FROM chat_messages m, websearch_to_tsquery('simple', %s) AS q(query)
+            WHERE m.search_vector @@ q.query AND m.consultation_id IN ({scope_sql})
+            ORDER BY rank DESC, m.id DESC
+            LIMIT %s
+        """
+        params = [f'StartSel={START}, StopSel={STOP}, MaxWords={SNIPPET_TOKENS}, MinWords=8',
+                  query, *scope_params, limit]
+    elif vendor == 'sqlite':
+        match = sqlite_match_query(query)
+        if not match:
+            return []
+        sql = f"""
+            SELECT m.id, -bm25(chat_messages_fts) AS rank,
+                   snippet(chat_messages_fts, 0, %s, %s, '…', %s) AS highlight
+            FROM chat_messages_fts JOIN chat_messages m ON m.id = chat_messages_fts.rowid
+            WHERE chat_messages_fts MATCH %s AND m.consultation_id IN ({scope_sql})
+            ORDER BY rank DESC, m.id DESC
+            LIMIT %s
+        """
+        params = [START, STOP, SNIPPET_TOKENS, match, *scope_params, limit]
+    else:
+        messages = list(
+            ChatMessage.objects.filter(consultation_id__in=consultation_ids, message__icontains=query)
+            .order_by('-created_at', '-id')[:limit]
+        )
+        for message in messages:
+            message.rank = 0.0
+            message.highlight = html.escape(message.message)
+        return messages
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        hits = cursor.fetchall()
+    messages = ChatMessage.objects.in_bulk([message_id for message_id, _, _ in hits])
+    results = []
+    for message_id, rank, highlight in hits:
+        message = messages[message_id]
+        message.rank = float(rank)
+        message.highlight = _highlight(highlight)
+        results.append(message)
+    return results
+
+
+def ensure_sqlite_triggers(sender=None, using='default', **kwargs):
+    """
+    post_migrate: SQLite drops triggers when a migration rebuilds
+    ``chat_messages``; recreate them and reindex if any were missing.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'chat_messages_fts'")
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN "
+            "('chat_messages_fts_insert', 'chat_messages_fts_delete', 'chat_messages_fts_update')"
+        )
+        if cursor.fetchone()[0] == len(SQLITE_TRIGGERS):
+            return
+        for statement in SQLITE_TRIGGERS:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO chat_messages_fts(chat_messages_fts) VALUES ('rebuild')")
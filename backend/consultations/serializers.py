@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Consultation, ChatMessage
+from .models import Consultation, ChatMessage, RoutingRequest
+from .archive import archived_messages
+from .pagination import encode_cursor
+from accounts import presence
 from accounts.serializers import UserSerializer
 
 User = get_user_model()
@@ -21,13 +24,37 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'sender', 'created_at']
 
 
+class ChatHistoryMessageSerializer(serializers.ModelSerializer):
+    """Compact chat message for history pages: sender by id, no nested user."""
+    is_from_customer = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ChatMessage
+        fields = ['id', 'sender_id', 'message', 'is_read', 'is_from_customer', 'created_at']
+        read_only_fields = fields
+    
+    def get_is_from_customer(self, obj):
+        return obj.sender_id == self.context['customer_id']
+
+
+class ChatSearchResultSerializer(serializers.ModelSerializer):
+    """Chat message search hit with its rank and highlighted snippet."""
+    rank = serializers.FloatField(read_only=True)
+    highlight = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = ChatMessage
+        fields = ['id', 'consultation_id', 'sender_id', 'message', 'created_at', 'rank', 'highlight']
+        read_only_fields = fields
+
+
 class ConsultationSerializer(serializers.ModelSerializer):
     """Serializer for consultations."""
     customer = UserSerializer(read_only=True)
     astrologer = UserSerializer(read_only=True)
     elapsed_minutes = serializers.IntegerField(read_only=True)
     is_active = serializers.BooleanField(read_only=True)
-    messages = ChatMessageSerializer(many=True, read_only=True)
+    messages = serializers.SerializerMethodField()
     
     class Meta:
         model = Consultation
@@ -41,6 +68,49 @@ class ConsultationSerializer(serializers.ModelSerializer):
             'id', 'customer', 'started_at', 'ended_at', 'duration_minutes',
             'total_cost', 'created_at', 'messages'
         ]
+    
+    def get_messages(self, obj):
+        messages = list(obj.messages.all())
+        if obj.messages_archived:
+            messages = archived_messages(obj) + messages
+        return ChatMessageSerializer(messages, many=True, context=self.context).data
+
+
+class ConsultationWindowSerializer(ConsultationSerializer):
+    """
+    Consultation with only its latest messages, prefetched into
+    ``message_window`` (newest first, one extra row to detect older ones).
+    ``messages_before`` is a chat history cursor for the rest.
+    """
+    messages = serializers.SerializerMethodField()
+    has_more_messages = serializers.SerializerMethodField()
+    messages_before = serializers.SerializerMethodField()
+    
+    class Meta(ConsultationSerializer.Meta):
+        fields = ConsultationSerializer.Meta.fields + ['has_more_messages', 'messages_before']
+    
+    def _latest(self, obj):
+        """Newest first, up to window + 1, topped up from the archive if needed."""
+        if not hasattr(obj, '_latest_messages'):
+            latest = list(obj.message_window)
+            missing = self.context['message_window'] + 1 - len(latest)
+            if obj.messages_archived and missing > 0:
+                latest += reversed(archived_messages(obj, last=missing))
+            obj._latest_messages = latest
+        return obj._latest_messages
+    
+    def _window(self, obj):
+        return self._latest(obj)[:self.context['message_window']]
+    
+    def get_messages(self, obj):
+        return ChatMessageSerializer(reversed(self._window(obj)), many=True, context=self.context).data
+    
+    def get_has_more_messages(self, obj):
+        return len(self._latest(obj)) > self.context['message_window']
+    
+    def get_messages_before(self, obj):
+        window = self._window(obj)
+        return encode_cursor(window[-1]) if window else None
 
 
 class ConsultationListSerializer(serializers.ModelSerializer):
@@ -48,16 +118,22 @@ class ConsultationListSerializer(serializers.ModelSerializer):
     customer_name = serializers.CharField(source='customer.get_full_name', read_only=True)
     astrologer_name = serializers.CharField(source='astrologer.get_full_name', read_only=True)
     elapsed_minutes = serializers.IntegerField(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Consultation
         fields = [
             'id', 'customer_name', 'astrologer_name', 'consultation_type',
             'status', 'started_at', 'duration_minutes', 'elapsed_minutes',
-            'total_cost', 'created_at'
+            'total_cost', 'unread_count', 'created_at'
         ]
 
 
+class ReadUpToSerializer(serializers.Serializer):
+    """Serializer for marking messages read up to an id."""
+    message_id = serializers.IntegerField(min_value=1)
+
+
 class StartConsultationSerializer(serializers.Serializer):
     """Serializer for starting a consultation."""
     astrologer_id = serializers.IntegerField()
@@ -68,8 +144,29 @@ class StartConsultationSerializer(serializers.Serializer):
             astrologer = User.objects.get(id=value,  role='astrologer')
             if not hasattr(astrologer, 'astrologer_profile'):
                 raise serializers.ValidationError("Invalid astrologer")
-            if not astrologer.astrologer_profile.is_online:
+            astrologer_status = presence.get_status(astrologer.id)
+            if astrologer_status == presence.OFFLINE:
                 raise serializers.ValidationError("Astrologer is not online")
+            if astrologer_status == presence.BUSY:
+                raise serializers.ValidationError("Astrologer is busy")
             return value
         except User.DoesNotExist:
             raise serializers.ValidationError("Astrologer not found")
+
+
+class RoutingRequestSerializer(serializers.ModelSerializer):
+    """A customer's place in the routing queue (consultations.dispatch)."""
+    
+    class Meta:
+        model = RoutingRequest
+        fields = [
+            'id', 'consultation_type', 'expertise', 'language', 'max_rate',
+            'status', 'consultation', 'created_at', 'matched_at'
+        ]
+        read_only_fields = ['id', 'status', 'consultation', 'created_at', 'matched_at']
+    
+    def validate(self, attrs):
+        customer = self.context['request'].user
+        if RoutingRequest.objects.filter(customer=customer, status=RoutingRequest.Status.WAITING).exists():
+            raise serializers.ValidationError("You are already waiting for an astrologer")
+        return attrs
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Consultation
+from .participants import forget_participants
+
+ENDED_STATUSES = (Consultation.Status.COMPLETED, Consultation.Status.CANCELLED)
+
+
+@receiver(post_save, sender=Consultation)
+def forget_ended_participants(sender, instance, **kwargs):
+    """Ended consultations drop out of the participant cache."""
+    if instance.status in ENDED_STATUSES:
+        forget_participants(instance.pk)
+
+
+@receiver(post_delete, sender=Consultation)
+def forget_deleted_participants(sender, instance, **kwargs):
+    forget_participants(instance.pk)
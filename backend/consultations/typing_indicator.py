@@ -0,0 +1,97 @@
+"""
+Server-side coalescing of chat typing indicators.
+
+Clients send a ``typing`` event on every keystroke. Each connection keeps a
+``TypingCoalescer`` that forwards at most one "started" and one "stopped"
+event per burst to the channel layer:
+
+- the first ``is_typing: true`` of a burst is published, later ones only
+  push back the automatic stop (``CHAT_TYPING_TIMEOUT_MS`` after the last
+  keystroke event);
+- ``is_typing: false`` is held for ``CHAT_TYPING_STOP_DEBOUNCE_MS``, so a
+  pause followed by more typing publishes nothing;
+- a connection that goes away while typing publishes its stop.
+
+Events that are absorbed are counted per connection and in the
+process-wide ``typing_stats``.
+"""
+import asyncio
+from collections import Counter
+
+from django.conf import settings
+
+# Process-wide totals: received, published (automatic stops included), dropped
+typing_stats = Counter()
+
+
+class TypingCoalescer:
+    """Typing state of one connection; ``publish(is_typing)`` is awaited on changes."""
+
+    def __init__(self, publish, stop_debounce=None, timeout=None):
+        self.publish = publish
+        self.stop_debounce = (
+            stop_debounce if stop_debounce is not None
+            else getattr(settings, 'CHAT_TYPING_STOP_DEBOUNCE_MS', 1000) / 1000.0
+        )
+        self.timeout = (
+            timeout if timeout is not None
+            else getattr(settings, 'CHAT_TYPING_TIMEOUT_MS', 5000) / 1000.0
+        )
+        self.is_typing = False
+        self.stats = Counter()
+        self._stop_timer = None
+        self._stop_pending = False
+
+    def _count(self, name):
+        self.stats[name] += 1
+        typing_stats[name] += 1
+
+    async def _publish(self, is_typing):
+        self.is_typing = is_typing
+        self._count('published')
+        await self.publish(is_typing)
+
+    def _cancel_stop(self):
+        if self._stop_timer is not None:
+            self._stop_timer.cancel()
+            self._stop_timer = None
+        if self._stop_pending:
+            # The held stop is absorbed by the resumed burst
+            self._stop_pending = False
+            self._count('dropped')
+
+    def _schedule_stop(self, delay):
+        if self._stop_timer is not None:
+            self._stop_timer.cancel()
+        self._stop_timer = asyncio.ensure_future(self._stop_after(delay))
+
+    async def _stop_after(self, delay):
+        await asyncio.sleep(delay)
+        self._stop_timer = None
+        self._stop_pending = False
+        await self._publish(False)
+
+    async def update(self, is_typing):
+        """Handle one client typing event."""
+        self._count('received')
+        if is_typing:
+            self._cancel_stop()
+            if self.is_typing:
+                self._count('dropped')
+            else:
+                await self._publish(True)
+            self._schedule_stop(self.timeout)
+        elif not self.is_typing or self._stop_pending:
+            self._count('dropped')
+        else:
+            self._stop_pending = True
+            self._schedule_stop(self.stop_debounce)
+
+    async def close(self):
+        """Publish a final stop if the connection was typing."""
+        if self._stop_timer is not None:
+            self._stop_timer.cancel()
+            self._stop_timer = None
+        self._stop_pending = False
+        if self.is_typing:
+            await self._publish(False)
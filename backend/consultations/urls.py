@@ -10,6 +10,12 @@ urlpatterns = [
     path('<int:pk>/', views.ConsultationDetailView.as_view(), name='detail'),
     path('<int:pk>/end/', views.EndConsultationView.as_view(), name='end'),
     
+    # Routing queue
+    path('queue/', views.RoutingQueueView.as_view(), name='routing-queue'),
+    path('queue/<int:pk>/', views.RoutingRequestView.as_view(), name='routing-request'),
+    
     # Chat History
     path('<int:consultation_id>/messages/', views.ChatHistoryView.as_view(), name='chat-history'),
+    path('<int:consultation_id>/read/', views.ReadUpToView.as_view(), name='read-up-to'),
+    path('messages/search/', views.ChatSearchView.as_view(), name='chat-search'),
 ]
@@ -2,14 +2,28 @@ from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
-from .models import Consultation, ChatMessage
+from .models import Consultation, ChatMessage, RoutingRequest
+from .archive import consultation_messages
+from .dispatch import send_dispatch_event, start_consultation
+from .pagination import ChatKeysetPagination
+from .participants import get_participants
+from .receipts import broadcast_receipt, mark_read_up_to
+from .search import search_messages
+from .write_behind import flush_buffered
 from .serializers import (
     ConsultationSerializer,
+    ConsultationWindowSerializer,
     ConsultationListSerializer,
-    ChatMessageSerializer,
+    ChatHistoryMessageSerializer,
+    ChatSearchResultSerializer,
+    ReadUpToSerializer,
+    RoutingRequestSerializer,
     StartConsultationSerializer,
 )
 
@@ -24,25 +38,18 @@ class StartConsultationView(APIView):
         serializer = StartConsultationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        astrologer = User.objects.get(id=serializer.validated_data['astrologer_id'])
-        consultation_type = serializer.validated_data['consultation_type']
-        
-        # Get rate from astrologer profile
-        profile = astrologer.astrologer_profile
-        rate = profile.chat_rate if consultation_type == 'chat' else profile.call_rate
-        
-        # Create consultation
-        consultation = Consultation.objects.create(
-            customer=request.user,
-            astrologer=astrologer,
-            consultation_type=consultation_type,
-            rate_per_minute=rate,
-            free_minutes_used=5 if request.user.customer_consultations.count() == 0 else 0
+        # Claims the astrologer atomically: of two customers racing for the
+        # same astrologer exactly one gets a consultation
+        consultation, _ = start_consultation(
+            request.user.id,
+            serializer.validated_data['astrologer_id'],
+            serializer.validated_data['consultation_type'],
         )
-        
-        # Auto-start chat sessions
-        if consultation_type == 'chat':
-            consultation.start_session()
+        if consultation is None:
+            return Response(
+                {'error': 'Astrologer is busy'},
+                status=status.HTTP_409_CONFLICT
+            )
         
         return Response(
             ConsultationSerializer(consultation).data,
@@ -50,6 +57,65 @@ class StartConsultationView(APIView):
         )
 
 
+class RoutingQueueView(APIView):
+    """Join the routing queue: the dispatcher picks the best free astrologer."""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = RoutingRequestSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        try:
+            routing_request = serializer.save(customer=request.user)
+        except IntegrityError:
+            return Response(
+                {'error': 'You are already waiting for an astrologer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        send_dispatch_event('routing_request', id=routing_request.id)
+        return Response(
+            RoutingRequestSerializer(routing_request).data,
+            status=status.HTTP_201_CREATED
+        )
+
+
+class RoutingRequestView(APIView):
+    """Check on or leave the routing queue."""
+    permission_classes = [IsAuthenticated]
+    
+    def get_object(self, request, pk):
+        return RoutingRequest.objects.filter(pk=pk, customer=request.user).first()
+    
+    def get(self, request, pk):
+        routing_request = self.get_object(request, pk)
+        if routing_request is None:
+            return Response(
+                {'error': 'Routing request not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(RoutingRequestSerializer(routing_request).data)
+    
+    def delete(self, request, pk):
+        routing_request = self.get_object(request, pk)
+        if routing_request is None:
+            return Response(
+                {'error': 'Routing request not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        # Conditional so a match made meanwhile is not undone
+        cancelled = RoutingRequest.objects.filter(
+            pk=pk, status=RoutingRequest.Status.WAITING
+        ).update(status=RoutingRequest.Status.CANCELLED)
+        if not cancelled:
+            routing_request.refresh_from_db()
+            return Response(
+                {'error': f'Routing request is already {routing_request.status}'},
+                status=status.HTTP_409_CONFLICT
+            )
+        send_dispatch_event('routing_cancel', id=routing_request.id)
+        routing_request.refresh_from_db()
+        return Response(RoutingRequestSerializer(routing_request).data)
+
+
 class MyConsultationsView(generics.ListAPIView):
     """List user's consultations."""
     permission_classes = [IsAuthenticated]
@@ -57,71 +123,203 @@ class MyConsultationsView(generics.ListAPIView):
     
     def get_queryset(self):
         user = self.request.user
+        # Messages from the other party not read yet (partial unread index)
+        unread = ChatMessage.objects.filter(
+            consultation=OuterRef('pk'), is_read=False
+        ).exclude(sender=user).values('consultation').annotate(count=Count('id')).values('count')
         return Consultation.objects.filter(
             Q(customer=user) | Q(astrologer=user)
-        ).select_related('customer', 'astrologer')
+        ).select_related('customer', 'astrologer').annotate(
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+        )
 
 
 class ConsultationDetailView(generics.RetrieveAPIView):
-    """Get consultation details with messages."""
+    """
+    Get consultation details with its latest messages.
+    
+    ?messages=<n> sets the window size (default CONSULTATION_MESSAGE_WINDOW);
+    older messages are paged from the chat history API starting at
+    ``messages_before``. ?messages=all embeds the full history.
+    """
     permission_classes = [IsAuthenticated]
-    serializer_class = ConsultationSerializer
+    
+    def full_history(self):
+        return self.request.query_params.get('messages') == 'all'
+    
+    def message_window(self):
+        default = getattr(settings, 'CONSULTATION_MESSAGE_WINDOW', 50)
+        maximum = getattr(settings, 'CHAT_HISTORY_MAX_PAGE_SIZE', 200)
+        try:
+            window = int(self.request.query_params.get('messages', default))
+        except ValueError:
+            window = default
+        return max(0, min(window, maximum))
+    
+    def get_serializer_class(self):
+        return ConsultationSerializer if self.full_history() else ConsultationWindowSerializer
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['message_window'] = self.message_window()
+        return context
     
     def get_queryset(self):
         user = self.request.user
-        return Consultation.objects.filter(
+        flush_buffered()
+        queryset = Consultation.objects.filter(
             Q(customer=user) | Q(astrologer=user)
-        ).prefetch_related('messages__sender')
+        ).select_related('customer', 'astrologer')
+        if self.full_history():
+            return queryset.prefetch_related('messages__sender')
+        # Sliced prefetch: only the window (+1 to tell whether older messages exist)
+        window = ChatMessage.objects.select_related('sender').order_by('-created_at', '-id')
+        return queryset.prefetch_related(
+            Prefetch('messages', queryset=window[:self.message_window() + 1], to_attr='message_window')
+        )
 
 
 class EndConsultationView(APIView):
-    """End an active consultation."""
+    """End an active consultation (or one that never started)."""
     permission_classes = [IsAuthenticated]
     
     def post(self, request, pk):
+        participants = get_participants(pk)
+        if participants is None:
+            return Response(
+                {'error': 'Consultation not found or not active'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        # Only participants can end
+        if request.user.id not in participants:
+            return Response(
+                {'error': 'Not authorized'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         try:
             consultation = Consultation.objects.get(
                 pk=pk,
-                status='active'
-            )
-            # Only participants can end
-            if request.user not in [consultation.customer, consultation.astrologer]:
-                return Response(
-                    {'error': 'Not authorized'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            consultation.end_session()
-            
-            return Response(
-                ConsultationSerializer(consultation).data
+                status__in=['pending', 'active']
             )
         except Consultation.DoesNotExist:
             return Response(
                 {'error': 'Consultation not found or not active'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        
+        # A consultation that never started is cancelled, not completed
+        if not consultation.cancel():
+            consultation.end_session()
+        
+        return Response(
+            ConsultationSerializer(consultation).data
+        )
 
 
 class ChatHistoryView(generics.ListAPIView):
-    """Get chat history for a consultation."""
+    """
+    Get chat history for a consultation, a page at a time.
+    
+    Keyset-paginated on (created_at, id): see consultations.pagination for
+    the before/after/since_id/limit parameters. Archived consultations are
+    paged from their ChatArchive (consultations.archive) the same way.
+    """
     permission_classes = [IsAuthenticated]
-    serializer_class = ChatMessageSerializer
+    serializer_class = ChatHistoryMessageSerializer
+    pagination_class = ChatKeysetPagination
     
     def get_queryset(self):
         consultation_id = self.kwargs.get('consultation_id')
         user = self.request.user
         
         # Verify user is part of the consultation
-        consultation = Consultation.objects.filter(
-            id=consultation_id
-        ).filter(
-            Q(customer=user) | Q(astrologer=user)
-        ).first()
-        
-        if not consultation:
+        self.participants = get_participants(consultation_id)
+        if self.participants is None or user.id not in self.participants:
             return ChatMessage.objects.none()
         
+        flush_buffered()
         return ChatMessage.objects.filter(
-            consultation=consultation
-        ).select_related('sender')
+            consultation_id=consultation_id
+        ).only('id', 'sender_id', 'message', 'is_read', 'created_at')
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        archived = self.participants and request.user.id in self.participants and Consultation.objects.filter(
+            id=self.kwargs.get('consultation_id'), messages_archived=True
+        ).first()
+        if archived:
+            # Page through the decompressed archive, then the hot rows
+            page = self.paginator.paginate_iterable(consultation_messages(archived), request)
+        else:
+            page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        participants = getattr(self, 'participants', None)
+        context['customer_id'] = participants[0] if participants else None
+        return context
+
+
+class ReadUpToView(APIView):
+    """Mark the other party's messages read up to a message id."""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, consultation_id):
+        participants = get_participants(consultation_id)
+        if participants is None or request.user.id not in participants:
+            return Response(
+                {'error': 'Consultation not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        serializer = ReadUpToSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        message_id = serializer.validated_data['message_id']
+        
+        updated = mark_read_up_to(consultation_id, request.user.id, message_id)
+        if updated:
+            broadcast_receipt(consultation_id, request.user.id, message_id)
+        return Response({'updated': updated, 'message_id': message_id})
+
+
+class ChatSearchView(APIView):
+    """
+    Full-text search over the requesting user's chat messages, best match
+    first with highlighted snippets. ?q= (required), ?consultation=, ?limit=
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        consultations = Consultation.objects.filter(
+            Q(customer=request.user) | Q(astrologer=request.user)
+        )
+        consultation_id = request.query_params.get('consultation')
+        if consultation_id:
+            if not consultation_id.isdigit():
+                return Response(
+                    {'error': 'consultation must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            consultations = consultations.filter(id=consultation_id)
+        
+        flush_buffered()
+        results = search_messages(query, consultations.values('id'), limit=limit)
+        return Response({
+            'query': query,
+            'results': ChatSearchResultSerializer(results, many=True).data,
+        })
@@ -0,0 +1,298 @@
+"""
+Per-astrologer FIFO waitlists.
+
+A customer who finds an astrologer busy can wait for them on
+``ws/waitlist/<astrologer_id>/`` (consultations.consumers.WaitlistConsumer)
+instead of being turned away. The queue lives in the Django cache (Redis
+in production) under ``waitlist:<astrologer_id>``. Every change takes a
+per-waitlist lock (a Redis lock on the production cache, ``cache.add``
+elsewhere) only around reading and writing that list, waits at most
+``LOCK_WAIT`` seconds for it (``WaitlistBusy`` otherwise) and is published to the
+``waitlist_<astrologer_id>`` group as one event carrying:
+
+- the queue order;
+- the astrologer's rolling average session length (the mean
+  ``duration_minutes`` of their last ``WAITLIST_AVERAGE_OVER`` completed
+  consultations);
+- what is left of the current session.
+
+Each consumer works out its own position and estimated wait from that
+event and refreshes the estimate on a timer, without further queries.
+
+Each entry also has a liveness key that expires after
+``WAITLIST_ENTRY_TTL_SECONDS`` unless the customer's consumer renews it
+(every ``WAITLIST_REFRESH_SECONDS``), so a customer whose consumer died
+without leaving drops out instead of being handed a billed consultation.
+
+``hand_off`` takes the first live entry off the list, then starts its
+consultation outside the lock through the same atomic claim as every other
+start (consultations.dispatch.start_consultation); if the claim is lost the
+entry goes back in front. It runs when a customer joins,
+when a consultation ends (``consultation_ended``) and when the astrologer
+comes online or stops being busy (``accounts.presence.became_accepting``).
+That consultation is the only thing written to the database.
+"""
+import logging
+import math
+import time
+import uuid
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts import presence
+from accounts.notifications import notify_user
+from .dispatch import start_consultation
+from .models import Consultation, consultation_ended
+
+logger = logging.getLogger(__name__)
+
+# The lock is held for a cache read and write: expire it quickly if its
+# holder dies, and give up quickly rather than stall the caller's thread
+LOCK_TIMEOUT = 2
+LOCK_WAIT = 0.5
+
+
+class WaitlistBusy(Exception):
+    """The waitlist lock could not be taken within ``LOCK_WAIT``."""
+
+
+def _key(astrologer_id):
+    return f'waitlist:{astrologer_id}'
+
+
+def group_name(astrologer_id):
+    return f'waitlist_{astrologer_id}'
+
+
+def _redis_client():
+    """The redis-py client behind Django's RedisCache, or None for other backends."""
+    get_client = getattr(getattr(cache, '_cache', None), 'get_client', None)
+    return get_client(write=True) if get_client is not None else None
+
+
+@contextmanager
+def _locked(astrologer_id):
+    """Serialize changes to one waitlist across processes."""
+    name = f'{_key(astrologer_id)}:lock'
+    client = _redis_client()
+    if client is not None:
+        lock = client.lock(cache.make_key(name), timeout=LOCK_TIMEOUT, sleep=0.005, blocking_timeout=LOCK_WAIT)
+        if not lock.acquire():
+            raise WaitlistBusy(astrologer_id)
+        try:
+            yield
+        finally:
+            # A lock that expired (and may have been retaken) is not ours to release
+            if lock.owned():
+                lock.release()
+        return
+
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(name, token, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise WaitlistBusy(astrologer_id)
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        if cache.get(name) == token:
+            cache.delete(name)
+
+
+def _alive_key(astrologer_id, customer_id):
+    return f'{_key(astrologer_id)}:alive:{customer_id}'
+
+
+def entries(astrologer_id):
+    """Waiting ``{'customer_id', 'consultation_type', 'joined'}`` dicts, head first."""
+    return cache.get(_key(astrologer_id)) or []
+
+
+def _store(astrologer_id, queue):
+    if queue:
+        cache.set(_key(astrologer_id), queue, None)
+    else:
+        cache.delete(_key(astrologer_id))
+
+
+def _live(astrologer_id, queue):
+    """The entries whose liveness key has not expired, in order."""
+    alive = cache.get_many([_alive_key(astrologer_id, entry['customer_id']) for entry in queue])
+    return [entry for entry in queue if _alive_key(astrologer_id, entry['customer_id']) in alive]
+
+
+def renew(astrologer_id, customer_id):
+    """Keep a waiting customer's entry alive for another TTL."""
+    cache.set(_alive_key(astrologer_id, customer_id), 1, getattr(settings, 'WAITLIST_ENTRY_TTL_SECONDS', 90))
+
+
+def join(astrologer_id, customer_id, consultation_type='chat'):
+    """
+    Append a customer (once) and hand off if the astrologer is free; returns
+    their 1-based position, or 0 if their consultation started.
+    """
+    renew(astrologer_id, customer_id)
+    with _locked(astrologer_id):
+        queue = _live(astrologer_id, entries(astrologer_id))
+        if not any(entry['customer_id'] == customer_id for entry in queue):
+            queue.append({
+                'customer_id': customer_id,
+                'consultation_type': consultation_type,
+                'joined': time.time(),
+            })
+        _store(astrologer_id, queue)
+    broadcast(astrologer_id)
+    _try_hand_off(astrologer_id)
+    for position, entry in enumerate(entries(astrologer_id), 1):
+        if entry['customer_id'] == customer_id:
+            return position
+    return 0
+
+
+def leave(astrologer_id, customer_id):
+    """Remove a customer; False if they were not waiting."""
+    cache.delete(_alive_key(astrologer_id, customer_id))
+    with _locked(astrologer_id):
+        queue = entries(astrologer_id)
+        remaining = [entry for entry in queue if entry['customer_id'] != customer_id]
+        if len(remaining) == len(queue):
+            return False
+        _store(astrologer_id, remaining)
+    broadcast(astrologer_id)
+    return True
+
+
+def average_duration(astrologer_id, refresh=False):
+    """Rolling average session length of an astrologer in minutes (cached)."""
+    key = f'{_key(astrologer_id)}:average'
+    average = None if refresh else cache.get(key)
+    if average is None:
+        durations = list(Consultation.objects.filter(
+            astrologer_id=astrologer_id,
+            status=Consultation.Status.COMPLETED,
+            started_at__isnull=False,
+        ).order_by('-ended_at').values_list(
+            'duration_minutes', flat=True
+        )[:getattr(settings, 'WAITLIST_AVERAGE_OVER', 20)])
+        if durations:
+            average = sum(durations) / len(durations)
+        else:
+            average = getattr(settings, 'WAITLIST_DEFAULT_MINUTES', 10)
+        cache.set(key, float(average), None)
+    return average
+
+
+def session_remaining(astrologer_id, average):
+    """Expected minutes left in the astrologer's current session."""
+    started_at = Consultation.objects.filter(
+        astrologer_id=astrologer_id, status=Consultation.Status.ACTIVE
+    ).values_list('started_at', flat=True).first()
+    if started_at is None:
+        return 0.0
+    return max(0.0, average - (timezone.now() - started_at).total_seconds() / 60)
+
+
+def snapshot(astrologer_id):
+    """Everything a waiting client needs to place itself and estimate its wait."""
+    average = average_duration(astrologer_id)
+    return {
+        'queue': [entry['customer_id'] for entry in entries(astrologer_id)],
+        'average_minutes': average,
+        'session_remaining': session_remaining(astrologer_id, average),
+        'at': time.time(),
+    }
+
+
+def estimate(state, position, now=None):
+    """Estimated wait in whole minutes for a 1-based position in a snapshot."""
+    elapsed = ((now or time.time()) - state['at']) / 60
+    remaining = max(0.0, state['session_remaining'] - elapsed)
+    return math.ceil(remaining + (position - 1) * state['average_minutes'])
+
+
+def broadcast(astrologer_id, **extra):
+    """Publish the waitlist state to everyone waiting, with one group_send."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(group_name(astrologer_id), {
+        'type': 'waitlist_changed',
+        **snapshot(astrologer_id),
+        **extra,
+    })
+
+
+def _take_head(astrologer_id):
+    """Remove and return the first live entry, dropping expired ones ahead of it."""
+    with _locked(astrologer_id):
+        queue = entries(astrologer_id)
+        live = _live(astrologer_id, queue)
+        if live or queue:
+            _store(astrologer_id, live[1:])
+    return live[0] if live else None
+
+
+def _put_back(astrologer_id, head):
+    """Return a taken entry to the front, unless its customer left meanwhile."""
+    with _locked(astrologer_id):
+        queue = entries(astrologer_id)
+        if cache.get(_alive_key(astrologer_id, head['customer_id'])) is not None and not any(
+            entry['customer_id'] == head['customer_id'] for entry in queue
+        ):
+            _store(astrologer_id, [head, *queue])
+
+
+def hand_off(astrologer_id):
+    """Start a consultation for the first live entry of the waitlist; returns it, or None."""
+    if not presence.accepting(astrologer_id):
+        return None
+    head = _take_head(astrologer_id)
+    if head is None:
+        return None
+    consultation, _ = start_consultation(head['customer_id'], astrologer_id, head['consultation_type'])
+    if consultation is None:
+        # Someone else claimed the astrologer first; the head keeps its place
+        _put_back(astrologer_id, head)
+        return None
+    if cache.get(_alive_key(astrologer_id, head['customer_id'])) is None:
+        # The customer left while it was starting: nothing was used, nothing is billed
+        if not consultation.cancel():
+            consultation.end_session()
+        broadcast(astrologer_id)
+        return None
+    cache.delete(_alive_key(astrologer_id, head['customer_id']))
+    notify_user(head['customer_id'], {
+        'type': 'consultation_started',
+        'consultation_id': consultation.id,
+        'astrologer_id': astrologer_id,
+    })
+    broadcast(astrologer_id, started={'customer_id': head['customer_id'], 'consultation_id': consultation.id})
+    return consultation
+
+
+def _try_hand_off(astrologer_id):
+    """Hand off from an event handler; a busy lock just waits for the next event."""
+    if not entries(astrologer_id):
+        return
+    try:
+        hand_off(astrologer_id)
+    except WaitlistBusy:
+        logger.warning('Waitlist of astrologer %s is busy; hand-off skipped', astrologer_id)
+
+
+@receiver(consultation_ended)
+def hand_off_after_end(sender, consultation, **kwargs):
+    average_duration(consultation.astrologer_id, refresh=True)
+    _try_hand_off(consultation.astrologer_id)
+
+
+@receiver(presence.became_accepting)
+def hand_off_when_accepting(sender, user_id, **kwargs):
+    _try_hand_off(user_id)
@@ -0,0 +1,204 @@
+"""
+Write-behind persistence for chat messages.
+
+With ``CHAT_WRITE_BEHIND`` enabled, ``ChatConsumer`` gives each message a
+server-assigned snowflake id and timestamp, broadcasts it immediately and
+hands it to the per-process ``message_writer``. A background thread
+persists buffered messages with one ``bulk_create`` every
+``CHAT_WRITE_BEHIND_INTERVAL_MS`` or as soon as
+``CHAT_WRITE_BEHIND_BATCH_SIZE`` messages are waiting, so sending a
+message never waits on the database.
+
+Snowflake ids are only unique if every process that writes chat messages
+has its own ``CHAT_WORKER_ID`` (0-63), so enabling write-behind without
+one is a configuration error. Without write-behind the database assigns
+message ids as usual.
+
+Durability: failed writes are retried with backoff and kept in order;
+the buffer is flushed synchronously at interpreter exit (``atexit``, which
+daphne reaches on SIGTERM/SIGINT), and readers in this process call
+``flush_buffered()`` for read-your-writes.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, close_old_connections, transaction
+
+from .models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class SnowflakeGenerator:
+    """
+    Time-ordered ids that fit in 53 bits, so JavaScript clients parse them
+    exactly: 40 bits of milliseconds since EPOCH_MS (until 2058), 6 bits of
+    worker id, 7 bits of per-millisecond sequence (128 ids/ms per worker).
+    """
+
+    EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+    WORKER_BITS = 6
+    SEQUENCE_BITS = 7
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id < 1 << self.WORKER_BITS:
+            raise ValueError(f'Snowflake worker id must be in 0-{(1 << self.WORKER_BITS) - 1}')
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now_ms = max(int(time.time() * 1000), self._last_ms)  # never go back in time
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & ((1 << self.SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    # 128 ids this millisecond: move on to the next one
+                    now_ms += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return (((now_ms - self.EPOCH_MS) << (self.WORKER_BITS + self.SEQUENCE_BITS))
+                    | (self.worker_id << self.SEQUENCE_BITS)
+                    | self._sequence)
+
+
+class MessageWriter:
+    """Buffers ChatMessage instances and bulk-inserts them from one thread."""
+
+    MAX_BACKOFF = 5.0
+
+    def __init__(self, interval_ms=50, batch_size=200):
+        self.interval = interval_ms / 1000.0
+        self.batch_size = batch_size
+        self._pending = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._atexit_registered = False
+        # Serializes bulk writes between the flusher thread and flush()
+        self._write_lock = threading.Lock()
+
+    def enqueue(self, message):
+        with self._condition:
+            if self._thread is None:
+                self._start()
+            self._pending.append(message)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='chat-write-behind', daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+
+    def _take(self):
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _run(self):
+        backoff = self.interval
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopping)
+                if self._stopping:
+                    return
+                if len(self._pending) < self.batch_size:
+                    self._condition.wait_for(
+                        lambda: len(self._pending) >= self.batch_size or self._stopping,
+                        timeout=self.interval,
+                    )
+                batch = self._take()
+
+            close_old_connections()
+            if self._write(batch):
+                backoff = self.interval
+            else:
+                # Put the batch back in front of newer messages and retry later
+                with self._condition:
+                    self._pending[:0] = batch
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.MAX_BACKOFF)
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                ChatMessage.objects.bulk_create(batch, batch_size=self.batch_size)
+                return True
+            except IntegrityError:
+                # A row the database will never accept (e.g. its consultation was
+                # deleted) must not block the rest: insert one by one, drop the bad ones
+                for message in batch:
+                    try:
+                        with transaction.atomic():
+                            ChatMessage.objects.bulk_create([message])
+                    except IntegrityError:
+                        logger.error('Dropping unpersistable chat message %s', message.id)
+                return True
+            except Exception:
+                logger.exception('Persisting %d buffered chat messages failed', len(batch))
+                return False
+
+    def flush(self):
+        """Persist everything buffered so far in the calling thread."""
+        with self._condition:
+            batch = self._take()
+        if batch and not self._write(batch):
+            with self._condition:
+                self._pending[:0] = batch
+            return False
+        return True
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending)
+
+    def stop(self):
+        """Stop the flusher thread and persist what is left."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=self.MAX_BACKOFF)
+        for attempt in range(3):
+            if self.flush():
+                return
+            time.sleep(0.5 * (attempt + 1))
+        logger.error('Dropping %d chat messages that could not be persisted at shutdown', self.pending_count())
+
+
+def write_behind_enabled():
+    return getattr(settings, 'CHAT_WRITE_BEHIND', False)
+
+
+def worker_id():
+    """This process's CHAT_WORKER_ID; write-behind refuses to start without one."""
+    worker_id = getattr(settings, 'CHAT_WORKER_ID', None)
+    if worker_id is None or not 0 <= worker_id < 1 << SnowflakeGenerator.WORKER_BITS:
+        raise ImproperlyConfigured(
+            'CHAT_WRITE_BEHIND needs a CHAT_WORKER_ID (0-63) that is unique to each process'
+        )
+    return worker_id
+
+
+def flush_buffered():
+    """Read-your-writes: persist the messages buffered in this process."""
+    if write_behind_enabled():
+        return message_writer.flush()
+    return True
+
+
+snowflake = SnowflakeGenerator(worker_id()) if write_behind_enabled() else None
+message_writer = MessageWriter(
+    interval_ms=getattr(settings, 'CHAT_WRITE_BEHIND_INTERVAL_MS', 50),
+    batch_size=getattr(settings, 'CHAT_WRITE_BEHIND_BATCH_SIZE', 200),
+)
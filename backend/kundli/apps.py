@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class KundliConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'kundli'
+
+    def ready(self):
+        from . import signals  # noqa: F401
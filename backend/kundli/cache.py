@@ -0,0 +1,159 @@
+"""
+Two-tier chart result cache.
+
+Charts are keyed by a hash of the normalized birth tuple
+(date, time, latitude, longitude, timezone, ayanamsa, chart style, theme), so any
+two requests for the same birth moment share one entry. Lookups go through
+a bounded in-process LRU first and then the durable ``ChartCacheEntry``
+table; only a miss in both tiers recomputes the chart.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time
+
+from django.conf import settings
+
+from . import charts
+from .models import ChartCacheEntry
+from .services import VedicAstroService, birth_parameters
+
+# Bump when the ephemeris or SVG output changes so stale rows are ignored.
+CHART_CACHE_VERSION = 2
+DEFAULT_AYANAMSA = 'lahiri'
+
+
+def _normalize_date(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return date.fromisoformat(str(value)).isoformat()
+
+
+def _normalize_time(value):
+    if not isinstance(value, time):
+        value = time.fromisoformat(str(value))
+    return value.replace(microsecond=0).strftime('%H:%M:%S')
+
+
+def normalized_birth_tuple(birth_data, ayanamsa=DEFAULT_AYANAMSA,
+                           chart_style=charts.DEFAULT_STYLE, theme=charts.DEFAULT_THEME):
+    """Canonical tuple used for cache keys; equal births map to equal tuples."""
+    birth_date, birth_time, latitude, longitude, timezone = birth_parameters(birth_data)
+    return (
+        _normalize_date(birth_date),
+        _normalize_time(birth_time),
+        f'{latitude:.6f}',
+        f'{longitude:.6f}',
+        f'{timezone:.2f}',
+        ayanamsa,
+        chart_style,
+        theme,
+    )
+
+
+def chart_cache_key(birth_data, ayanamsa=DEFAULT_AYANAMSA,
+                    chart_style=charts.DEFAULT_STYLE, theme=charts.DEFAULT_THEME):
+    """SHA-256 hex digest of the normalized birth tuple."""
+    parts = (f'v{CHART_CACHE_VERSION}',) + normalized_birth_tuple(birth_data, ayanamsa, chart_style, theme)
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+class ChartCache:
+    """Bounded in-process LRU in front of the ChartCacheEntry table."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key, payload):
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+
+        payload = ChartCacheEntry.objects.filter(key=key).values_list('payload', flat=True).first()
+        if payload is not None:
+            self.db_hits += 1
+            self._remember(key, payload)
+        return payload
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        ChartCacheEntry.objects.filter(key=key).delete()
+
+    def invalidate_birth(self, birth_data):
+        """Drop every cached style and theme of one birth tuple."""
+        for chart_style in charts.STYLES:
+            for theme in charts.THEMES:
+                self.invalidate(chart_cache_key(birth_data, chart_style=chart_style, theme=theme))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_compute(self, birth_data, chart_style=charts.DEFAULT_STYLE, theme=charts.DEFAULT_THEME):
+        """Return {'svg', 'chart'} for the birth details, computing on a miss."""
+        return self.get_or_compute_many([birth_data], chart_style=chart_style, theme=theme)[0]
+
+    def get_or_compute_many(self, birth_records, chart_style=charts.DEFAULT_STYLE, theme=charts.DEFAULT_THEME):
+        """
+        Batch variant of ``get_or_compute``: one LRU pass, one DB query for
+        the remaining keys and one vectorized calculation for the misses.
+        """
+        keys = [chart_cache_key(record, chart_style=chart_style, theme=theme) for record in birth_records]
+        results = {}
+
+        with self._lock:
+            for key in keys:
+                payload = self._entries.get(key)
+                if payload is not None:
+                    self._entries.move_to_end(key)
+                    results[key] = payload
+        self.hits += len(results)
+
+        remaining = {key for key in keys if key not in results}
+        if remaining:
+            stored = ChartCacheEntry.objects.filter(key__in=remaining).values_list('key', 'payload')
+            for key, payload in stored:
+                results[key] = payload
+                self._remember(key, payload)
+                self.db_hits += 1
+
+        missing = {}
+        for key, record in zip(keys, birth_records):
+            if key not in results:
+                missing.setdefault(key, record)
+        if missing:
+            self.misses += len(missing)
+            computed = VedicAstroService.calculate_charts(list(missing.values()))
+            entries = []
+            for key, chart in zip(missing, computed):
+                payload = {
+                    'svg': charts.render_chart_svg(chart, style=chart_style, theme=theme),
+                    'chart': chart,
+                }
+                results[key] = payload
+                self._remember(key, payload)
+                entries.append(ChartCacheEntry(key=key, payload=payload))
+            ChartCacheEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+        return [results[key] for key in keys]
+
+
+chart_cache = ChartCache(getattr(settings, 'KUNDLI_CHART_CACHE_SIZE', 2048))
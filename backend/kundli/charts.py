@@ -0,0 +1,202 @@
+"""
+Kundli chart SVG rendering from precompiled skeletons.
+
+The static part of every chart (border, diagonals or grid, house/sign
+labels) is compiled once per (style, theme, minify) into a list of string
+parts with empty slots. Rendering a chart only fills the slots with the
+per-chart fragments - the ascendant label and the planet glyphs of each
+cell - and joins the list, so no markup is rebuilt per request.
+"""
+from functools import lru_cache
+
+from . import ephemeris
+
+DEFAULT_STYLE = 'north'
+DEFAULT_THEME = 'dark'
+
+THEMES = {
+    'dark': {
+        'background': 'transparent',
+        'line': '#FFD700',
+        'label': '#AAA',
+        'ascendant': '#FF6B35',
+        'planet': '#FFF',
+    },
+    'light': {
+        'background': '#FFFDF5',
+        'line': '#B8860B',
+        'label': '#777',
+        'ascendant': '#D9480F',
+        'planet': '#222',
+    },
+}
+
+SIGN_ABBREVIATIONS = ('Ari', 'Tau', 'Gem', 'Can', 'Leo', 'Vir', 'Lib', 'Sco', 'Sag', 'Cap', 'Aqu', 'Pis')
+
+PLANET_LINE_HEIGHT = 13
+MAX_PLANETS_PER_CELL = len(ephemeris.GRAHAS)
+
+# North Indian (diamond) chart: houses are fixed, cell index = house - 1.
+NORTH_HOUSE_LABELS = (
+    (200, 80), (100, 30), (40, 80), (100, 160), (40, 300), (100, 350),
+    (200, 300), (300, 350), (360, 300), (300, 160), (360, 80), (300, 30),
+)
+# Anchor of the first planet label in each house; the rest stack below it.
+NORTH_HOUSE_ANCHORS = (
+    (200, 130), (100, 48), (40, 98), (100, 180), (40, 318), (100, 368),
+    (200, 320), (300, 368), (360, 318), (300, 180), (360, 98), (300, 48),
+)
+
+# South Indian chart: signs are fixed in a 4x4 grid, cell index = rashi.
+SOUTH_SIGN_CELLS = (
+    (1, 0), (2, 0), (3, 0), (3, 1), (3, 2), (3, 3),
+    (2, 3), (1, 3), (0, 3), (0, 2), (0, 1), (0, 0),
+)
+SOUTH_CELL_SIZE = 100
+
+
+def _text(x, y, fill, size, content, bold=False):
+    weight = ' font-weight="bold"' if bold else ''
+    return f'<text x="{x}" y="{y}" fill="{fill}" font-size="{size}"{weight} text-anchor="middle">{content}</text>'
+
+
+def _north_layout():
+    """Static geometry and ascendant fragments of the diamond chart."""
+    lines = [
+        ('Diagonals', [(0, 0, 400, 400), (400, 0, 0, 400)]),
+        ('Diamond Inners', [(0, 200, 200, 0), (200, 0, 400, 200), (400, 200, 200, 400), (200, 400, 0, 200)]),
+    ]
+    labels = (
+        'House Numbers (Fixed positions for North Indian Chart)', 12,
+        [(x, y, house + 1) for house, (x, y) in enumerate(NORTH_HOUSE_LABELS)],
+    )
+
+    def ascendant(chart):
+        return [(200, 110, 14, f"Asc: {chart['ascendant']['sign']}")]
+
+    return lines, labels, NORTH_HOUSE_ANCHORS, ascendant
+
+
+def _south_layout():
+    """Static geometry and ascendant fragments of the grid chart."""
+    size = SOUTH_CELL_SIZE
+    lines = [
+        ('Grid', [
+            (size, 0, size, 400), (3 * size, 0, 3 * size, 400),
+            (2 * size, 0, 2 * size, size), (2 * size, 3 * size, 2 * size, 400),
+            (0, size, 400, size), (0, 3 * size, 400, 3 * size),
+            (0, 2 * size, size, 2 * size), (3 * size, 2 * size, 400, 2 * size),
+        ]),
+    ]
+    labels = (
+        'Sign Labels (Fixed positions for South Indian Chart)', 10,
+        [(col * size + 80, row * size + 16, SIGN_ABBREVIATIONS[sign])
+         for sign, (col, row) in enumerate(SOUTH_SIGN_CELLS)],
+    )
+    anchors = tuple((col * size + 50, row * size + 34) for col, row in SOUTH_SIGN_CELLS)
+
+    def ascendant(chart):
+        col, row = SOUTH_SIGN_CELLS[int(chart['ascendant']['longitude'] // 30) % 12]
+        return [
+            (col * size + 22, row * size + 16, 11, 'Asc'),
+            (200, 205, 14, f"Lagna: {chart['ascendant']['sign']}"),
+        ]
+
+    return lines, labels, anchors, ascendant
+
+
+STYLES = {
+    'north': (_north_layout, lambda planet: planet['house'] - 1),
+    'south': (_south_layout, lambda planet: int(planet['longitude'] // 30) % 12),
+}
+
+
+class ChartSkeleton:
+    """
+    Static chart markup compiled once, with slots for per-chart fragments.
+
+    The minified variant also merges every stroke into a single path and
+    hoists shared text attributes into <g> elements.
+    """
+
+    def __init__(self, style, theme, minify=False):
+        layout, self.cell_of = STYLES[style]
+        self.colors = colors = THEMES[theme]
+        lines, (label_comment, label_size, labels), anchors, self.ascendant_texts = layout()
+
+        head = (
+            f'<svg viewBox="0 0 400 400" xmlns="http://www.w3.org/2000/svg" '
+            f'style="background:{colors["background"]};">'
+        )
+        border = f'<rect x="2" y="2" width="396" height="396" fill="None" stroke="{colors["line"]}" stroke-width="2"/>'
+
+        if minify:
+            self.separator = ''
+            path = ''.join(f'M{x1} {y1}L{x2} {y2}' for _, segments in lines for x1, y1, x2, y2 in segments)
+            static = [
+                head, border,
+                f'<path d="{path}" fill="none" stroke="{colors["line"]}" stroke-width="1.5"/>',
+                f'<g fill="{colors["label"]}" font-size="{label_size}" text-anchor="middle">',
+                ''.join(f'<text x="{x}" y="{y}">{text}</text>' for x, y, text in labels),
+                '</g>',
+            ]
+            planets_open = f'<g fill="{colors["planet"]}" font-size="11" text-anchor="middle">'
+            closing = '</g></svg>'
+            tag = '<text x="{x}" y="{y}">'
+        else:
+            self.separator = separator = '\n    '
+            static = [head, '\n\n    <!-- Outer Border -->', separator, border]
+            for comment, segments in lines:
+                static.append(f'\n\n    <!-- {comment} -->')
+                static.extend(
+                    f'{separator}<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" '
+                    f'stroke="{colors["line"]}" stroke-width="1.5"/>'
+                    for x1, y1, x2, y2 in segments
+                )
+            static.append(f'\n\n    <!-- {label_comment} -->')
+            static.extend(separator + _text(x, y, colors['label'], label_size, text) for x, y, text in labels)
+            static.append('\n\n    <!-- Ascendant -->')
+            planets_open = '\n\n    <!-- Planets -->'
+            closing = '\n</svg>'
+            tag = f'<text x="{{x}}" y="{{y}}" fill="{colors["planet"]}" font-size="11" text-anchor="middle">'
+
+        # Layout: [static, ascendant slot, planets opening, cell slot x 12, closing]
+        self.parts = [''.join(static), None, planets_open] + [''] * len(anchors) + [closing]
+        self.ascendant_slot = 1
+        self.cell_slots = list(range(3, 3 + len(anchors)))
+        # Preformatted opening tags for every (cell, line) planet position
+        self.planet_tags = [
+            [tag.format(x=x, y=y + line * PLANET_LINE_HEIGHT) for line in range(MAX_PLANETS_PER_CELL)]
+            for x, y in anchors
+        ]
+
+    def render(self, chart):
+        parts = self.parts.copy()
+        color = self.colors['ascendant']
+        parts[self.ascendant_slot] = ''.join(
+            self.separator + _text(x, y, color, size, content, bold=True)
+            for x, y, size, content in self.ascendant_texts(chart)
+        )
+
+        cells = [[] for _ in self.cell_slots]
+        for planet in chart['planets']:
+            cells[self.cell_of(planet)].append(
+                planet['abbreviation'] + ('(R)' if planet['retrograde'] else '')
+            )
+        for cell, labels in enumerate(cells):
+            if labels:
+                tags = self.planet_tags[cell]
+                parts[self.cell_slots[cell]] = ''.join(
+                    f'{self.separator}{tags[line]}{label}</text>' for line, label in enumerate(labels)
+                )
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def get_skeleton(style=DEFAULT_STYLE, theme=DEFAULT_THEME, minify=False):
+    return ChartSkeleton(style, theme, minify)
+
+
+def render_chart_svg(chart, style=DEFAULT_STYLE, theme=DEFAULT_THEME, minify=False):
+    """Render a chart dict (see VedicAstroService.calculate_chart) as SVG."""
+    return get_skeleton(style, theme, minify).render(chart)
@@ -0,0 +1,107 @@
+"""
+Vimshottari dasha timeline.
+
+The 120-year cycle starts from the lord of the moon's birth nakshatra,
+with the first mahadasha shortened by the part of the nakshatra the moon
+has already traversed. Each period divides into sub-periods of all nine
+lords in cycle order, starting with its own lord and proportional to
+their years (antardasha, pratyantardasha).
+
+``DashaTimeline.periods`` is a generator that walks the tree depth-first
+and only descends into periods overlapping the requested window, so a
+one-year window touches a few dozen periods instead of all
+9 x 9 x 9. Sub-period lists are memoized on the timeline, and timelines
+are memoized per chart.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from . import ephemeris
+
+DASHA_LORDS = ('Ketu', 'Venus', 'Sun', 'Moon', 'Mars', 'Rahu', 'Jupiter', 'Saturn', 'Mercury')
+DASHA_YEARS = (7, 20, 6, 10, 7, 18, 16, 19, 17)
+TOTAL_YEARS = sum(DASHA_YEARS)
+YEAR_DAYS = 365.25
+LEVELS = ('mahadasha', 'antardasha', 'pratyantardasha')
+
+NAKSHATRA_SPAN = 360 / 27
+J2000 = 2451545.0
+J2000_DATETIME = datetime(2000, 1, 1, 12)
+
+
+def jd_to_local(jd, utc_offset):
+    """Naive local datetime of a Julian day (UT) at a UTC offset in hours."""
+    return J2000_DATETIME + timedelta(days=jd - J2000 + utc_offset / 24.0)
+
+
+def local_date_to_jd(day, utc_offset):
+    """Julian day (UT) of local midnight starting ``day``."""
+    return float(ephemeris.julian_day(day.year, day.month, day.day, -utc_offset))
+
+
+class DashaTimeline:
+    """Vimshottari periods of one chart, generated lazily."""
+
+    def __init__(self, birth_jd, moon_longitude, utc_offset=0.0):
+        self.birth_jd = birth_jd
+        self.utc_offset = utc_offset
+        self.end_jd = birth_jd + TOTAL_YEARS * YEAR_DAYS
+
+        nakshatra_position = (moon_longitude % 360) / NAKSHATRA_SPAN
+        self.first_lord = int(nakshatra_position) % 9
+        elapsed = nakshatra_position - int(nakshatra_position)
+        start = birth_jd - elapsed * DASHA_YEARS[self.first_lord] * YEAR_DAYS
+
+        # The first lord comes round again at the end to cover 120 years from birth
+        self.mahadashas = []
+        lord = self.first_lord
+        while start < self.end_jd:
+            end = start + DASHA_YEARS[lord] * YEAR_DAYS
+            self.mahadashas.append((lord, start, end))
+            start, lord = end, (lord + 1) % 9
+        self._children = {}
+
+    def _sub_periods(self, path, start, end):
+        # Keyed on the start too: the first mahadasha lord recurs as the last
+        key = (path, start)
+        periods = self._children.get(key)
+        if periods is None:
+            span = end - start
+            periods = []
+            for offset in range(9):
+                lord = (path[-1] + offset) % 9
+                period_end = start + span * DASHA_YEARS[lord] / TOTAL_YEARS
+                periods.append((lord, start, period_end))
+                start = period_end
+            self._children[key] = periods
+        return periods
+
+    def periods(self, from_jd=None, to_jd=None, depth=len(LEVELS)):
+        """
+        Yield periods overlapping [from_jd, to_jd) in chronological order,
+        each parent before its sub-periods, down to ``depth`` levels.
+        """
+        from_jd = self.birth_jd if from_jd is None else from_jd
+        to_jd = self.end_jd if to_jd is None else to_jd
+        stack = [((), period) for period in reversed(self.mahadashas)]
+        while stack:
+            parents, (lord, start, end) = stack.pop()
+            if end <= from_jd or start >= to_jd:
+                continue
+            path = parents + (lord,)
+            yield self._as_dict(path, start, end)
+            if len(path) < depth:
+                stack.extend((path, period) for period in reversed(self._sub_periods(path, start, end)))
+
+    def _as_dict(self, path, start, end):
+        return {
+            'level': LEVELS[len(path) - 1],
+            'lords': [DASHA_LORDS[lord] for lord in path],
+            'start': jd_to_local(start, self.utc_offset).isoformat(timespec='minutes'),
+            'end': jd_to_local(end, self.utc_offset).isoformat(timespec='minutes'),
+        }
+
+
+@lru_cache(maxsize=1024)
+def get_timeline(birth_jd, moon_longitude, utc_offset):
+    return DashaTimeline(birth_jd, moon_longitude, utc_offset)
@@ -0,0 +1,172 @@
+"""
+Memory-mapped precomputed ephemeris table.
+
+``build_ephemeris_table`` samples the sidereal longitude and daily speed of
+every graha at a fixed step and writes them to a compact binary file.
+Worker processes ``mmap`` that file read-only, so the operating system
+keeps a single page-cached copy shared by all of them, and positions are
+obtained by cubic Hermite interpolation between the bracketing samples.
+
+At the default 6-hourly step interpolation adds less than 0.001 deg to the
+series tolerance documented in ``kundli.ephemeris``. Instants outside the
+table fall back to the series expansion.
+
+File layout (little-endian):
+    header, 64 bytes:
+        8s   magic            b'ASTROEPH'
+        H    format version   TABLE_VERSION
+        H    body count       len(GRAHAS)
+        d    first sample JD  (UT)
+        d    step in days
+        I    sample count
+        I    reserved
+        ...  zero padding up to HEADER_SIZE
+    body:
+        float32[samples, bodies, 2]  (longitude deg, speed deg/day)
+"""
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from . import ephemeris
+
+MAGIC = b'ASTROEPH'
+TABLE_VERSION = 1
+HEADER_FORMAT = '<8sHHddII'
+HEADER_SIZE = 64
+SAMPLE_DTYPE = np.dtype('<f4')
+
+
+class EphemerisTableError(Exception):
+    """Raised when a table file is missing, truncated or of another version."""
+
+
+def write_table(path, start_jd, step, samples, chunk_size=50000, progress=None):
+    """
+    Compute and write a table of ``samples`` rows starting at ``start_jd``.
+    The file is written next to ``path`` and atomically moved into place so
+    processes that already mapped the old file keep a consistent view.
+    """
+    bodies = len(ephemeris.GRAHAS)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        header = struct.pack(HEADER_FORMAT, MAGIC, TABLE_VERSION, bodies, start_jd, step, samples, 0)
+        fh.write(header.ljust(HEADER_SIZE, b'\0'))
+
+        for first in range(0, samples, chunk_size):
+            jd = start_jd + step * np.arange(first, min(first + chunk_size, samples), dtype=np.float64)
+            block = np.empty((jd.shape[0], bodies, 2), dtype=SAMPLE_DTYPE)
+            block[:, :, 0] = ephemeris.sidereal_longitudes(jd)
+            block[:, :, 1] = ephemeris.longitude_speeds(jd)
+            fh.write(block.tobytes())
+            if progress:
+                progress(first + jd.shape[0], samples)
+
+    os.replace(tmp_path, path)
+
+
+class EphemerisTable:
+    """Read-only view of a table file backed by a shared memory map."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER_SIZE:
+            raise EphemerisTableError(f'{self.path}: file too small')
+        magic, version, bodies, start_jd, step, samples, _ = struct.unpack_from(HEADER_FORMAT, self._mmap)
+        if magic != MAGIC:
+            raise EphemerisTableError(f'{self.path}: not an ephemeris table')
+        if version != TABLE_VERSION:
+            raise EphemerisTableError(f'{self.path}: format version {version}, expected {TABLE_VERSION}')
+        if bodies != len(ephemeris.GRAHAS):
+            raise EphemerisTableError(f'{self.path}: {bodies} bodies, expected {len(ephemeris.GRAHAS)}')
+
+        expected_size = HEADER_SIZE + samples * bodies * 2 * SAMPLE_DTYPE.itemsize
+        if len(self._mmap) < expected_size:
+            raise EphemerisTableError(f'{self.path}: truncated ({len(self._mmap)} < {expected_size} bytes)')
+
+        self.version = version
+        self.start_jd = start_jd
+        self.step = step
+        self.samples = samples
+        self.end_jd = start_jd + step * (samples - 1)
+        self.data = np.frombuffer(
+            self._mmap, dtype=SAMPLE_DTYPE, count=samples * bodies * 2, offset=HEADER_SIZE
+        ).reshape(samples, bodies, 2)
+
+    def covers(self, jd):
+        jd = np.asarray(jd, dtype=np.float64)
+        return bool(jd.size) and bool(np.all((jd >= self.start_jd) & (jd <= self.end_jd)))
+
+    def interpolate(self, jd):
+        """
+        Sidereal longitudes and speeds, each shape (n, bodies), by cubic
+        Hermite interpolation of the bracketing samples.
+        """
+        jd = np.atleast_1d(np.asarray(jd, dtype=np.float64))
+        position = (jd - self.start_jd) / self.step
+        index = np.clip(np.floor(position).astype(np.int64), 0, self.samples - 2)
+        t = (position - index)[:, None]
+
+        left = self.data[index].astype(np.float64)
+        right = self.data[index + 1].astype(np.float64)
+        p0, m0 = left[:, :, 0], left[:, :, 1]
+        m1 = right[:, :, 1]
+        # Unwrap across 360 -> 0 so the segment is continuous
+        p1 = p0 + np.mod(right[:, :, 0] - p0 + 180.0, 360.0) - 180.0
+
+        h = self.step
+        t2 = t * t
+        t3 = t2 * t
+        longitudes = ((2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * h * m0
+                      + (-2 * t3 + 3 * t2) * p1 + (t3 - t2) * h * m1)
+        speeds = ((6 * t2 - 6 * t) * (p0 - p1) / h
+                  + (3 * t2 - 4 * t + 1) * m0 + (3 * t2 - 2 * t) * m1)
+        return np.mod(longitudes, 360.0), speeds
+
+    def close(self):
+        self.data = None
+        self._mmap.close()
+
+
+_table = None
+_table_loaded = False
+_table_lock = threading.Lock()
+
+
+def get_table():
+    """Process-wide table, or None when KUNDLI_EPHEMERIS_TABLE is unset or missing."""
+    global _table, _table_loaded
+    if not _table_loaded:
+        with _table_lock:
+            if not _table_loaded:
+                path = getattr(settings, 'KUNDLI_EPHEMERIS_TABLE', None)
+                if path and os.path.exists(path):
+                    _table = EphemerisTable(path)
+                _table_loaded = True
+    return _table
+
+
+def reset_table():
+    """Forget the mapped table so the next lookup reopens the file."""
+    global _table, _table_loaded
+    with _table_lock:
+        _table = None
+        _table_loaded = False
+
+
+def lookup(jd):
+    """
+    (longitudes, speeds) from the table when it covers every instant,
+    otherwise (None, None) so callers fall back to the series expansion.
+    """
+    table = get_table()
+    if table is None or not table.covers(jd):
+        return None, None
+    return table.interpolate(jd)
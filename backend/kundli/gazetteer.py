@@ -0,0 +1,335 @@
+"""
+Offline gazetteer: place name -> coordinates and time zone.
+
+The bundled ``kundli/data/places.tsv`` (GeoNames-style columns, see
+``read_places``), with country names from ``kundli/data/countries.tsv``
+(``read_countries``), is compiled by ``build_place_index`` into a compact binary
+index that worker processes ``mmap`` read-only, like the ephemeris table.
+Every name and alternate name is normalized (accents stripped, casefolded,
+punctuation collapsed) and stored as a sorted array of UTF-8 keys. That
+array is a flattened trie: all keys under a prefix are one contiguous
+range, found with two binary searches, so autocomplete and exact lookups
+cost O(log n) key comparisons and never touch the network.
+
+The index is built ahead of time (run ``build_place_index`` at deploy
+time, next to ``migrate``); a process that finds no index file logs an
+error and leaves places unresolved rather than compiling on the request
+path.
+
+UTC offsets are resolved with ``zoneinfo`` for the birth instant itself,
+so historical changes (war time +6:30, pre-1906 Madras time, DST abroad)
+are applied.
+
+File layout (little-endian):
+    header, 64 bytes:
+        8s   magic            b'ASTROPLC'
+        H    format version   INDEX_VERSION
+        H    reserved
+        I    place count
+        I    key count
+        5I   section offsets  key offsets, key places, key blob, places, strings
+        ...  zero padding up to HEADER_SIZE
+    sections:
+        uint32[keys + 1]     key offsets into the key blob
+        uint32[keys]         place index of each key
+        bytes                key blob (sorted normalized UTF-8 keys)
+        PLACE_DTYPE[places]  coordinates, population, string offsets
+        bytes                strings blob (display name, admin1, country code,
+                             zone, country name, normalized country names)
+"""
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import unicodedata
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'ASTROPLC'
+INDEX_VERSION = 2
+HEADER_FORMAT = '<8sHHII5I'
+HEADER_SIZE = 64
+PLACE_DTYPE = np.dtype([
+    ('latitude', '<f8'),
+    ('longitude', '<f8'),
+    ('population', '<u4'),
+    ('strings', '<u4'),
+    ('strings_length', '<u4'),
+])
+# Bundled columns; raw GeoNames dumps (19 columns, no header) are mapped to these
+TSV_COLUMNS = ('name', 'asciiname', 'alternatenames', 'latitude', 'longitude',
+               'country_code', 'admin1', 'population', 'timezone')
+GEONAMES_COLUMNS = {'name': 1, 'asciiname': 2, 'alternatenames': 3, 'latitude': 4, 'longitude': 5,
+                    'country_code': 8, 'admin1': 10, 'population': 14, 'timezone': 17}
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+class GazetteerError(Exception):
+    """Raised when an index file is missing, truncated or of another version."""
+
+
+def normalize_name(name):
+    """Search key of a place name: no accents, casefolded, single spaces."""
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(' ', stripped.casefold()).strip()
+
+
+def read_places(path):
+    """Parse the bundled TSV (or a raw GeoNames dump) into dicts."""
+    places = []
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) == len(TSV_COLUMNS):
+                row = dict(zip(TSV_COLUMNS, fields))
+            else:
+                row = {column: fields[index] for column, index in GEONAMES_COLUMNS.items()}
+            places.append({
+                'name': row['name'],
+                'names': [row['name'], row['asciiname']] + [
+                    alternate for alternate in row['alternatenames'].split(',') if alternate
+                ],
+                'latitude': float(row['latitude']),
+                'longitude': float(row['longitude']),
+                'country_code': row['country_code'],
+                'admin1': row['admin1'],
+                'population': int(row['population'] or 0),
+                'timezone': row['timezone'],
+            })
+    return places
+
+
+def read_countries(path):
+    """``{country_code: [name, *alternate names]}`` from the bundled countries TSV."""
+    countries = {}
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            if not line.strip() or line.startswith('#'):
+                continue
+            code, name, alternates = (line.rstrip('\n').split('\t') + [''])[:3]
+            countries[code] = [name] + [alternate for alternate in alternates.split(',') if alternate]
+    return countries
+
+
+def country_keys(names):
+    """Normalized forms of a country's names ('&' also spelled 'and')."""
+    keys = []
+    for name in names:
+        for variant in (name, name.replace('&', ' and ')):
+            key = normalize_name(variant)
+            if key and key not in keys:
+                keys.append(key)
+    return keys
+
+
+def write_index(path, places, countries=None):
+    """Compile places (and their countries' names) into the binary index, written atomically."""
+    countries = countries or {}
+    records = np.zeros(len(places), dtype=PLACE_DTYPE)
+    strings = bytearray()
+    keys = set()
+    for index, place in enumerate(places):
+        country = countries.get(place['country_code'], [place['country_code']])
+        encoded = '\t'.join((
+            place['name'], place['admin1'], place['country_code'], place['timezone'],
+            country[0], '|'.join(country_keys(country)),
+        )).encode()
+        records[index] = (place['latitude'], place['longitude'], place['population'], len(strings), len(encoded))
+        strings += encoded
+        for name in place['names']:
+            key = normalize_name(name)
+            if key:
+                keys.add((key.encode(), index))
+
+    keys = sorted(keys)
+    key_blob = b''.join(key for key, _ in keys)
+    key_offsets = np.zeros(len(keys) + 1, dtype='<u4')
+    key_offsets[1:] = np.cumsum([len(key) for key, _ in keys], dtype=np.int64)
+    key_places = np.array([index for _, index in keys], dtype='<u4')
+
+    sections = [key_offsets.tobytes(), key_places.tobytes(), key_blob, records.tobytes(), bytes(strings)]
+    offsets = []
+    position = HEADER_SIZE
+    for section in sections:
+        # Keep numeric sections aligned for frombuffer
+        position += -position % 8
+        offsets.append(position)
+        position += len(section)
+
+    # A private temporary file, so concurrent builds never share a half-written one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            header = struct.pack(HEADER_FORMAT, MAGIC, INDEX_VERSION, 0, len(places), len(keys), *offsets)
+            fh.write(header.ljust(HEADER_SIZE, b'\0'))
+            for offset, section in zip(offsets, sections):
+                fh.write(b'\0' * (offset - fh.tell()))
+                fh.write(section)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(places), len(keys)
+
+
+class PlaceIndex:
+    """Read-only view of a compiled index backed by a shared memory map."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER_SIZE:
+            raise GazetteerError(f'{self.path}: file too small')
+        magic, version, _, places, keys, *offsets = struct.unpack_from(HEADER_FORMAT, self._mmap)
+        if magic != MAGIC:
+            raise GazetteerError(f'{self.path}: not a place index')
+        if version != INDEX_VERSION:
+            raise GazetteerError(f'{self.path}: format version {version}, expected {INDEX_VERSION}')
+        key_offsets_at, key_places_at, self._key_blob, places_at, self._strings = offsets
+        if len(self._mmap) < places_at + places * PLACE_DTYPE.itemsize:
+            raise GazetteerError(f'{self.path}: truncated')
+
+        self.place_count = places
+        self.key_count = keys
+        self.key_offsets = np.frombuffer(self._mmap, dtype='<u4', count=keys + 1, offset=key_offsets_at)
+        self.key_places = np.frombuffer(self._mmap, dtype='<u4', count=keys, offset=key_places_at)
+        self.places = np.frombuffer(self._mmap, dtype=PLACE_DTYPE, count=places, offset=places_at)
+
+    def _key(self, index):
+        start = self._key_blob + int(self.key_offsets[index])
+        return self._mmap[start:self._key_blob + int(self.key_offsets[index + 1])]
+
+    def _lower_bound(self, target):
+        low, high = 0, self.key_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _key_range(self, prefix, exact=False):
+        start = self._lower_bound(prefix)
+        # 0xFF never occurs in UTF-8, so prefix + 0xFF sorts after every extension
+        end = self._lower_bound(prefix + (b'\0' if exact else b'\xff'))
+        return start, end
+
+    def _fields(self, index):
+        record = self.places[index]
+        start = self._strings + int(record['strings'])
+        return self._mmap[start:start + int(record['strings_length'])].decode().split('\t')
+
+    def place(self, index):
+        record = self.places[index]
+        name, admin1, country_code, timezone, country, _ = self._fields(index)
+        return {
+            'name': name,
+            'admin1': admin1,
+            'country_code': country_code,
+            'country': country,
+            'latitude': round(float(record['latitude']), 6),
+            'longitude': round(float(record['longitude']), 6),
+            'timezone': timezone,
+            'population': int(record['population']),
+        }
+
+    def _ranked_indexes(self, start, end):
+        indexes = np.unique(self.key_places[start:end])
+        return indexes[np.argsort(-self.places['population'][indexes], kind='stable')]
+
+    def _ranked(self, start, end, limit):
+        return [self.place(int(index)) for index in self._ranked_indexes(start, end)[:limit]]
+
+    def search(self, query, limit=10):
+        """Places with any name starting with ``query``, most populous first."""
+        prefix = normalize_name(query).encode()
+        if not prefix:
+            return []
+        return self._ranked(*self._key_range(prefix), limit)
+
+    def resolve(self, place_of_birth):
+        """
+        Best exact match for free text such as 'Varanasi, Uttar Pradesh, India':
+        the first component must match a name; later components prefer the
+        place whose state, country code or country name (e.g. 'Pakistan',
+        'USA') matches, then population decides.
+        """
+        parts = [normalize_name(part) for part in place_of_birth.split(',')]
+        if not parts or not parts[0]:
+            return None
+        candidates = self._ranked_indexes(*self._key_range(parts[0].encode(), exact=True))
+        if not len(candidates):
+            return None
+        qualifiers = set(parts[1:])
+        for index in candidates:
+            _, admin1, country_code, _, _, countries = self._fields(int(index))
+            if qualifiers & {normalize_name(admin1), normalize_name(country_code), *countries.split('|')}:
+                return self.place(int(index))
+        return self.place(int(candidates[0]))
+
+    def close(self):
+        self.key_offsets = self.key_places = self.places = None
+        self._mmap.close()
+
+
+def utc_offset(timezone, local_date, local_time):
+    """UTC offset in hours of a zone at a local wall-clock instant, or None."""
+    try:
+        zone = ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    offset = datetime.combine(local_date, local_time).replace(tzinfo=zone).utcoffset()
+    return offset.total_seconds() / 3600.0
+
+
+_index = None
+_index_unavailable_logged = False
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Process-wide index, or None while the KUNDLI_PLACES_INDEX file has not
+    been built (``python manage.py build_place_index``).
+    """
+    global _index, _index_unavailable_logged
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = settings.KUNDLI_PLACES_INDEX
+                if not os.path.exists(path):
+                    if not _index_unavailable_logged:
+                        logger.error('Place index %s is missing: run python manage.py build_place_index', path)
+                        _index_unavailable_logged = True
+                    return None
+                try:
+                    _index = PlaceIndex(path)
+                except GazetteerError:
+                    if not _index_unavailable_logged:
+                        logger.exception('Place index %s is unusable: rebuild it with build_place_index', path)
+                        _index_unavailable_logged = True
+                    return None
+    return _index
+
+
+def reset_index():
+    """Forget the mapped index so the next lookup reopens the file."""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,136 @@
+"""
+Materialized daily horoscopes.
+
+All 12 signs x supported languages are generated once per local day
+(``HOROSCOPE_TIME_ZONE``, Asia/Kolkata) and stored in ``DailyHoroscope``.
+Each worker keeps the current day's rows in memory until local midnight,
+so reads are a dict lookup and every worker serves the same prediction.
+
+Generation is seeded per (date, sign) with a private ``random.Random`` so it
+never touches the global random state and stays identical across workers
+even if two of them materialize the same day concurrently.
+"""
+import random
+import threading
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+from .ephemeris import SIGNS
+from .models import DailyHoroscope
+
+DEFAULT_LANGUAGE = 'en'
+
+PREDICTIONS = {
+    'en': [
+        "Today is a great day for new beginnings. Focus on your goals.",
+        "You might face some minor challenges, but your patience will pay off.",
+        "Financial gains are indicated. Be wise with your investments.",
+        "Health looks good. Try to include some yoga in your routine.",
+        "Travel is on the cards. Pack your bags!",
+        "Relationship harmony is highlighted today. Spend time with loved ones.",
+    ],
+    'hi': [
+        "आज नई शुरुआत के लिए बहुत अच्छा दिन है। अपने लक्ष्यों पर ध्यान दें।",
+        "आपको कुछ छोटी चुनौतियों का सामना करना पड़ सकता है, लेकिन आपका धैर्य रंग लाएगा।",
+        "आर्थिक लाभ के संकेत हैं। अपने निवेश में समझदारी रखें।",
+        "स्वास्थ्य अच्छा रहेगा। अपनी दिनचर्या में योग शामिल करने का प्रयास करें।",
+        "यात्रा के योग हैं। अपना सामान तैयार रखें!",
+        "आज संबंधों में सामंजस्य रहेगा। अपनों के साथ समय बिताएं।",
+    ],
+}
+
+LUCKY_COLORS = {
+    'en': ["Red", "Blue", "Green", "Yellow", "White"],
+    'hi': ["लाल", "नीला", "हरा", "पीला", "सफ़ेद"],
+}
+
+
+def supported_languages():
+    return [lang for lang in getattr(settings, 'HOROSCOPE_LANGUAGES', [DEFAULT_LANGUAGE]) if lang in PREDICTIONS]
+
+
+def local_zone():
+    return ZoneInfo(getattr(settings, 'HOROSCOPE_TIME_ZONE', 'Asia/Kolkata'))
+
+
+def local_today():
+    return datetime.now(local_zone()).date()
+
+
+def normalize_sign(sign):
+    """Canonical sign name ('aries' -> 'Aries'), or None if unknown."""
+    sign = sign.strip().capitalize()
+    return sign if sign in SIGNS else None
+
+
+def generate_horoscope(day, sign, language):
+    """Deterministic horoscope for one (day, sign, language)."""
+    # Same seed for every language so translations carry the same reading
+    rng = random.Random(f'{day.isoformat()}:{sign}')
+    prediction = rng.randrange(len(PREDICTIONS[DEFAULT_LANGUAGE]))
+    lucky_number = rng.randint(1, 9)
+    lucky_color = rng.randrange(len(LUCKY_COLORS[DEFAULT_LANGUAGE]))
+    return DailyHoroscope(
+        date=day,
+        sign=sign,
+        language=language,
+        prediction=PREDICTIONS[language][prediction],
+        lucky_number=lucky_number,
+        lucky_color=LUCKY_COLORS[language][lucky_color],
+    )
+
+
+def materialize_day(day):
+    """Store every sign x language for ``day``; existing rows are kept."""
+    rows = [generate_horoscope(day, sign, language) for sign in SIGNS for language in supported_languages()]
+    DailyHoroscope.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def _as_dict(row):
+    return {
+        'sign': row.sign,
+        'date': row.date.isoformat(),
+        'language': row.language,
+        'prediction': row.prediction,
+        'lucky_number': row.lucky_number,
+        'lucky_color': row.lucky_color,
+    }
+
+
+class HoroscopeCache:
+    """Per-process copy of today's horoscopes, valid until local midnight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (day, expires_at, {(sign, language): data}) swapped atomically
+        self._snapshot = (None, None, {})
+
+    def _load(self, day):
+        rows = DailyHoroscope.objects.filter(date=day)
+        if len(rows) < len(SIGNS) * len(supported_languages()):
+            materialize_day(day)
+            rows = DailyHoroscope.objects.filter(date=day)
+
+        zone = local_zone()
+        expires_at = datetime.combine(day + timedelta(days=1), time.min, tzinfo=zone)
+        return day, expires_at, {(row.sign, row.language): _as_dict(row) for row in rows}
+
+    def get(self, sign, language=DEFAULT_LANGUAGE):
+        day, expires_at, entries = self._snapshot
+        if expires_at is None or datetime.now(local_zone()) >= expires_at:
+            with self._lock:
+                day, expires_at, entries = self._snapshot
+                if expires_at is None or datetime.now(local_zone()) >= expires_at:
+                    self._snapshot = self._load(local_today())
+                    day, expires_at, entries = self._snapshot
+        return entries.get((sign, language))
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = (None, None, {})
+
+
+horoscope_cache = HoroscopeCache()
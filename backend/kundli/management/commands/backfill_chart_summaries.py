@@ -0,0 +1,44 @@
+"""
+Fill the matchmaking chart summary (moon nakshatra/rashi, Manglik) of
+saved birth details that predate it.
+Run: python manage.py backfill_chart_summaries
+"""
+from django.core.management.base import BaseCommand
+
+from kundli.matching import match_index
+from kundli.models import BirthDetails
+from kundli.services import VedicAstroService
+from kundli.signals import BIRTH_FIELDS
+
+SUMMARY_FIELDS = ['moon_longitude', 'moon_nakshatra', 'moon_rashi', 'is_manglik']
+
+
+class Command(BaseCommand):
+    help = 'Compute chart summaries for birth details saved without one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true', help='Recompute every row, not only missing ones')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        queryset = BirthDetails.objects.order_by('id').only('id', *BIRTH_FIELDS)
+        if not options['all']:
+            queryset = queryset.filter(moon_nakshatra__isnull=True)
+
+        updated = 0
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not rows:
+                break
+            records = [{field: getattr(row, field) for field in BIRTH_FIELDS} for row in rows]
+            for row, chart in zip(rows, VedicAstroService.calculate_charts(records)):
+                row.apply_chart_summary(chart)
+            BirthDetails.objects.bulk_update(rows, SUMMARY_FIELDS)
+            updated += len(rows)
+            last_id = rows[-1].id
+            self.stdout.write(f'{updated} rows updated')
+
+        match_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Done: {updated} chart summaries'))
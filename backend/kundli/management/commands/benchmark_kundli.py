@@ -0,0 +1,89 @@
+"""
+Micro-benchmark for the kundli ephemeris engine.
+Run: python manage.py benchmark_kundli --charts 10000
+
+NumPy evaluates the series single-threaded, so the reported rate is
+charts per second per core.
+"""
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from kundli import ephemeris, ephemeris_table
+from kundli.services import VedicAstroService
+
+
+class Command(BaseCommand):
+    help = 'Benchmark chart calculation throughput (charts per second per core)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--charts', type=int, default=10000, help='Charts per vectorized batch')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed repetitions (best is reported)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        count = options['charts']
+        repeat = options['repeat']
+        rng = np.random.default_rng(options['seed'])
+
+        jd = rng.uniform(ephemeris.julian_day(1900, 1, 1), ephemeris.julian_day(2100, 1, 1), count)
+        latitudes = rng.uniform(8.0, 35.0, count)
+        longitudes = rng.uniform(68.0, 97.0, count)
+
+        self.stdout.write(f'CPU cores available: {os.cpu_count()}')
+
+        best = self._best_of(repeat, lambda: ephemeris.compute_positions(jd, latitudes, longitudes))
+        self.stdout.write(
+            f'Vectorized positions: {count} charts in {best * 1000:.1f} ms '
+            f'-> {count / best:,.0f} charts/sec/core'
+        )
+
+        table = ephemeris_table.get_table()
+        if table is not None and table.covers(jd):
+            def from_table():
+                table_longitudes, table_speeds = table.interpolate(jd)
+                return ephemeris.compute_positions(
+                    jd, latitudes, longitudes, longitudes=table_longitudes, speeds=table_speeds
+                )
+            best = self._best_of(repeat, from_table)
+            self.stdout.write(
+                f'Table-interpolated positions: {count} charts in {best * 1000:.1f} ms '
+                f'-> {count / best:,.0f} charts/sec/core'
+            )
+        else:
+            self.stdout.write('No ephemeris table found (run build_ephemeris_table); skipping table benchmark')
+
+        best = self._best_of(repeat, lambda: ephemeris.compute_positions(jd[:1], latitudes[:1], longitudes[:1]))
+        self.stdout.write(
+            f'Single chart positions: {best * 1e6:.0f} us -> {1 / best:,.0f} charts/sec/core'
+        )
+
+        records = [
+            {
+                'date_of_birth': '1990-05-17',
+                'time_of_birth': '06:30:00',
+                'latitude': float(latitudes[index]),
+                'longitude': float(longitudes[index]),
+                'timezone': 5.5,
+            }
+            for index in range(min(count, 1000))
+        ]
+        best = self._best_of(repeat, lambda: [
+            VedicAstroService.generate_chart_svg(record, chart=chart)
+            for record, chart in zip(records, VedicAstroService.calculate_charts(records))
+        ])
+        self.stdout.write(self.style.SUCCESS(
+            f'Service charts + SVG: {len(records)} charts in {best * 1000:.1f} ms '
+            f'-> {len(records) / best:,.0f} charts/sec/core'
+        ))
+
+    @staticmethod
+    def _best_of(repeat, func):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
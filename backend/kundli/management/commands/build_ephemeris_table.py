@@ -0,0 +1,52 @@
+"""
+Precompute the sidereal ephemeris table used by the kundli service.
+Run: python manage.py build_ephemeris_table --start-year 1900 --end-year 2100 --step 0.25
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from kundli import ephemeris
+from kundli.ephemeris_table import EphemerisTable, reset_table, write_table
+
+
+class Command(BaseCommand):
+    help = 'Precompute sidereal longitudes and speeds of all grahas into a memory-mappable file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-year', type=int, default=1900)
+        parser.add_argument('--end-year', type=int, default=2100, help='Last year covered (inclusive)')
+        parser.add_argument('--step', type=float, default=0.25, help='Sample spacing in days (0.25 = 6-hourly)')
+        parser.add_argument('--output', default=None, help='Defaults to settings.KUNDLI_EPHEMERIS_TABLE')
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'KUNDLI_EPHEMERIS_TABLE', None)
+        if not output:
+            raise CommandError('No output path given and KUNDLI_EPHEMERIS_TABLE is not set')
+        step = options['step']
+        if step <= 0 or step > 1:
+            raise CommandError('--step must be in (0, 1] days')
+        if options['end_year'] < options['start_year']:
+            raise CommandError('--end-year must not be before --start-year')
+
+        # One sample of margin on each side so births at the range edges interpolate
+        start_jd = float(ephemeris.julian_day(options['start_year'], 1, 1)) - step
+        end_jd = float(ephemeris.julian_day(options['end_year'] + 1, 1, 1)) + step
+        samples = int(round((end_jd - start_jd) / step)) + 1
+
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        self.stdout.write(f'Writing {samples} samples every {step} days to {output}')
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total}', ending='\r')
+
+        write_table(output, start_jd, step, samples, progress=progress)
+        reset_table()
+
+        table = EphemerisTable(output)
+        size_mb = os.path.getsize(output) / (1024 * 1024)
+        self.stdout.write(self.style.SUCCESS(
+            f'\nEphemeris table v{table.version}: JD {table.start_jd:.2f}-{table.end_jd:.2f}, {size_mb:.1f} MB'
+        ))
+        table.close()
@@ -0,0 +1,40 @@
+"""
+Compile the offline gazetteer into the memory-mapped place index.
+Run after editing kundli/data/places.tsv or to load a GeoNames dump:
+    python manage.py build_place_index --source cities15000.txt
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from kundli.gazetteer import PlaceIndex, read_countries, read_places, reset_index, write_index
+
+
+class Command(BaseCommand):
+    help = 'Compile place names, coordinates and time zones into a sorted-key binary index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=None, help='Defaults to settings.KUNDLI_PLACES_SOURCE')
+        parser.add_argument('--countries', default=None, help='Defaults to settings.KUNDLI_COUNTRIES_SOURCE')
+        parser.add_argument('--output', default=None, help='Defaults to settings.KUNDLI_PLACES_INDEX')
+
+    def handle(self, *args, **options):
+        source = options['source'] or settings.KUNDLI_PLACES_SOURCE
+        countries = options['countries'] or settings.KUNDLI_COUNTRIES_SOURCE
+        output = options['output'] or settings.KUNDLI_PLACES_INDEX
+        for path in (source, countries):
+            if not os.path.exists(path):
+                raise CommandError(f'Source file {path} does not exist')
+
+        places = read_places(source)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        place_count, key_count = write_index(output, places, read_countries(countries))
+        reset_index()
+
+        index = PlaceIndex(output)
+        size_kb = os.path.getsize(output) / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'Place index: {index.place_count} places, {index.key_count} names, {size_kb:.1f} KB -> {output}'
+        ))
+        index.close()
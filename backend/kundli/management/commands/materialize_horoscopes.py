@@ -0,0 +1,30 @@
+"""
+Materialize daily horoscopes for all signs and languages.
+Run daily (e.g. from cron before local midnight): python manage.py materialize_horoscopes --days 2
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from kundli.horoscopes import local_today, materialize_day
+
+
+class Command(BaseCommand):
+    help = 'Precompute horoscopes for all 12 signs x supported languages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', default=None, help='First day (YYYY-MM-DD), defaults to local today')
+        parser.add_argument('--days', type=int, default=2, help='Number of consecutive days to materialize')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['date']) if options['date'] else local_today()
+        except ValueError:
+            raise CommandError('--date must be YYYY-MM-DD')
+
+        for offset in range(max(options['days'], 1)):
+            day = start + timedelta(days=offset)
+            count = materialize_day(day)
+            self.stdout.write(f'{day}: {count} horoscopes ensured')
+
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,44 @@
+"""
+Render report jobs that no web process is working on, e.g. rows left
+queued or half-rendered by a restart.
+Run: python manage.py render_kundli_reports --stale-minutes 15
+"""
+from concurrent.futures import wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from kundli.models import KundliReport
+from kundli.reports import report_queue
+from kundli.serializers import BirthDetailsSerializer
+
+
+class Command(BaseCommand):
+    help = 'Render queued, stale or (optionally) failed kundli reports in the process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=15,
+                            help='Treat reports rendering for longer than this as abandoned')
+        parser.add_argument('--retry-failed', action='store_true')
+
+    def handle(self, *args, **options):
+        stale_before = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        pending = Q(status='queued') | Q(status='rendering', updated_at__lt=stale_before)
+        if options['retry_failed']:
+            pending |= Q(status='failed')
+
+        futures = []
+        for report in KundliReport.objects.filter(pending).select_related('birth_details'):
+            if report.birth_details is None:
+                KundliReport.objects.filter(pk=report.pk).update(status='failed', error='Birth details deleted')
+                continue
+            details = BirthDetailsSerializer(report.birth_details).data
+            futures.append(report_queue.submit(report, details))
+
+        self.stdout.write(f'Rendering {len(futures)} reports')
+        wait(futures)
+        report_queue.shutdown()
+        done = KundliReport.objects.filter(status='done').count()
+        self.stdout.write(self.style.SUCCESS(f'Done ({done} reports available)'))
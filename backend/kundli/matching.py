@@ -0,0 +1,259 @@
+"""
+Vectorized Ashtakoota (guna milan) matchmaking.
+
+Every koota depends only on the moon's nakshatra and rashi of the two
+charts, so each one is a small lookup table indexed by those integers.
+``BirthDetails`` stores the moon nakshatra/rashi and Manglik flag when a
+chart is saved; ``MatchIndex`` keeps them as NumPy arrays, and scoring one
+chart against N candidates is a handful of fancy-indexed table lookups
+followed by ``argpartition`` for the top K.
+
+Scores follow the usual North Indian tables (36 points in total):
+
+    Varna 1, Vashya 2, Tara 3, Yoni 4, Graha Maitri 5, Gana 6,
+    Bhakoot 7, Nadi 8
+
+Vashya is classified by whole rashi (Sagittarius as Manava, Capricorn as
+Jalachara) rather than by half-sign.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .ephemeris import SUN, MOON, MARS, MERCURY, JUPITER, VENUS, SATURN
+from .models import BirthDetails
+
+GENDER_CODES = {'Male': 0, 'Female': 1, 'Other': 2}
+KOOTAS = ('varna', 'vashya', 'tara', 'yoni', 'graha_maitri', 'gana', 'bhakoot', 'nadi')
+MAX_SCORE = 36
+
+# Varna rank per rashi: Brahmin 4 (water), Kshatriya 3 (fire), Vaishya 2 (earth), Shudra 1 (air)
+RASHI_VARNA = np.array([3, 2, 1, 4, 3, 2, 1, 4, 3, 2, 1, 4])
+
+# Vashya group per rashi: 0 Chatushpada, 1 Manava, 2 Jalachara, 3 Vanachara, 4 Keeta
+RASHI_VASHYA = np.array([0, 0, 1, 2, 3, 1, 1, 4, 1, 2, 1, 2])
+VASHYA_SCORES = np.array([
+    [2.0, 1.0, 1.0, 0.5, 1.0],
+    [1.0, 2.0, 0.5, 0.0, 1.0],
+    [1.0, 0.5, 2.0, 1.0, 1.0],
+    [0.5, 0.0, 1.0, 2.0, 0.0],
+    [1.0, 1.0, 1.0, 0.0, 2.0],
+])
+
+# Yoni animal per nakshatra: 0 Horse, 1 Elephant, 2 Sheep, 3 Serpent, 4 Dog, 5 Cat,
+# 6 Rat, 7 Cow, 8 Buffalo, 9 Tiger, 10 Deer, 11 Monkey, 12 Mongoose, 13 Lion
+NAKSHATRA_YONI = np.array([
+    0, 1, 2, 3, 3, 4, 5, 2, 5, 6, 6, 7, 8, 9, 8, 9, 10, 10, 4, 11, 12, 11, 13, 0, 13, 7, 1,
+])
+YONI_SCORES = np.array([
+    [4, 2, 2, 3, 2, 2, 2, 1, 0, 1, 3, 3, 2, 1],
+    [2, 4, 3, 3, 2, 2, 2, 2, 3, 1, 2, 3, 2, 0],
+    [2, 3, 4, 2, 1, 2, 1, 3, 3, 1, 2, 0, 3, 1],
+    [3, 3, 2, 4, 2, 1, 1, 1, 1, 2, 2, 2, 0, 2],
+    [2, 2, 1, 2, 4, 2, 1, 2, 2, 1, 0, 2, 1, 1],
+    [2, 2, 2, 1, 2, 4, 0, 2, 2, 1, 3, 3, 2, 1],
+    [2, 2, 1, 1, 1, 0, 4, 2, 2, 2, 2, 2, 1, 2],
+    [1, 2, 3, 1, 2, 2, 2, 4, 3, 0, 3, 2, 2, 1],
+    [0, 3, 3, 1, 2, 2, 2, 3, 4, 1, 2, 2, 2, 1],
+    [1, 1, 1, 2, 1, 1, 2, 0, 1, 4, 1, 1, 2, 1],
+    [3, 2, 2, 2, 0, 3, 2, 3, 2, 1, 4, 2, 2, 1],
+    [3, 3, 0, 2, 2, 3, 2, 2, 2, 1, 2, 4, 3, 2],
+    [2, 2, 3, 0, 1, 2, 1, 2, 2, 2, 2, 3, 4, 2],
+    [1, 0, 1, 2, 1, 1, 2, 1, 1, 1, 1, 2, 2, 4],
+])
+
+# Rashi lords and natural relationships (1 friend, 0 neutral, -1 enemy), row regards column
+RASHI_LORD = np.array([MARS, VENUS, MERCURY, MOON, SUN, MERCURY, VENUS, MARS, JUPITER, SATURN, SATURN, JUPITER])
+_RELATIONS = {
+    SUN: {MOON: 1, MARS: 1, JUPITER: 1, MERCURY: 0, VENUS: -1, SATURN: -1},
+    MOON: {SUN: 1, MERCURY: 1, MARS: 0, JUPITER: 0, VENUS: 0, SATURN: 0},
+    MARS: {SUN: 1, MOON: 1, JUPITER: 1, VENUS: 0, SATURN: 0, MERCURY: -1},
+    MERCURY: {SUN: 1, VENUS: 1, MARS: 0, JUPITER: 0, SATURN: 0, MOON: -1},
+    JUPITER: {SUN: 1, MOON: 1, MARS: 1, SATURN: 0, MERCURY: -1, VENUS: -1},
+    VENUS: {MERCURY: 1, SATURN: 1, MARS: 0, JUPITER: 0, SUN: -1, MOON: -1},
+    SATURN: {MERCURY: 1, VENUS: 1, JUPITER: 0, SUN: -1, MOON: -1, MARS: -1},
+}
+# Points by (relation of boy's lord to girl's, relation of girl's lord to boy's)
+_MAITRI_POINTS = {
+    (1, 1): 5, (1, 0): 4, (0, 1): 4, (0, 0): 3,
+    (1, -1): 1, (-1, 1): 1, (0, -1): 0.5, (-1, 0): 0.5, (-1, -1): 0,
+}
+
+
+def _maitri_scores():
+    lords = np.zeros((7, 7))
+    for a in _RELATIONS:
+        for b in _RELATIONS:
+            lords[a, b] = 5 if a == b else _MAITRI_POINTS[(_RELATIONS[a][b], _RELATIONS[b][a])]
+    return lords[RASHI_LORD[:, None], RASHI_LORD[None, :]]
+
+
+MAITRI_SCORES = _maitri_scores()
+
+# Gana per nakshatra: 0 Deva, 1 Manushya, 2 Rakshasa
+NAKSHATRA_GANA = np.array([
+    0, 1, 2, 1, 0, 1, 0, 0, 2, 2, 1, 1, 0, 2, 0, 2, 0, 2, 2, 1, 1, 0, 2, 2, 1, 1, 0,
+])
+GANA_SCORES = np.array([
+    [6, 6, 1],
+    [5, 6, 0],
+    [1, 0, 6],
+])
+
+# Nadi per nakshatra: Adi, Madhya, Antya in a zig-zag of six
+NAKSHATRA_NADI = np.array([0, 1, 2, 2, 1, 0] * 5)[:27]
+
+# Inauspicious tara positions (Vipat, Pratyak, Vadha) counted from 0 = Janma
+BAD_TARAS = np.array([2, 4, 6])
+# Rashi distances (counted from the boy, 1-based) that form Bhakoot dosha: 2/12, 5/9, 6/8
+BHAKOOT_DOSHA_DISTANCES = np.array([2, 12, 5, 9, 6, 8])
+
+
+def _tara_points(from_nakshatra, to_nakshatra):
+    tara = np.mod(to_nakshatra - from_nakshatra, 27) % 9
+    return np.where(np.isin(tara, BAD_TARAS), 0.0, 1.5)
+
+
+def ashtakoota_scores(boy_nakshatra, boy_rashi, girl_nakshatra, girl_rashi):
+    """
+    Koota points for every (boy, girl) pair; arguments broadcast against
+    each other. Returns a dict of arrays keyed by ``KOOTAS`` plus 'total',
+    'nadi_dosha' and 'bhakoot_dosha'.
+    """
+    boy_nakshatra, boy_rashi = np.asarray(boy_nakshatra), np.asarray(boy_rashi)
+    girl_nakshatra, girl_rashi = np.asarray(girl_nakshatra), np.asarray(girl_rashi)
+
+    nadi_dosha = NAKSHATRA_NADI[boy_nakshatra] == NAKSHATRA_NADI[girl_nakshatra]
+    distance = np.mod(girl_rashi - boy_rashi, 12) + 1
+    bhakoot_dosha = np.isin(distance, BHAKOOT_DOSHA_DISTANCES)
+
+    scores = {
+        'varna': np.where(RASHI_VARNA[boy_rashi] >= RASHI_VARNA[girl_rashi], 1.0, 0.0),
+        'vashya': VASHYA_SCORES[RASHI_VASHYA[boy_rashi], RASHI_VASHYA[girl_rashi]],
+        'tara': _tara_points(boy_nakshatra, girl_nakshatra) + _tara_points(girl_nakshatra, boy_nakshatra),
+        'yoni': YONI_SCORES[NAKSHATRA_YONI[boy_nakshatra], NAKSHATRA_YONI[girl_nakshatra]].astype(float),
+        'graha_maitri': MAITRI_SCORES[boy_rashi, girl_rashi],
+        'gana': GANA_SCORES[NAKSHATRA_GANA[boy_nakshatra], NAKSHATRA_GANA[girl_nakshatra]].astype(float),
+        'bhakoot': np.where(bhakoot_dosha, 0.0, 7.0),
+        'nadi': np.where(nadi_dosha, 0.0, 8.0),
+    }
+    scores['total'] = sum(scores[koota] for koota in KOOTAS)
+    scores['nadi_dosha'] = nadi_dosha
+    scores['bhakoot_dosha'] = bhakoot_dosha
+    return scores
+
+
+def top_k(values, k):
+    """Indices of the ``k`` largest values, best first (ties keep index order)."""
+    k = min(k, values.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < values.shape[0]:
+        candidates = np.argpartition(-values, k - 1)[:k]
+    else:
+        candidates = np.arange(values.shape[0])
+    return candidates[np.lexsort((candidates, -values[candidates]))]
+
+
+class MatchIndex:
+    """
+    Per-process arrays of each user's saved chart summaries (matching only
+    scores a user's own charts), kept for the ``KUNDLI_MATCH_INDEX_USERS``
+    most recently matched users.
+
+    Each user's arrays carry a version from the shared cache:
+    ``invalidate(user_id)`` bumps that user's key, so every process reloads
+    just their rows, with one query, on their next match. ``invalidate()``
+    without a user (bulk rewrites) bumps a global key that all of them share.
+    """
+
+    VERSION_KEY = 'kundli_match_index:version'
+    FIELDS = ('id', 'gender', 'moon_nakshatra', 'moon_rashi', 'is_manglik')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user_id -> (versions, arrays), least recent first
+
+    @classmethod
+    def user_key(cls, user_id):
+        return f'{cls.VERSION_KEY}:{user_id}'
+
+    def invalidate(self, user_id=None):
+        """Make every process reload ``user_id``'s charts (everyone's if None)."""
+        key = self.VERSION_KEY if user_id is None else self.user_key(user_id)
+        cache.set(key, uuid.uuid4().hex, None)
+
+    def _load(self, user_id):
+        rows = list(
+            BirthDetails.objects.filter(user_id=user_id, moon_nakshatra__isnull=False)
+            .order_by('id').values_list(*self.FIELDS)
+        )
+        columns = list(zip(*rows)) if rows else [()] * len(self.FIELDS)
+        return {
+            'id': np.array(columns[0], dtype=np.int64),
+            'gender': np.array([GENDER_CODES.get(gender, 2) for gender in columns[1]], dtype=np.int8),
+            'nakshatra': np.array(columns[2], dtype=np.int64),
+            'rashi': np.array(columns[3], dtype=np.int64),
+            'manglik': np.array(columns[4], dtype=bool),
+        }
+
+    def arrays(self, user_id):
+        current = cache.get_many([self.VERSION_KEY, self.user_key(user_id)])
+        versions = (current.get(self.VERSION_KEY), current.get(self.user_key(user_id)))
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached is not None and cached[0] == versions:
+                self._users.move_to_end(user_id)
+                return cached[1]
+        # Loaded outside the lock: a slow query must not hold up other users
+        arrays = self._load(user_id)
+        with self._lock:
+            self._users[user_id] = (versions, arrays)
+            self._users.move_to_end(user_id)
+            while len(self._users) > getattr(settings, 'KUNDLI_MATCH_INDEX_USERS', 1024):
+                self._users.popitem(last=False)
+        return arrays
+
+    def match(self, user_id, nakshatra, rashi, manglik, gender, k=10, exclude_id=None):
+        """
+        Score one chart against ``user_id``'s saved charts of the opposite
+        gender (all genders for 'Other') and return the top ``k`` as dicts.
+        """
+        arrays = self.arrays(user_id)
+        mask = np.ones(arrays['id'].shape[0], dtype=bool)
+        if gender in ('Male', 'Female'):
+            mask &= arrays['gender'] == GENDER_CODES['Female' if gender == 'Male' else 'Male']
+        if exclude_id is not None:
+            mask &= arrays['id'] != exclude_id
+
+        candidates = np.flatnonzero(mask)
+        if gender == 'Female':
+            scores = ashtakoota_scores(
+                arrays['nakshatra'][candidates], arrays['rashi'][candidates], nakshatra, rashi
+            )
+        else:
+            scores = ashtakoota_scores(
+                nakshatra, rashi, arrays['nakshatra'][candidates], arrays['rashi'][candidates]
+            )
+        manglik_match = arrays['manglik'][candidates] == bool(manglik)
+
+        results = []
+        for position in top_k(scores['total'], k):
+            results.append({
+                'id': int(arrays['id'][candidates[position]]),
+                'total': float(scores['total'][position]),
+                'max_score': MAX_SCORE,
+                'kootas': {koota: float(scores[koota][position]) for koota in KOOTAS},
+                'manglik': bool(arrays['manglik'][candidates[position]]),
+                'manglik_compatible': bool(manglik_match[position]),
+                'nadi_dosha': bool(scores['nadi_dosha'][position]),
+                'bhakoot_dosha': bool(scores['bhakoot_dosha'][position]),
+            })
+        return results, int(candidates.shape[0])
+
+
+match_index = MatchIndex()
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kundli', '0002_chart_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyHoroscope',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sign', models.CharField(max_length=12)),
+                ('language', models.CharField(default='en', max_length=10)),
+                ('prediction', models.TextField()),
+                ('lucky_number', models.PositiveSmallIntegerField()),
+                ('lucky_color', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyhoroscope',
+            constraint=models.UniqueConstraint(fields=('date', 'sign', 'language'), name='unique_daily_horoscope'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kundli', '0003_daily_horoscope'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='birthdetails',
+            name='is_manglik',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='birthdetails',
+            name='moon_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='birthdetails',
+            name='moon_nakshatra',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='birthdetails',
+            name='moon_rashi',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
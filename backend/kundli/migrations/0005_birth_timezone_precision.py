@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kundli', '0004_chart_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='birthdetails',
+            name='timezone',
+            field=models.DecimalField(decimal_places=2, default=5.5, max_digits=5),
+        ),
+    ]
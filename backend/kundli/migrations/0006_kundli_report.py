@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('kundli', '0005_birth_timezone_precision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KundliReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_key', models.CharField(max_length=64, unique=True)),
+                ('format', models.CharField(choices=[('pdf', 'PDF'), ('png', 'PNG')], default='pdf', max_length=3)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('rendering', 'Rendering'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('file', models.FileField(blank=True, upload_to='kundli_reports/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('birth_details', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='kundli.birthdetails')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='kundli_reports', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
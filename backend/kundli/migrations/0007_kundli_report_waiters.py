@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('kundli', '0006_kundli_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KundliReportWaiter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notified', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waiters', to='kundli.kundlireport')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kundli_report_waits', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='kundlireportwaiter',
+            constraint=models.UniqueConstraint(fields=('report', 'user'), name='unique_kundli_report_waiter'),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 from django.conf import settings
 
+NAKSHATRA_SPAN = 360 / 27
+# Mars in these houses from the lagna makes a chart Manglik
+MANGLIK_HOUSES = (1, 2, 4, 7, 8, 12)
+
 class BirthDetails(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='birth_details', null=True, blank=True)
     name = models.CharField(max_length=100)
@@ -9,10 +13,102 @@ class BirthDetails(models.Model):
     place_of_birth = models.CharField(max_length=100)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
-    timezone = models.DecimalField(max_digits=4, decimal_places=1, default=5.5) # IST default
+    timezone = models.DecimalField(max_digits=5, decimal_places=2, default=5.5) # IST default
     
     gender = models.CharField(max_length=10, choices=[('Male', 'Male'), ('Female', 'Female'), ('Other', 'Other')], default='Male')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Chart summary used by matchmaking (filled from the computed chart on save)
+    moon_longitude = models.FloatField(null=True, blank=True)
+    moon_nakshatra = models.PositiveSmallIntegerField(null=True, blank=True)
+    moon_rashi = models.PositiveSmallIntegerField(null=True, blank=True)
+    is_manglik = models.BooleanField(null=True, blank=True)
+
     def __str__(self):
         return f"{self.name} - {self.date_of_birth}"
+
+    def apply_chart_summary(self, chart):
+        """Copy the moon position and Manglik status from a computed chart."""
+        planets = {planet['name']: planet for planet in chart['planets']}
+        moon = planets['Moon']['longitude']
+        self.moon_longitude = moon
+        self.moon_nakshatra = int(moon // NAKSHATRA_SPAN) % 27
+        self.moon_rashi = int(moon // 30) % 12
+        self.is_manglik = planets['Mars']['house'] in MANGLIK_HOUSES
+
+
+class ChartCacheEntry(models.Model):
+    """Durable tier of the chart cache, keyed by the normalized birth tuple hash."""
+    key = models.CharField(max_length=64, unique=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Chart {self.key[:12]}"
+
+
+class DailyHoroscope(models.Model):
+    """Horoscope materialized once per day for every sign and language."""
+    date = models.DateField()
+    sign = models.CharField(max_length=12)
+    language = models.CharField(max_length=10, default='en')
+    prediction = models.TextField()
+    lucky_number = models.PositiveSmallIntegerField()
+    lucky_color = models.CharField(max_length=20)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'sign', 'language'], name='unique_daily_horoscope'),
+        ]
+
+    def __str__(self):
+        return f"{self.sign} ({self.language}) - {self.date}"
+
+
+class KundliReport(models.Model):
+    """
+    Downloadable kundli report rendered in the background.
+    Identical requests (same chart, name and format) share one row via report_key.
+    """
+    FORMAT_CHOICES = [('pdf', 'PDF'), ('png', 'PNG')]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('rendering', 'Rendering'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    report_key = models.CharField(max_length=64, unique=True)
+    birth_details = models.ForeignKey(BirthDetails, on_delete=models.SET_NULL, null=True, blank=True, related_name='reports')
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='kundli_reports')
+    format = models.CharField(max_length=3, choices=FORMAT_CHOICES, default='pdf')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    file = models.FileField(upload_to='kundli_reports/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Report {self.id} ({self.format}, {self.status})"
+
+
+class KundliReportWaiter(models.Model):
+    """
+    A user who asked for a report. Stored in the database so whichever
+    process finishes the render notifies them; ``notified`` is cleared each
+    time they ask again while it is in flight.
+    """
+    report = models.ForeignKey(KundliReport, on_delete=models.CASCADE, related_name='waiters')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='kundli_report_waits')
+    notified = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['report', 'user'], name='unique_kundli_report_waiter'),
+        ]
+
+    def __str__(self):
+        return f"User {self.user_id} waiting on report {self.report_id}"
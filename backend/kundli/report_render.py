@@ -0,0 +1,153 @@
+"""
+Raster rendering of kundli reports with Pillow.
+
+This module runs inside the report worker processes, so it must not touch
+Django (settings, ORM). ``render_report`` receives everything it needs in
+a plain payload built by ``kundli.reports`` and writes the artifact to
+``payload['path']``.
+
+Chart geometry is shared with the SVG skeletons in ``kundli.charts``.
+"""
+import os
+
+from PIL import Image, ImageDraw, ImageFont
+
+from . import charts
+
+PAGE_SIZE = (1240, 1754)  # A4 at 150 dpi
+RESOLUTION = 150
+MARGIN = 90
+ROW_HEIGHT = 34
+CHART_SCALE = 1.8
+THEME = charts.THEMES['light']
+TEXT = '#222'
+MUTED = '#666'
+RULE = '#DDD'
+
+
+def _font(size, bold=False):
+    name = 'DejaVuSans-Bold.ttf' if bold else 'DejaVuSans.ttf'
+    try:
+        return ImageFont.truetype(name, size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+class ReportPage:
+    """One page with a text cursor that moves down as content is added."""
+
+    def __init__(self, heading):
+        self.image = Image.new('RGB', PAGE_SIZE, THEME['background'])
+        self.draw = ImageDraw.Draw(self.image)
+        self.y = MARGIN
+        self.draw.text((MARGIN, self.y), heading, fill=THEME['ascendant'], font=_font(40, bold=True))
+        self.y += 70
+
+    def remaining(self):
+        return PAGE_SIZE[1] - MARGIN - self.y
+
+    def section(self, title):
+        self.y += 10
+        self.draw.text((MARGIN, self.y), title, fill=TEXT, font=_font(28, bold=True))
+        self.y += 44
+
+    def row(self, cells, columns, bold=False):
+        font = _font(22, bold=bold)
+        for x, cell in zip(columns, cells):
+            self.draw.text((MARGIN + x, self.y), str(cell), fill=TEXT if bold else MUTED, font=font)
+        self.y += ROW_HEIGHT
+        self.draw.line((MARGIN, self.y - 6, PAGE_SIZE[0] - MARGIN, self.y - 6), fill=RULE)
+
+    def chart(self, chart, style):
+        """Draw a chart with the same layout as the SVG skeleton of ``style``."""
+        layout, cell_of = charts.STYLES[style]
+        lines, (_, label_size, labels), anchors, ascendant_texts = layout()
+        left = (PAGE_SIZE[0] - 400 * CHART_SCALE) / 2
+        top = self.y
+
+        def point(x, y):
+            return left + x * CHART_SCALE, top + y * CHART_SCALE
+
+        def text(x, y, content, size, fill, bold=False):
+            self.draw.text(point(x, y), str(content), fill=fill, font=_font(int(size * CHART_SCALE), bold), anchor='ms')
+
+        self.draw.rectangle((*point(2, 2), *point(398, 398)), outline=THEME['line'], width=3)
+        for _, segments in lines:
+            for x1, y1, x2, y2 in segments:
+                self.draw.line((*point(x1, y1), *point(x2, y2)), fill=THEME['line'], width=2)
+        for x, y, label in labels:
+            text(x, y, label, label_size, THEME['label'])
+        for x, y, size, content in ascendant_texts(chart):
+            text(x, y, content, size, THEME['ascendant'], bold=True)
+
+        cells = [[] for _ in anchors]
+        for planet in chart['planets']:
+            cells[cell_of(planet)].append(planet['abbreviation'] + ('(R)' if planet['retrograde'] else ''))
+        for (x, y), labels_in_cell in zip(anchors, cells):
+            for line, label in enumerate(labels_in_cell):
+                text(x, y + line * charts.PLANET_LINE_HEIGHT, label, 11, THEME['planet'])
+
+        self.y = top + 400 * CHART_SCALE + 40
+
+
+def _pages(payload):
+    chart = payload['chart']
+    pages = []
+
+    page = ReportPage(payload['title'])
+    page.section('Birth details')
+    for label, value in payload['details']:
+        page.row((label, value), (0, 320))
+    page.section('Rashi chart (North Indian)')
+    page.chart(chart, 'north')
+    pages.append(page)
+
+    page = ReportPage('Planetary positions')
+    page.row(('Graha', 'Sign', 'Degree', 'House', 'Motion'), (0, 220, 440, 640, 800), bold=True)
+    page.row(('Ascendant', chart['ascendant']['sign'], f"{chart['ascendant']['degree']:.2f}", 1, ''),
+             (0, 220, 440, 640, 800))
+    for planet in chart['planets']:
+        page.row(
+            (planet['name'], planet['sign'], f"{planet['degree']:.2f}", planet['house'],
+             'Retrograde' if planet['retrograde'] else 'Direct'),
+            (0, 220, 440, 640, 800),
+        )
+    page.section('Doshas')
+    for name, present, note in payload['doshas']:
+        page.row((name, 'Present' if present else 'Absent', note), (0, 320, 520))
+    page.section('Rashi chart (South Indian)')
+    page.chart(chart, 'south')
+    pages.append(page)
+
+    page = None
+    for period in payload['dashas']:
+        if page is None or page.remaining() < ROW_HEIGHT:
+            page = ReportPage('Vimshottari dasha')
+            page.row(('Mahadasha', 'Antardasha', 'From', 'To'), (0, 260, 520, 780), bold=True)
+            pages.append(page)
+        lords = period['lords']
+        page.row(
+            (lords[0], lords[1] if len(lords) > 1 else '', period['start'][:10], period['end'][:10]),
+            (0, 260, 520, 780),
+            bold=len(lords) == 1,
+        )
+    return [page.image for page in pages]
+
+
+def render_report(payload):
+    """Render the payload to a PDF (one page per sheet) or a single tall PNG."""
+    images = _pages(payload)
+    path = payload['path']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+
+    if payload['format'] == 'pdf':
+        images[0].save(tmp_path, 'PDF', save_all=True, append_images=images[1:], resolution=RESOLUTION)
+    else:
+        sheet = Image.new('RGB', (PAGE_SIZE[0], PAGE_SIZE[1] * len(images)), THEME['background'])
+        for index, image in enumerate(images):
+            sheet.paste(image, (0, index * PAGE_SIZE[1]))
+        sheet.save(tmp_path, 'PNG', optimize=True)
+
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,198 @@
+"""
+Background kundli report jobs.
+
+A report request is stored as a ``KundliReport`` row keyed by a hash of the
+chart cache key, the name printed on it and the format, so identical
+requests share one job and one artifact. The chart, dasha periods and
+doshas are gathered in the web process (all cached); rasterizing them is
+CPU-bound and runs in a ``ProcessPoolExecutor`` (one worker per core by
+default) so daphne workers never block on Pillow.
+
+When a job finishes its row is updated and every user waiting on it is
+notified through the Channels layer (see ``accounts.notifications``).
+Waiters are ``KundliReportWaiter`` rows, so a user who joins a render that
+another process is running is still notified when that process finishes.
+Rows left ``queued`` by a restarted process are picked up by
+``python manage.py render_kundli_reports``.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from accounts.notifications import notify_user
+
+from .cache import chart_cache, chart_cache_key
+from .models import KundliReport, KundliReportWaiter, MANGLIK_HOUSES
+from .report_render import render_report
+from .serializers import BirthDetailsSerializer
+from .services import VedicAstroService
+
+logger = logging.getLogger(__name__)
+
+# Bump when the report layout changes so stale artifacts are re-rendered
+REPORT_VERSION = 1
+REPORT_FORMATS = ('pdf', 'png')
+
+
+def report_key(birth_data, name, report_format):
+    parts = (f'r{REPORT_VERSION}', chart_cache_key(birth_data), name, report_format)
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+def chart_doshas(chart):
+    """(name, present, note) rows for the doshas a single chart can show."""
+    planets = {planet['name']: planet for planet in chart['planets']}
+    mars_house = planets['Mars']['house']
+
+    rahu = planets['Rahu']['longitude']
+    offsets = [(planets[name]['longitude'] - rahu) % 360
+               for name in ('Sun', 'Moon', 'Mars', 'Mercury', 'Jupiter', 'Venus', 'Saturn')]
+    kaal_sarp = all(offset < 180 for offset in offsets) or all(offset > 180 for offset in offsets)
+
+    return [
+        ('Manglik', mars_house in MANGLIK_HOUSES, f'Mars in house {mars_house}'),
+        ('Kaal Sarp', kaal_sarp, 'All grahas hemmed between Rahu and Ketu' if kaal_sarp else ''),
+    ]
+
+
+def build_payload(report, details):
+    """Everything the worker needs to render ``report``, as plain data."""
+    chart = chart_cache.get_or_compute(details)['chart']
+    moon = next(planet['longitude'] for planet in chart['planets'] if planet['name'] == 'Moon')
+    timeline = VedicAstroService.get_dasha_timeline(details, moon)
+
+    latitude, longitude = details.get('latitude'), details.get('longitude')
+    return {
+        'format': report.format,
+        'path': os.path.join(settings.MEDIA_ROOT, report.file.field.upload_to, f'{report.report_key}.{report.format}'),
+        'title': f"Kundli of {details['name']}",
+        'details': [
+            ('Name', details['name']),
+            ('Date of birth', details['date_of_birth']),
+            ('Time of birth', details['time_of_birth']),
+            ('Place of birth', details['place_of_birth']),
+            ('Coordinates', f'{latitude}, {longitude}' if latitude is not None and longitude is not None else 'Not given'),
+            ('UTC offset', details['timezone']),
+            ('Ascendant', f"{chart['ascendant']['sign']} {chart['ascendant']['degree']:.2f}"),
+            ('Ayanamsa (Lahiri)', f"{chart['ayanamsa']:.4f}"),
+        ],
+        'chart': chart,
+        'dashas': list(timeline.periods(depth=2)),
+        'doshas': chart_doshas(chart),
+    }
+
+
+class ReportQueue:
+    """Process-wide executor for report jobs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                workers = getattr(settings, 'KUNDLI_REPORT_WORKERS', None) or os.cpu_count() or 1
+                # spawn: forking a threaded ASGI server is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def request(self, birth_details, report_format, user=None):
+        """
+        Return the report for this chart/format, queueing a render when no
+        usable artifact exists. Returns (report, queued).
+        """
+        details = BirthDetailsSerializer(birth_details).data
+        key = report_key(details, details['name'], report_format)
+        user_id = user.id if user is not None and user.is_authenticated else None
+        report, created = KundliReport.objects.get_or_create(report_key=key, defaults={
+            'birth_details': birth_details,
+            'requested_by_id': user_id,
+            'format': report_format,
+        })
+
+        if report.status == 'done' and report.file and os.path.exists(report.file.path):
+            return report, False
+        if report.status in ('queued', 'rendering') and not created:
+            # Already in flight (here or in another worker): just wait for it
+            self._add_waiter(report.id, user_id)
+            # It may have finished before the waiter was stored
+            report.refresh_from_db()
+            return report, False
+
+        KundliReport.objects.filter(pk=report.pk).update(
+            status='queued', error='', completed_at=None, updated_at=timezone.now()
+        )
+        report.status = 'queued'
+        self.submit(report, details, user_id)
+        return report, True
+
+    def _add_waiter(self, report_id, user_id):
+        if user_id is not None:
+            KundliReportWaiter.objects.update_or_create(
+                report_id=report_id, user_id=user_id, defaults={'notified': False}
+            )
+
+    def submit(self, report, details, user_id=None):
+        """Hand a queued report to the process pool."""
+        self._add_waiter(report.id, user_id)
+        payload = build_payload(report, details)
+        KundliReport.objects.filter(pk=report.pk).update(status='rendering', updated_at=timezone.now())
+        report.status = 'rendering'
+        future = self.executor().submit(render_report, payload)
+        future.add_done_callback(lambda done: self._finished(report.pk, done))
+        return future
+
+    def _finished(self, report_id, future):
+        """Runs on the executor's callback thread in this process."""
+        try:
+            try:
+                path = future.result()
+                name = os.path.relpath(path, settings.MEDIA_ROOT)
+                KundliReport.objects.filter(pk=report_id).update(
+                    status='done', file=name, error='', completed_at=timezone.now(), updated_at=timezone.now()
+                )
+            except Exception as exc:
+                logger.exception('Rendering kundli report %s failed', report_id)
+                KundliReport.objects.filter(pk=report_id).update(
+                    status='failed', error=str(exc)[:500], completed_at=timezone.now(), updated_at=timezone.now()
+                )
+
+            report = KundliReport.objects.get(pk=report_id)
+            pending = KundliReportWaiter.objects.filter(report_id=report_id, notified=False)
+            waiters = set(pending.values_list('user_id', flat=True))
+            pending.filter(user_id__in=waiters).update(notified=True)
+            if report.requested_by_id:
+                waiters.add(report.requested_by_id)
+            payload = {
+                'type': 'report_ready' if report.status == 'done' else 'report_failed',
+                'report': {
+                    'id': report.id,
+                    'format': report.format,
+                    'status': report.status,
+                    'file': report.file.url if report.file else None,
+                },
+            }
+            for user_id in waiters:
+                notify_user(user_id, payload)
+        finally:
+            # This thread is not a request thread; don't leak its connection
+            connections.close_all()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+report_queue = ReportQueue()
@@ -1,20 +1,61 @@
+from decimal import Decimal
+
 from rest_framework import serializers
-from .models import BirthDetails
+from .models import BirthDetails, KundliReport
+from . import gazetteer
 
 class BirthDetailsSerializer(serializers.ModelSerializer):
     class Meta:
         model = BirthDetails
         fields = '__all__'
-        read_only_fields = ['user', 'created_at']
+        read_only_fields = [
+            'user', 'created_at', 'moon_longitude', 'moon_nakshatra', 'moon_rashi', 'is_manglik'
+        ]
+
+    def validate(self, attrs):
+        """
+        Fill missing coordinates from the offline gazetteer and, unless a
+        timezone was given, the zone's UTC offset at the birth instant.
+        """
+        if attrs.get('latitude') is None or attrs.get('longitude') is None:
+            index = gazetteer.get_index()
+            place = index.resolve(attrs.get('place_of_birth') or '') if index is not None else None
+            if place is not None:
+                attrs['latitude'] = Decimal(f"{place['latitude']:.6f}")
+                attrs['longitude'] = Decimal(f"{place['longitude']:.6f}")
+                if attrs.get('timezone') is None:
+                    offset = gazetteer.utc_offset(place['timezone'], attrs['date_of_birth'], attrs['time_of_birth'])
+                    if offset is not None:
+                        attrs['timezone'] = Decimal(f'{offset:.2f}')
+        return attrs
 
 class KundliResponseSerializer(serializers.Serializer):
     svg = serializers.CharField()
     details = BirthDetailsSerializer()
     planets = serializers.ListField(child=serializers.CharField(), required=False)
+    chart = serializers.DictField(required=False)
 
 class HoroscopeSerializer(serializers.Serializer):
     sign = serializers.CharField()
     date = serializers.CharField()
+    language = serializers.CharField(required=False)
     prediction = serializers.CharField()
     lucky_number = serializers.IntegerField()
     lucky_color = serializers.CharField()
+
+class MatchRequestSerializer(serializers.Serializer):
+    """Either a saved chart id or inline birth details to match against."""
+    birth_details_id = serializers.IntegerField(required=False)
+    birth_details = BirthDetailsSerializer(required=False)
+    top_k = serializers.IntegerField(required=False, default=10, min_value=1)
+
+    def validate(self, attrs):
+        if ('birth_details_id' in attrs) == ('birth_details' in attrs):
+            raise serializers.ValidationError('Provide exactly one of birth_details_id or birth_details')
+        return attrs
+
+class KundliReportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = KundliReport
+        fields = ['id', 'birth_details', 'format', 'status', 'file', 'error', 'created_at', 'completed_at']
+        read_only_fields = fields
@@ -1,82 +1,116 @@
-import random
-from datetime import datetime
+from . import charts, dasha, ephemeris, ephemeris_table, horoscopes
+
+
+def birth_parameters(birth_data):
+    """
+    Normalize birth details (validated data, serializer output or a model
+    instance's fields) into (date, time, latitude, longitude, timezone).
+    Missing coordinates fall back to the ephemeris defaults.
+    """
+    latitude = birth_data.get('latitude')
+    longitude = birth_data.get('longitude')
+    timezone = birth_data.get('timezone')
+    return (
+        birth_data.get('date_of_birth'),
+        birth_data.get('time_of_birth'),
+        float(latitude) if latitude is not None else ephemeris.DEFAULT_LATITUDE,
+        float(longitude) if longitude is not None else ephemeris.DEFAULT_LONGITUDE,
+        float(timezone) if timezone is not None else ephemeris.DEFAULT_TIMEZONE,
+    )
+
 
 class VedicAstroService:
     """
-    Service to interact with Vedic Astrology APIs.
-    Currently using MOCK data for demonstration.
+    Vedic astrology calculations backed by the vectorized sidereal
+    ephemeris in ``kundli.ephemeris``.
     """
-    
+
     @staticmethod
-    def generate_chart_svg(birth_data):
+    def calculate_charts(birth_records):
         """
-        Generates a North Indian style kundli chart SVG.
+        Calculate charts for a list of birth details in one vectorized pass.
+        Returns one chart dict per record, in order.
         """
-        # Mock parameters based on birth details to make it deterministic but variable
-        seed = int(birth_data.get('date_of_birth').replace('-', ''))
-        random.seed(seed)
-        
-        ascendant = random.choice(['Aries', 'Taurus', 'Gemini', 'Cancer', 'Leo', 'Virgo', 'Libra', 'Scorpio', 'Sagittarius', 'Capricorn', 'Aquarius', 'Pisces'])
-        planets = ['Sun', 'Mon', 'Mar', 'Mer', 'Jup', 'Ven', 'Sat', 'Rah', 'Ket']
-        
-        # Simple SVG template for North Indian Chart (Diamond style)
-        svg = f"""
-        <svg viewBox="0 0 400 400" xmlns="http://www.w3.org/2000/svg" style="background:transparent;">
-            <!-- Outer Border -->
-            <rect x="2" y="2" width="396" height="396" fill="None" stroke="#FFD700" stroke-width="2"/>
-            
-            <!-- Diagonals -->
-            <line x1="0" y1="0" x2="400" y2="400" stroke="#FFD700" stroke-width="1.5"/>
-            <line x1="400" y1="0" x2="0" y2="400" stroke="#FFD700" stroke-width="1.5"/>
-            
-            <!-- Diamond Inners -->
-            <line x1="0" y1="200" x2="200" y2="0" stroke="#FFD700" stroke-width="1.5"/>
-            <line x1="200" y1="0" x2="400" y2="200" stroke="#FFD700" stroke-width="1.5"/>
-            <line x1="400" y1="200" x2="200" y2="400" stroke="#FFD700" stroke-width="1.5"/>
-            <line x1="200" y1="400" x2="0" y2="200" stroke="#FFD700" stroke-width="1.5"/>
+        if not birth_records:
+            return []
 
-            <!-- House Numbers (Fixed positions for North Indian Chart) -->
-            <text x="200" y="80" fill="#AAA" font-size="12" text-anchor="middle">1</text>
-            <text x="100" y="30" fill="#AAA" font-size="12" text-anchor="middle">2</text>
-            <text x="40" y="80" fill="#AAA" font-size="12" text-anchor="middle">3</text>
-            <text x="100" y="160" fill="#AAA" font-size="12" text-anchor="middle">4</text>
-            <text x="40" y="300" fill="#AAA" font-size="12" text-anchor="middle">5</text>
-            <text x="100" y="350" fill="#AAA" font-size="12" text-anchor="middle">6</text>
-            <text x="200" y="300" fill="#AAA" font-size="12" text-anchor="middle">7</text>
-            <text x="300" y="350" fill="#AAA" font-size="12" text-anchor="middle">8</text>
-            <text x="360" y="300" fill="#AAA" font-size="12" text-anchor="middle">9</text>
-            <text x="300" y="160" fill="#AAA" font-size="12" text-anchor="middle">10</text>
-            <text x="360" y="80" fill="#AAA" font-size="12" text-anchor="middle">11</text>
-            <text x="300" y="30" fill="#AAA" font-size="12" text-anchor="middle">12</text>
+        params = [birth_parameters(record) for record in birth_records]
+        dates, times, latitudes, geo_longitudes, timezones = zip(*params)
+        jd = ephemeris.birth_instants(dates, times, timezones)
+
+        # Interpolate from the shared precomputed table when it covers the batch
+        longitudes, speeds = ephemeris_table.lookup(jd)
+        positions = ephemeris.compute_positions(
+            jd, latitudes, geo_longitudes, longitudes=longitudes, speeds=speeds
+        )
+
+        return [VedicAstroService._chart_from_positions(positions, index)
+                for index in range(len(birth_records))]
+
+    @staticmethod
+    def calculate_chart(birth_data):
+        """Calculate the chart for a single set of birth details."""
+        return VedicAstroService.calculate_charts([birth_data])[0]
+
+    @staticmethod
+    def _chart_from_positions(positions, index):
+        ascendant = float(positions.ascendant[index])
+        planets = []
+        for body, name in enumerate(ephemeris.GRAHAS):
+            longitude = float(positions.longitudes[index, body])
+            sign = int(positions.signs[index, body])
+            speed = float(positions.speeds[index, body])
+            planets.append({
+                'name': name,
+                'abbreviation': ephemeris.GRAHA_ABBREVIATIONS[body],
+                'longitude': round(longitude, 4),
+                'sign': ephemeris.SIGNS[sign],
+                'degree': round(longitude - sign * 30, 4),
+                'house': int(positions.houses[index, body]),
+                'speed': round(speed, 4),
+                'retrograde': speed < 0 and body not in (ephemeris.RAHU, ephemeris.KETU),
+            })
 
-            <!-- Ascendant -->
-            <text x="200" y="110" fill="#FF6B35" font-size="14" font-weight="bold" text-anchor="middle">Asc: {ascendant}</text>
-            
-            <!-- Random Planets Placement Mock -->
-            <text x="100" y="130" fill="#FFF" font-size="12" text-anchor="middle">Sun</text>
-            <text x="300" y="130" fill="#FFF" font-size="12" text-anchor="middle">Jup</text>
-            <text x="200" y="270" fill="#FFF" font-size="12" text-anchor="middle">Ven</text>
-        </svg>
+        return {
+            'ascendant': {
+                'longitude': round(ascendant, 4),
+                'sign': ephemeris.SIGNS[int(positions.ascendant_sign[index])],
+                'degree': round(ascendant % 30, 4),
+            },
+            'ayanamsa': round(float(positions.ayanamsa[index]), 4),
+            'house_cusps': [round(float(cusp), 4) for cusp in positions.house_cusps[index]],
+            'planets': planets,
+        }
+
+    @staticmethod
+    def planet_summary(chart):
+        """Short 'Planet (Sign)' labels used in kundli responses."""
+        return [f"{planet['name']} ({planet['sign']})" for planet in chart['planets']]
+
+    @staticmethod
+    def generate_chart_svg(birth_data, chart=None, style=charts.DEFAULT_STYLE,
+                           theme=charts.DEFAULT_THEME, minify=False):
         """
-        return svg.strip()
+        Generates a kundli chart SVG (North Indian style by default) from the
+        precompiled skeleton of the style and theme.
+        """
+        if chart is None:
+            chart = VedicAstroService.calculate_chart(birth_data)
+        return charts.render_chart_svg(chart, style=style, theme=theme, minify=minify)
+
+    @staticmethod
+    def get_dasha_timeline(birth_data, moon_longitude):
+        """Memoized Vimshottari timeline (see ``kundli.dasha``) of a chart."""
+        birth_date, birth_time, _, _, timezone = birth_parameters(birth_data)
+        birth_jd = float(ephemeris.birth_instants([birth_date], [birth_time], [timezone])[0])
+        return dasha.get_timeline(birth_jd, moon_longitude, timezone)
 
     @staticmethod
-    def get_daily_horoscope(sign):
+    def get_daily_horoscope(sign, language=horoscopes.DEFAULT_LANGUAGE):
         """
-        Returns a mock daily horoscope for the sign.
+        Returns today's materialized horoscope for the sign (see
+        ``kundli.horoscopes``), falling back to the default language.
         """
-        predictions = [
-            "Today is a great day for new beginnings. Focus on your goals.",
-            "You might face some minor challenges, but your patience will pay off.",
-            "Financial gains are indicated. Be wise with your investments.",
-            "Health looks good. Try to include some yoga in your routine.",
-            "Travel is on the cards. Pack your bags!",
-            "Relationship harmony is highlighted today. Spend time with loved ones."
-        ]
-        return {
-            "sign": sign,
-            "date": datetime.now().strftime("%Y-%m-%d"),
-            "prediction": random.choice(predictions),
-            "lucky_number": random.randint(1, 9),
-            "lucky_color": random.choice(["Red", "Blue", "Green", "Yellow", "White"])
-        }
+        if language not in horoscopes.supported_languages():
+            language = horoscopes.DEFAULT_LANGUAGE
+        return horoscopes.horoscope_cache.get(sign, language)
@@ -0,0 +1,57 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import chart_cache, normalized_birth_tuple
+from .matching import match_index
+from .models import BirthDetails
+
+BIRTH_FIELDS = ('date_of_birth', 'time_of_birth', 'latitude', 'longitude', 'timezone')
+# What the match index holds per row
+MATCH_FIELDS = ('user_id', 'gender', 'moon_nakshatra', 'moon_rashi', 'is_manglik')
+
+
+@receiver(pre_save, sender=BirthDetails)
+def refresh_chart_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Evict the cached charts of the previous birth tuple when a row is edited
+    and (re)fill the chart summary used by matchmaking.
+    """
+    if raw:
+        return
+    current = {field: getattr(instance, field) for field in BIRTH_FIELDS}
+    previous = None
+    if instance.pk is not None:
+        previous = BirthDetails.objects.filter(pk=instance.pk).values(*BIRTH_FIELDS, *MATCH_FIELDS).first()
+        if previous is not None and normalized_birth_tuple(previous) != normalized_birth_tuple(current):
+            chart_cache.invalidate_birth(previous)
+            instance.moon_nakshatra = None
+    if instance.moon_nakshatra is None:
+        # Warms the cache too, so the response built right after save is a hit
+        instance.apply_chart_summary(chart_cache.get_or_compute(current)['chart'])
+    instance._match_before = previous and tuple(previous[field] for field in MATCH_FIELDS)
+
+
+@receiver(post_save, sender=BirthDetails)
+def refresh_match_index_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Reload the match arrays of the user(s) whose matchable chart appeared,
+    changed or moved; anonymous charts are never matched.
+    """
+    if raw:
+        return
+    before = getattr(instance, '_match_before', None)
+    after = tuple(getattr(instance, field) for field in MATCH_FIELDS)
+    if before == after:
+        return
+    for user_id in {before[0] if before else None, instance.user_id} - {None}:
+        transaction.on_commit(partial(match_index.invalidate, user_id))
+
+
+@receiver(post_delete, sender=BirthDetails)
+def invalidate_chart_on_delete(sender, instance, **kwargs):
+    chart_cache.invalidate_birth({field: getattr(instance, field) for field in BIRTH_FIELDS})
+    if instance.user_id is not None:
+        transaction.on_commit(partial(match_index.invalidate, instance.user_id))
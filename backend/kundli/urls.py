@@ -3,7 +3,13 @@ from . import views
 
 urlpatterns = [
     path('generate/', views.GenerateKundliView.as_view(), name='generate-kundli'),
+    path('batch/', views.BatchKundliView.as_view(), name='batch-kundli'),
+    path('match/', views.KundliMatchView.as_view(), name='kundli-match'),
     path('<int:pk>/', views.KundliDetailView.as_view(), name='kundli-detail'),
+    path('<int:pk>/dasha/', views.KundliDashaView.as_view(), name='kundli-dasha'),
+    path('<int:pk>/report/', views.KundliReportView.as_view(), name='kundli-report'),
+    path('reports/<int:pk>/', views.KundliReportStatusView.as_view(), name='kundli-report-status'),
     path('saved/', views.SavedKundliListView.as_view(), name='saved-kundlis'),
+    path('places/', views.PlaceSearchView.as_view(), name='place-search'),
     path('horoscope/<str:sign>/', views.DailyHoroscopeView.as_view(), name='daily-horoscope'),
 ]
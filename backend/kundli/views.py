@@ -1,15 +1,64 @@
+import json
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
 
-from .models import BirthDetails
+from .models import BirthDetails, KundliReport
 from .serializers import (
     BirthDetailsSerializer,
     KundliResponseSerializer,
-    HoroscopeSerializer
+    HoroscopeSerializer,
+    KundliReportSerializer,
+    MatchRequestSerializer
 )
 from .services import VedicAstroService
+from .cache import chart_cache
+from .matching import match_index
+from .reports import REPORT_FORMATS, report_queue
+from .horoscopes import DEFAULT_LANGUAGE, normalize_sign
+from . import charts, dasha, gazetteer
+
+
+def chart_options(request):
+    """Chart style, theme and minify flag from the query string."""
+    style = request.query_params.get('style', charts.DEFAULT_STYLE)
+    theme = request.query_params.get('theme', charts.DEFAULT_THEME)
+    if style not in charts.STYLES:
+        raise ValidationError({'style': f"Choose one of: {', '.join(charts.STYLES)}"})
+    if theme not in charts.THEMES:
+        raise ValidationError({'theme': f"Choose one of: {', '.join(charts.THEMES)}"})
+    minify = request.query_params.get('minify', '').lower() in ('1', 'true', 'yes')
+    return style, theme, minify
+
+
+def kundli_payload(result, details, style, theme, minify):
+    """Response body for one kundli; minified SVG is re-rendered from the cached chart."""
+    svg = result['svg']
+    if minify:
+        svg = charts.render_chart_svg(result['chart'], style=style, theme=theme, minify=True)
+    return {
+        'svg': svg,
+        'details': details,
+        'planets': VedicAstroService.planet_summary(result['chart']),
+        'chart': result['chart'],
+    }
+
+
+def stream_json_array(items):
+    """Encode an iterable as a JSON array one element at a time."""
+    yield '['
+    for index, item in enumerate(items):
+        yield (',' if index else '') + json.dumps(item)
+    yield ']'
+
 
 class GenerateKundliView(APIView):
     """
@@ -19,6 +68,7 @@ class GenerateKundliView(APIView):
     permission_classes = [AllowAny] # Allow guests to try
 
     def post(self, request):
+        style, theme, minify = chart_options(request)
         serializer = BirthDetailsSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
@@ -31,52 +81,246 @@ class GenerateKundliView(APIView):
             # So we just use the validated data for generation
             birth_details = serializer.save() # Saves anonymously
             
-        # Generate Chart
-        svg = VedicAstroService.generate_chart_svg(serializer.validated_data)
-        
-        response_data = {
-            'svg': svg,
-            'details': serializer.data,
-            'planets': ['Sun (Leo)', 'Moon (Tau)'] # Mock
-        }
+        # Generate Chart (cached so the first detail view is a hit)
+        result = chart_cache.get_or_compute(serializer.validated_data, chart_style=style, theme=theme)
+        response_data = kundli_payload(result, serializer.data, style, theme, minify)
         
         return Response(response_data, status=status.HTTP_201_CREATED)
 
+class BatchKundliView(APIView):
+    """
+    Generate Kundli charts for many birth records in one round-trip.
+    Accepts a JSON list (or {"records": [...]}) of birth details; rows are
+    saved with a single bulk INSERT and charts computed in one vectorized pass.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        style, theme, minify = chart_options(request)
+        records = request.data.get('records') if isinstance(request.data, dict) else request.data
+        if not isinstance(records, list) or not records:
+            return Response({'error': 'Expected a non-empty list of birth records'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_size = getattr(settings, 'KUNDLI_BATCH_MAX_SIZE', 100)
+        if len(records) > max_size:
+            return Response({'error': f'At most {max_size} records per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = BirthDetailsSerializer(data=records, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        results = chart_cache.get_or_compute_many(serializer.validated_data, chart_style=style, theme=theme)
+
+        # bulk_create skips the save signals, so fill the chart summaries here
+        user = request.user if request.user.is_authenticated else None
+        rows = []
+        for attrs, result in zip(serializer.validated_data, results):
+            row = BirthDetails(user=user, **attrs)
+            row.apply_chart_summary(result['chart'])
+            rows.append(row)
+        birth_details = BirthDetails.objects.bulk_create(rows)
+        if user is not None:
+            # Anonymous charts are never matched
+            transaction.on_commit(lambda: match_index.invalidate(user.id))
+
+        details = BirthDetailsSerializer(birth_details, many=True).data
+
+        response_data = [
+            kundli_payload(result, detail, style, theme, minify)
+            for result, detail in zip(results, details)
+        ]
+        return Response({'count': len(response_data), 'results': response_data}, status=status.HTTP_201_CREATED)
+
+class KundliMatchView(APIView):
+    """
+    Ashtakoota (guna milan) matching of one chart against the user's saved
+    charts of the opposite gender. Returns the top-K by total points.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = MatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        top_k = min(data['top_k'], getattr(settings, 'KUNDLI_MATCH_MAX_RESULTS', 100))
+
+        if 'birth_details_id' in data:
+            try:
+                subject = BirthDetails.objects.get(pk=data['birth_details_id'], user=request.user)
+            except BirthDetails.DoesNotExist:
+                return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+            if subject.moon_nakshatra is None:
+                subject.apply_chart_summary(chart_cache.get_or_compute(BirthDetailsSerializer(subject).data)['chart'])
+        else:
+            # Inline details are scored without being saved
+            subject = BirthDetails(**data['birth_details'])
+            subject.apply_chart_summary(chart_cache.get_or_compute(data['birth_details'])['chart'])
+
+        matches, candidates = match_index.match(
+            request.user.id, subject.moon_nakshatra, subject.moon_rashi, subject.is_manglik, subject.gender,
+            k=top_k, exclude_id=subject.pk,
+        )
+        saved = BirthDetails.objects.in_bulk([match['id'] for match in matches])
+        for match in matches:
+            details = saved.get(match['id'])
+            match['name'] = details.name if details else None
+            match['date_of_birth'] = details.date_of_birth if details else None
+
+        return Response({
+            'subject': {
+                'id': subject.pk,
+                'name': subject.name,
+                'moon_nakshatra': subject.moon_nakshatra,
+                'moon_rashi': subject.moon_rashi,
+                'is_manglik': subject.is_manglik,
+            },
+            'candidates': candidates,
+            'matches': matches,
+        })
+
 class DailyHoroscopeView(APIView):
     """
-    Get daily horoscope for a specific sign.
+    Get today's horoscope for a specific sign (?lang=en|hi).
+    Served from the per-day materialized table via an in-memory cache.
     """
     permission_classes = [AllowAny]
     
     def get(self, request, sign):
-        data = VedicAstroService.get_daily_horoscope(sign)
-        serializer = HoroscopeSerializer(data=data)
-        serializer.is_valid(raise_exception=True)
-        return Response(serializer.data)
+        sign_name = normalize_sign(sign)
+        if sign_name is None:
+            return Response({'error': 'Unknown sign'}, status=status.HTTP_404_NOT_FOUND)
+        language = request.query_params.get('lang', DEFAULT_LANGUAGE)
+        data = VedicAstroService.get_daily_horoscope(sign_name, language)
+        return Response(HoroscopeSerializer(data).data)
 
 class KundliDetailView(APIView):
     """
-    Get a specific saved kundli by ID and re-generate the chart.
+    Get a specific saved kundli by ID with its (cached) chart.
     """
     permission_classes = [AllowAny] 
     
     def get(self, request, pk):
+        style, theme, minify = chart_options(request)
         try:
             birth_details = BirthDetails.objects.get(pk=pk)
             
-            # Re-generate chart (Service is deterministic)
+            # Service is deterministic, so repeat views are served from the cache
             serializer = BirthDetailsSerializer(birth_details)
-            svg = VedicAstroService.generate_chart_svg(serializer.data)
-            
-            response_data = {
-                'svg': svg,
-                'details': serializer.data,
-                'planets': ['Sun (Leo)', 'Moon (Tau)'] # Mock
-            }
+            result = chart_cache.get_or_compute(serializer.data, chart_style=style, theme=theme)
+            response_data = kundli_payload(result, serializer.data, style, theme, minify)
             return Response(response_data)
         except BirthDetails.DoesNotExist:
             return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
 
+class KundliDashaView(APIView):
+    """
+    Vimshottari dasha periods of a saved kundli overlapping ?from=&to=
+    (YYYY-MM-DD, both inclusive; default the whole 120 years from birth),
+    down to ?depth=1-3 levels. Periods are generated lazily and streamed
+    as a JSON array.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        try:
+            birth_details = BirthDetails.objects.get(pk=pk)
+        except BirthDetails.DoesNotExist:
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            window_start = request.query_params.get('from')
+            window_end = request.query_params.get('to')
+            window_start = date.fromisoformat(window_start) if window_start else None
+            window_end = date.fromisoformat(window_end) if window_end else None
+            depth = int(request.query_params.get('depth', len(dasha.LEVELS)))
+        except ValueError:
+            return Response({'error': 'from/to must be YYYY-MM-DD and depth an integer'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= depth <= len(dasha.LEVELS):
+            return Response({'error': f'depth must be between 1 and {len(dasha.LEVELS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        details = BirthDetailsSerializer(birth_details).data
+        moon_longitude = birth_details.moon_longitude
+        if moon_longitude is None:
+            chart = chart_cache.get_or_compute(details)['chart']
+            moon_longitude = next(planet['longitude'] for planet in chart['planets'] if planet['name'] == 'Moon')
+        timeline = VedicAstroService.get_dasha_timeline(details, moon_longitude)
+
+        offset = timeline.utc_offset
+        from_jd = dasha.local_date_to_jd(window_start, offset) if window_start else None
+        to_jd = dasha.local_date_to_jd(window_end + timedelta(days=1), offset) if window_end else None
+        periods = timeline.periods(from_jd, to_jd, depth=depth)
+        return StreamingHttpResponse(stream_json_array(periods), content_type='application/json')
+
+class KundliReportView(APIView):
+    """
+    Request a downloadable report (?format=pdf|png, default pdf) of a saved
+    kundli. Rendering happens in the background; the response carries the
+    report status, and authenticated users get a 'report_ready' message on
+    their notification socket when it is done.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request, pk):
+        report_format = request.data.get('format') or request.query_params.get('format', 'pdf')
+        if report_format not in REPORT_FORMATS:
+            return Response({'error': f"Choose one of: {', '.join(REPORT_FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            birth_details = BirthDetails.objects.get(pk=pk)
+        except BirthDetails.DoesNotExist:
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        report, _ = report_queue.request(birth_details, report_format, user=request.user)
+        data = KundliReportSerializer(report, context={'request': request}).data
+        return Response(data, status=status.HTTP_200_OK if report.status == 'done' else status.HTTP_202_ACCEPTED)
+
+class KundliReportStatusView(APIView):
+    """
+    Status of a report job, with the file URL once it is done. Only users
+    who requested the report can see it; anonymous callers repeat the POST.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            report = KundliReport.objects.filter(
+                Q(requested_by=request.user) | Q(waiters__user=request.user)
+            ).distinct().get(pk=pk)
+        except KundliReport.DoesNotExist:
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(KundliReportSerializer(report, context={'request': request}).data)
+
+class PlaceSearchView(APIView):
+    """
+    Autocomplete birth places from the offline gazetteer (?q=prefix).
+    With ?date=YYYY-MM-DD (and optional ?time=HH:MM) each result includes
+    the zone's UTC offset at that local instant.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+            on_date = request.query_params.get('date')
+            on_date = date.fromisoformat(on_date) if on_date else None
+            at_time = time.fromisoformat(request.query_params.get('time', '12:00'))
+        except ValueError:
+            return Response({'error': 'limit must be an integer, date YYYY-MM-DD and time HH:MM'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        index = gazetteer.get_index()
+        if index is None:
+            return Response({'error': 'Place search is not available'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        results = index.search(query, limit=limit)
+        if on_date is not None:
+            for place in results:
+                place['utc_offset'] = gazetteer.utc_offset(place['timezone'], on_date, at_time)
+        return Response({'count': len(results), 'results': results})
+
 class SavedKundliListView(generics.ListAPIView):
     """
     List saved kundlis for logged-in user.